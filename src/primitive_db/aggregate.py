@@ -0,0 +1,205 @@
+from itertools import groupby
+
+# Агрегатные функции и типы столбцов, к которым они применимы
+AGGREGATE_FUNCTIONS = {
+    'count': ('int', 'str', 'bool'),
+    'sum': ('int', 'bool'),
+    'min': ('int', 'str', 'bool'),
+    'max': ('int', 'str', 'bool'),
+    'avg': ('int', 'bool'),
+}
+
+
+def aggregate_label(function, column):
+    """
+    Заголовок столбца результата, например count(*) или sum(age)
+    """
+
+    return f"{function}({column or '*'})"
+
+
+def _start(function):
+    match function:
+        case 'count' | 'sum':
+            return 0
+        case 'avg':
+            return (0, 0)
+        case _:
+            return None
+
+
+def _step(function, state, value):
+    match function:
+        case 'count':
+            return state + 1
+        case 'sum':
+            return state + value
+        case 'min':
+            return value if state is None or value < state else state
+        case 'max':
+            return value if state is None or value > state else state
+        case 'avg':
+            return state[0] + value, state[1] + 1
+
+
+def _merge(function, state, other_state):
+    match function:
+        case 'count' | 'sum':
+            return state + other_state
+        case 'avg':
+            return state[0] + other_state[0], state[1] + other_state[1]
+        case _:
+            if state is None:
+                return other_state
+            if other_state is None:
+                return state
+            return _step(function, state, other_state)
+
+
+def _result(function, state):
+    if function == 'avg':
+        total, count = state
+        return total / count if count else None
+    return state
+
+
+def aggregate(table, positions, aggregates, group_by=()):
+    """
+    Вычисляет агрегаты за один проход по позициям записей.
+
+    Args:
+        table: Таблица, из которой читаются значения
+        positions: Позиции подходящих записей
+        aggregates: Список пар (функция, столбец или None для *)
+        group_by: Столбцы группировки
+
+    Returns:
+        list: Строки результата в виде словарей {заголовок: значение};
+            без группировки - ровно одна строка
+    """
+
+    groups = aggregate_states(table, positions, aggregates, group_by)
+    return aggregate_rows(groups, aggregates, group_by)
+
+
+def aggregate_states(table, positions, aggregates, group_by=()):
+    """
+    Накапливает состояния агрегатов по группам: {ключ группы: [состояния]}.
+    Состояния частей таблицы объединяются функцией merge_states.
+    """
+
+    key_getters = [table.column_getter(column) for column in group_by]
+    value_getters = [
+        table.column_getter(column) if column else None for _, column in aggregates
+    ]
+    functions = [function for function, _ in aggregates]
+    steps = list(zip(functions, value_getters))
+
+    # Хэш-агрегация: ключ группы -> состояния агрегатов
+    groups = {}
+    if not group_by:
+        groups[()] = [_start(function) for function in functions]
+
+    for position in positions:
+        key = tuple(get(position) for get in key_getters)
+        states = groups.get(key)
+        if states is None:
+            states = groups[key] = [_start(function) for function in functions]
+
+        for number, (function, get) in enumerate(steps):
+            value = get(position) if get is not None else None
+            states[number] = _step(function, states[number], value)
+
+    return groups
+
+
+def merge_states(groups, other_groups, aggregates):
+    """
+    Добавляет к состояниям groups состояния other_groups, накопленные
+    по следующей части записей. Порядок групп сохраняется таким же,
+    как при одном проходе по всем записям.
+    """
+
+    functions = [function for function, _ in aggregates]
+
+    for key, other_states in other_groups.items():
+        states = groups.get(key)
+        if states is None:
+            groups[key] = other_states
+            continue
+
+        groups[key] = [
+            _merge(function, state, other_state)
+            for function, state, other_state in zip(functions, states, other_states)
+        ]
+
+    return groups
+
+
+def aggregate_rows(groups, aggregates, group_by=()):
+    """
+    Преобразует состояния агрегатов в строки результата
+    """
+
+    return [
+        _result_row(group_by, key, aggregates, states) for key, states in groups.items()
+    ]
+
+
+def aggregate_from_indexes(table, aggregates, group_by=()):
+    """
+    Вычисляет агрегаты по всей таблице без чтения записей: количество
+    записей берется из счетчика таблицы, минимум и максимум - из
+    упорядоченного индекса, количество по группам - из индекса по столбцу
+    группировки. Возвращает None, если без чтения записей не обойтись.
+    """
+
+    if len(group_by) > 1:
+        return None
+
+    if group_by:
+        index = table.indexes.get(group_by[0])
+        if index is None or any(function != 'count' for function, _ in aggregates):
+            return None
+
+        if index.kind == 'sorted':
+            counts = [
+                (value, sum(1 for _ in entries))
+                for value, entries in groupby(index.entries, key=lambda e: e[0])
+            ]
+        else:
+            counts = [
+                (value, len(positions))
+                for value, positions in index.buckets.items()
+                if positions
+            ]
+
+        return [
+            _result_row(group_by, (value,), aggregates, [count] * len(aggregates))
+            for value, count in counts
+        ]
+
+    states = []
+    for function, column in aggregates:
+        index = table.indexes.get(column)
+        sorted_index = index is not None and index.kind == 'sorted'
+
+        if function == 'count':
+            states.append(len(table))
+        elif function in ('min', 'max') and sorted_index:
+            entries = index.entries
+            if not entries:
+                states.append(None)
+            else:
+                states.append(entries[0][0] if function == 'min' else entries[-1][0])
+        else:
+            return None
+
+    return [_result_row((), (), aggregates, states)]
+
+
+def _result_row(group_by, key, aggregates, states):
+    row = dict(zip(group_by, key))
+    for (function, column), state in zip(aggregates, states):
+        row[aggregate_label(function, column)] = _result(function, state)
+    return row
@@ -0,0 +1,250 @@
+import contextlib
+import io
+
+from .aggregate import aggregate_label
+from .core import delete, select, select_aggregates, update
+from .engine import table_cache
+from .parser import condition_columns, convert_condition, parse_where
+from .utils import get_table_names
+
+# Значения, которые допускаются в столбцах каждого типа
+_PYTHON_TYPES = {'int': int, 'str': str, 'bool': bool}
+
+
+class Database:
+    """
+    Программный интерфейс базы данных для использования из Python.
+
+    Методы принимают и возвращают объекты Python: записи - словари
+    {столбец: значение}. Команды не разбираются из текста, а результаты
+    не выводятся на экран; ошибки в аргументах вызывают ValueError.
+    Данные хранятся так же, как при работе через интерактивный режим:
+    в том же кэше таблиц, с теми же индексами и журналом изменений.
+
+    Условие where задается словарем {столбец: значение} (все равенства
+    должны выполняться; список значений означает IN) или строкой
+    в синтаксисе WHERE: "age > 30 and active = true".
+    """
+
+    def __init__(self, cache=None):
+        self._cache = cache or table_cache
+        self._cache.recover()
+
+    def insert(self, table_name, values):
+        """
+        Добавляет запись и возвращает ее ID
+        """
+
+        return self.insert_many(table_name, [values])[0]
+
+    def insert_many(self, table_name, rows):
+        """
+        Добавляет записи одной операцией (ID выдаются одним блоком)
+        и возвращает список их ID
+        """
+
+        table_name, table_schema = self._get_schema(table_name)
+        records = [self._build_record(table_name, table_schema, row) for row in rows]
+        if not records:
+            return []
+
+        first_id = self._cache.reserve_ids(table_name, len(records))
+        for offset, record in enumerate(records):
+            record['ID'] = first_id + offset
+
+        self._cache.append_records(table_name, records)
+        self._cache.commit()
+        return [record['ID'] for record in records]
+
+    def select(
+        self, table_name, where=None, columns=None, order_by=None, descending=False,
+        limit=None, offset=0,
+    ):
+        """
+        Возвращает список записей, удовлетворяющих условию where.
+        columns - список выбираемых столбцов (по умолчанию все),
+        order_by - столбец для сортировки.
+        """
+
+        table_name, table_schema = self._get_schema(table_name)
+        condition = self._build_condition(table_name, table_schema, where)
+
+        projection = None
+        if columns is not None:
+            projection = [
+                self._resolve_column(table_name, table_schema, column)
+                for column in columns
+            ]
+        if order_by is not None:
+            order_by = (
+                self._resolve_column(table_name, table_schema, order_by),
+                descending,
+            )
+
+        table = self._cache.get_table_for_read(table_name)
+        records = select(table, condition, order_by, limit, offset, projection)
+
+        # Записи копируются, чтобы их изменение не затронуло таблицу в кэше
+        return [dict(record) for record in records]
+
+    def count(self, table_name, where=None):
+        """
+        Возвращает количество записей, удовлетворяющих условию where
+        """
+
+        table_name, table_schema = self._get_schema(table_name)
+        condition = self._build_condition(table_name, table_schema, where)
+
+        table = self._cache.get_table_for_read(table_name)
+        rows = select_aggregates(table, [('count', None)], condition)
+        return next(iter(rows), {}).get(aggregate_label('count', None), 0)
+
+    def update(self, table_name, values, where=None):
+        """
+        Записывает значения {столбец: значение} в записи, удовлетворяющие
+        условию where (без условия - во все записи). Возвращает
+        количество обновленных записей.
+        """
+
+        table_name, table_schema = self._get_schema(table_name)
+        set_clause = {}
+
+        for column, value in values.items():
+            column = self._resolve_column(table_name, table_schema, column)
+            if column == 'ID':
+                raise ValueError("Столбец 'ID' нельзя изменить")
+            set_clause[column] = _check_value(column, table_schema[column], value)
+
+        if not set_clause:
+            return 0
+
+        condition = self._build_condition(table_name, table_schema, where)
+        table = self._cache.get_table_for_write(table_name)
+
+        updated_ids = []
+        _, updated_count = update(table, set_clause, condition, updated_ids)
+        if updated_count:
+            self._cache.update_records(table_name, updated_ids, set_clause)
+            self._cache.commit()
+        return updated_count
+
+    def delete(self, table_name, where=None):
+        """
+        Удаляет записи, удовлетворяющие условию where (без условия -
+        все записи). Возвращает количество удаленных записей.
+        """
+
+        table_name, table_schema = self._get_schema(table_name)
+        condition = self._build_condition(table_name, table_schema, where)
+        table = self._cache.get_table_for_write(table_name)
+
+        deleted_ids = []
+        _, deleted_count = delete(table, condition, deleted_ids)
+        if deleted_count:
+            self._cache.delete_records(table_name, deleted_ids)
+            self._cache.commit()
+        return deleted_count
+
+    def close(self):
+        """
+        Переносит изменения в файлы таблиц. Возвращает True при успехе.
+        """
+
+        return self._cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _get_schema(self, table_name):
+        # Каждая операция начинается с изменений, которые зафиксировали
+        # другие процессы
+        self._cache.refresh()
+        table_name = table_name.lower()
+        metadata = self._cache.get_metadata()
+        if table_name not in get_table_names(metadata):
+            raise ValueError(f"Таблица '{table_name}' не существует")
+        return table_name, metadata[table_name]
+
+    def _resolve_column(self, table_name, table_schema, column):
+        """
+        Возвращает имя столбца из схемы (без учета регистра)
+        """
+
+        for col_name in table_schema:
+            if col_name.lower() == column.lower():
+                return col_name
+        raise ValueError(
+            f"Столбец '{column}' не существует в таблице '{table_name}'"
+        )
+
+    def _build_record(self, table_name, table_schema, values):
+        record = {}
+        for column, value in values.items():
+            column = self._resolve_column(table_name, table_schema, column)
+            if column == 'ID':
+                raise ValueError("ID выдается автоматически")
+            record[column] = _check_value(column, table_schema[column], value)
+
+        missing = [
+            column for column in table_schema
+            if column != 'ID' and column not in record
+        ]
+        if missing:
+            raise ValueError(f"Не указаны значения столбцов: {', '.join(missing)}")
+
+        # Столбцы записываются в порядке схемы, ID выдается при добавлении
+        return {column: record.get(column) for column in table_schema}
+
+    def _build_condition(self, table_name, table_schema, where):
+        """
+        Преобразует where в дерево условия (как после разбора WHERE)
+        """
+
+        if where is None:
+            return None
+
+        if isinstance(where, str):
+            condition = _parse_where(where)
+            for column in condition_columns(condition):
+                self._resolve_column(table_name, table_schema, column)
+            return convert_condition(condition, table_schema)
+
+        terms = []
+        for column, value in where.items():
+            column = self._resolve_column(table_name, table_schema, column)
+            col_type = table_schema[column]
+            if isinstance(value, (list, tuple, set, frozenset)):
+                values = [_check_value(column, col_type, item) for item in value]
+                terms.append(('in', column, values))
+            else:
+                value = _check_value(column, col_type, value)
+                terms.append(('cmp', column, '=', value))
+
+        if not terms:
+            return None
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+
+def _check_value(column, col_type, value):
+    # Тип проверяется точно: bool - подкласс int, но в столбце int недопустим
+    if type(value) is not _PYTHON_TYPES[col_type]:
+        raise ValueError(
+            f"Значение {value!r} не подходит для столбца '{column}' типа {col_type}"
+        )
+    return value
+
+
+def _parse_where(where):
+    # Разбор условия сообщает об ошибке через print - сообщение
+    # становится текстом исключения
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        condition = parse_where(where)
+
+    if condition is None:
+        message = output.getvalue().strip().removeprefix("Ошибка: ")
+        raise ValueError(message or f"Некорректное условие WHERE: {where}")
+    return condition
@@ -0,0 +1,134 @@
+import json
+import struct
+import sys
+from array import array
+from itertools import accumulate
+
+# Формат файла таблицы:
+#   MAGIC, длина заголовка (uint32), заголовок в JSON
+#   {"columns": [[имя, тип], ...], "rows": n, "sections": {имя: [начало, длина]},
+#    "ids_sorted": признак того, что ID идут по возрастанию},
+#   затем секции столбцов подряд:
+#   int  - n значений int64
+#   bool - битовая маска из ceil(n / 8) байт
+#   str  - n + 1 смещений uint64 внутри блока строк, затем блок строк в UTF-8
+# Все числа записываются в порядке little-endian.
+MAGIC = b'PDB1'
+HEADER_LENGTH = struct.Struct('<I')
+
+
+def _to_little_endian(values):
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def encode_column(col_type, values):
+    """
+    Кодирует значения одного столбца в байты
+    """
+
+    match col_type:
+        case 'int':
+            return _to_little_endian(array('q', values)).tobytes()
+        case 'bool':
+            bitmap = bytearray((len(values) + 7) // 8)
+            for position, value in enumerate(values):
+                if value:
+                    bitmap[position >> 3] |= 1 << (position & 7)
+            return bytes(bitmap)
+        case 'str':
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = array('Q', [0])
+            offsets.extend(accumulate(len(value) for value in encoded))
+            return _to_little_endian(offsets).tobytes() + b''.join(encoded)
+        case _:
+            raise ValueError(f"Неподдерживаемый тип данных '{col_type}'")
+
+
+def decode_column(col_type, buffer, rows):
+    """
+    Декодирует все значения столбца из байтов его секции
+    """
+
+    match col_type:
+        case 'int':
+            values = array('q')
+            values.frombytes(buffer)
+            return _to_little_endian(values).tolist()
+        case 'bool':
+            return [bool(buffer[i >> 3] >> (i & 7) & 1) for i in range(rows)]
+        case 'str':
+            offsets_size = (rows + 1) * 8
+            offsets = array('Q')
+            offsets.frombytes(buffer[:offsets_size])
+            offsets = _to_little_endian(offsets)
+            blob = bytes(buffer[offsets_size:])
+            return [
+                blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(rows)
+            ]
+        case _:
+            raise ValueError(f"Неподдерживаемый тип данных '{col_type}'")
+
+
+def encode_table(table_schema, records):
+    """
+    Кодирует записи таблицы в двоичный формат
+    """
+
+    sections = []
+    section_map = {}
+    offset = 0
+
+    for col_name, col_type in table_schema.items():
+        section = encode_column(col_type, [record[col_name] for record in records])
+        section_map[col_name] = [offset, len(section)]
+        sections.append(section)
+        offset += len(section)
+
+    ids = [record['ID'] for record in records]
+    ids_sorted = all(ids[i] < ids[i + 1] for i in range(len(ids) - 1))
+
+    header = json.dumps({
+        'columns': list(table_schema.items()),
+        'rows': len(records),
+        'sections': section_map,
+        'ids_sorted': ids_sorted,
+    }, ensure_ascii=False).encode('utf-8')
+
+    return b''.join([MAGIC, HEADER_LENGTH.pack(len(header)), header, *sections])
+
+
+def decode_header(buffer):
+    """
+    Читает заголовок файла таблицы.
+    Возвращает (заголовок, смещение начала секций).
+    """
+
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("Файл не является двоичным файлом таблицы")
+
+    start = len(MAGIC)
+    (header_length,) = HEADER_LENGTH.unpack_from(buffer, start)
+    start += HEADER_LENGTH.size
+
+    header = json.loads(bytes(buffer[start:start + header_length]).decode('utf-8'))
+    return header, start + header_length
+
+
+def decode_table(buffer):
+    """
+    Декодирует таблицу из двоичного формата в список записей
+    """
+
+    header, data_start = decode_header(buffer)
+    rows = header['rows']
+    columns = {}
+
+    for col_name, col_type in header['columns']:
+        offset, length = header['sections'][col_name]
+        start = data_start + offset
+        columns[col_name] = decode_column(col_type, buffer[start:start + length], rows)
+
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
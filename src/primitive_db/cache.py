@@ -0,0 +1,1148 @@
+import copy
+import json
+import os
+from collections import OrderedDict
+
+from .index import index_from_dict
+from .locks import file_lock, table_lock
+from .mapped import MAPPED_READ_MIN_BYTES, LazyIndexes, MappedTable
+from .stats import (
+    add_records,
+    compute_stats,
+    has_stale_bounds,
+    refresh_bounds,
+    update_values,
+)
+from .table import check_int64, make_table
+from .utils import (
+    METADATA_FILE,
+    append_table_records,
+    get_binary_filepath,
+    get_changed_tables,
+    get_log_filepath,
+    get_table_filepath,
+    get_table_indexes,
+    get_table_options,
+    load_index_data,
+    load_last_id,
+    load_metadata,
+    load_table_data,
+    load_table_log,
+    load_table_stats,
+    merge_table_metadata,
+    print_error,
+    save_index_data,
+    save_last_id,
+    save_metadata,
+    save_table_data,
+    save_table_stats,
+    set_table_option,
+    sync_table_logs,
+)
+from .wal import (
+    WAL_CHECKPOINT_BYTES,
+    WAL_CHECKPOINT_INTERVAL,
+    WAL_FILE,
+    WriteAheadLog,
+    get_entry_tables,
+)
+
+# Ограничение на суммарный размер (в байтах на диске) таблиц в кэше
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Количество ID, которые процесс резервирует в счетчике сверх нужных,
+# чтобы не блокировать таблицу при каждом добавлении записи
+ID_BLOCK_SIZE = 64
+
+
+def get_file_stamp(filepath):
+    """
+    Возвращает отметку файла (время изменения, размер) или None,
+    если файла нет
+    """
+
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_table_stamp(table_name):
+    """
+    Возвращает отметку всех файлов таблицы: снимков в форматах json
+    и binary и журнала добавлений
+    """
+
+    return (
+        get_file_stamp(get_table_filepath(table_name)),
+        get_file_stamp(get_binary_filepath(table_name)),
+        get_file_stamp(get_log_filepath(table_name)),
+    )
+
+
+def get_snapshot_stamp(stamp, with_log=False):
+    """
+    Отметка снимков таблицы (и журнала, если with_log) в виде, который
+    можно сохранить в JSON
+    """
+
+    file_stamps = stamp if with_log else stamp[:2]
+    return [list(file_stamp) if file_stamp else None for file_stamp in file_stamps]
+
+
+def get_stamp_size(stamp):
+    """
+    Суммарный размер файлов по отметке
+    """
+
+    return sum(file_stamp[1] for file_stamp in stamp if file_stamp)
+
+
+class CachedTable:
+    """
+    Таблица в кэше вместе с отметкой файлов и несохраненными изменениями
+    """
+
+    def __init__(self, data, stamp):
+        self.data = data
+        self.stamp = stamp
+        self.size = get_stamp_size(stamp)
+        # Снимок нужно перезаписать целиком
+        self.dirty = False
+        # Новые записи, которые достаточно дописать в журнал
+        self.appended = []
+        # Индексы, которые нужно сохранить
+        self.unsaved_indexes = set()
+        # Статистику нужно сохранить
+        self.unsaved_stats = False
+        # Последний выданный ID и конец блока ID, зарезервированного
+        # в файле счетчика (неиспользованные ID возвращаются при закрытии
+        # кэша и вытеснении таблицы)
+        self.last_id = None
+        self.reserved_id = None
+        # Позиция в журнале предзаписи (поколение, смещение), с которой
+        # изменения журнала еще не применены к таблице
+        self.position = (0, 0)
+
+    def has_changes(self):
+        return self.dirty or bool(self.appended)
+
+    def needs_flush(self):
+        """
+        Есть изменения данных, индексов или статистики, которые
+        нужно записать в файлы
+        """
+
+        return self.has_changes() or bool(self.unsaved_indexes) or self.unsaved_stats
+
+
+class TableCache:
+    """
+    Кэш метаданных и данных таблиц на время сессии.
+
+    Данные берутся с диска только если файлы изменились с момента
+    последнего чтения (по времени изменения и размеру). Изменения
+    накапливаются в памяти и записываются методом flush().
+
+    Изменения данных (insert, update, delete) commit() дописывает
+    в общий журнал предзаписи (wal.py). В файлы таблиц они переносятся
+    контрольной точкой (checkpoint()), когда журнал вырастает больше
+    WAL_CHECKPOINT_BYTES или старше WAL_CHECKPOINT_INTERVAL, при
+    изменении схемы и при закрытии кэша.
+
+    С одной базой могут работать несколько процессов: изменения,
+    зафиксированные другими процессами, применяются к таблицам в кэше
+    по журналу (refresh()), а таблица, которой нет в кэше, читается
+    из файлов вместе с ее изменениями из журнала. Файлы таблицы
+    читаются под разделяемой блокировкой и записываются под
+    исключительной (locks.py). Метаданные записываются только при
+    изменении схемы или настроек таблиц, и в них заменяются только
+    измененные процессом таблицы.
+    """
+
+    def __init__(
+        self,
+        metadata_file=METADATA_FILE,
+        max_bytes=CACHE_MAX_BYTES,
+        wal_file=WAL_FILE,
+    ):
+        self.metadata_file = metadata_file
+        self.max_bytes = max_bytes
+        self.wal_file = wal_file
+        self._wal = WriteAheadLog(wal_file)
+        # Таблицы, изменения которых есть в текущем поколении журнала
+        self._logged_tables = set()
+        # Изменения, которые не записываются в журнал, ждут контрольной точки
+        self._checkpoint_needed = False
+        # Открытая транзакция: исходные состояния измененных таблиц
+        # и записи журнала, которые будут записаны при ее фиксации
+        self._transaction = None
+        self._transaction_log = []
+        self._metadata = None
+        # Метаданные в том виде, в котором они прочитаны с диска
+        self._metadata_base = None
+        self._metadata_stamp = None
+        self._metadata_dirty = False
+        self._tables = OrderedDict()
+        # Таблицы, открытые только для чтения: имя -> (отметка, MappedTable)
+        self._mapped = {}
+
+    def get_metadata(self):
+        """
+        Возвращает метаданные, перечитывая файл только при его изменении
+        """
+
+        stamp = get_file_stamp(self.metadata_file)
+        if self._metadata is None or stamp != self._metadata_stamp:
+            # Несохраненные изменения переносятся в новую версию файла
+            self._reload_metadata(stamp)
+        return self._metadata
+
+    def set_metadata(self, metadata):
+        """
+        Заменяет метаданные, они будут сохранены при flush()
+        """
+
+        self._metadata = metadata
+        self._metadata_dirty = True
+        self._checkpoint_needed = True
+
+    def get_table(self, table_name):
+        """
+        Возвращает таблицу (Table) из кэша или загружает ее с диска
+        """
+
+        entry = self._tables.get(table_name)
+
+        if entry is not None:
+            # Таблица транзакции не перечитывается до ее завершения
+            if table_name in (self._transaction or ()) or (
+                entry.stamp == get_table_stamp(table_name)
+            ):
+                self._tables.move_to_end(table_name)
+                return entry.data
+
+            # Файлы таблицы изменились не на контрольной точке (например,
+            # другой процесс удалил таблицу): таблица читается заново
+            del self._tables[table_name]
+
+        metadata = self.get_metadata()
+        table_options = get_table_options(metadata, table_name)
+        layout = table_options.get('layout', 'rows')
+        table_format = table_options.get('format', 'json')
+
+        # Файлы таблицы и ее изменения из журнала читаются вместе, пока
+        # другой процесс не может их изменить
+        with self._wal.lock():
+            with table_lock(table_name):
+                stamp = get_table_stamp(table_name)
+                records = load_table_data(table_name, table_format)
+                table = make_table(metadata.get(table_name, {}), records, layout)
+                table.int64_only = table_format == 'binary'
+                loaded = CachedTable(table, stamp)
+                self._load_indexes(table_name, loaded)
+            generation, offset, wal_entries = self._wal.scan(table_name)
+
+        if entry is not None:
+            loaded.last_id = entry.last_id
+            loaded.reserved_id = entry.reserved_id
+        entry = loaded
+        entry.position = (generation, offset)
+        self._tables[table_name] = entry
+
+        table.stats = load_table_stats(table_name)
+        if table.stats is None or table.stats.get('snapshot') != get_snapshot_stamp(
+            stamp, with_log=True
+        ):
+            # Статистика отсутствует или собрана для других файлов таблицы
+            self._update_stats(table_name, entry)
+
+        # Изменения из журнала и еще не записанные в него изменения
+        # процесса повторяются на прочитанной версии таблицы
+        for wal_entry in wal_entries + self._wal.pending + self._transaction_log:
+            self._apply(wal_entry, tables={table_name})
+
+        self._evict()
+        return entry.data
+
+    def get_table_for_write(self, table_name):
+        """
+        Возвращает таблицу для изменения. Внутри транзакции при первом
+        обращении запоминается исходное состояние записи кэша, а таблица
+        начинает вести журнал отмены своих изменений.
+        """
+
+        table = self.get_table(table_name)
+
+        if self._transaction is None or table_name in self._transaction:
+            return table
+
+        entry = self._tables[table_name]
+        original = copy.copy(entry)
+        original.appended = list(entry.appended)
+        original.unsaved_indexes = set(entry.unsaved_indexes)
+
+        # Данные таблицы не копируются: при откате изменения отменяются
+        # по журналу отмены. Статистика копируется целиком - она невелика.
+        self._transaction[table_name] = (original, copy.deepcopy(table.stats))
+        table.undo_log = []
+        return table
+
+    def get_table_for_read(self, table_name):
+        """
+        Возвращает таблицу для чтения. Большая таблица в двоичном формате,
+        которой нет в кэше, не загружается целиком, а отображается в память
+        (MappedTable). Иначе возвращает таблицу из get_table().
+        """
+
+        # Изменения таблицы из журнала применяются к ее копии в памяти
+        if table_name in self._tables or table_name in self._logged_tables:
+            return self.get_table(table_name)
+
+        table_options = get_table_options(self.get_metadata(), table_name)
+        stamp = get_table_stamp(table_name)
+        json_stamp, binary_stamp, _ = stamp
+
+        if (
+            table_options.get('format', 'json') != 'binary'
+            or json_stamp is not None
+            or binary_stamp is None
+            or binary_stamp[1] < MAPPED_READ_MIN_BYTES
+            or not MappedTable.is_supported()
+        ):
+            return self.get_table(table_name)
+
+        cached = self._mapped.get(table_name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        try:
+            with table_lock(table_name):
+                stamp = get_table_stamp(table_name)
+                mapped = MappedTable(
+                    get_binary_filepath(table_name), load_table_log(table_name)
+                )
+        except (OSError, ValueError):
+            return self.get_table(table_name)
+
+        # Сохраненные индексы читаются при первом обращении к ним. Файлы
+        # индексов заменяются атомарно и проверяются по отметке снимка,
+        # поэтому блокировка таблицы для этого не нужна.
+        table_indexes = get_table_indexes(self.get_metadata(), table_name)
+        snapshot_stamp = get_snapshot_stamp(stamp)
+        mapped.indexes = LazyIndexes(
+            table_indexes,
+            lambda column: self._load_saved_index(
+                table_name, column, table_indexes[column], mapped, snapshot_stamp
+            ),
+        )
+        mapped.stats = load_table_stats(table_name)
+        self._mapped[table_name] = (stamp, mapped)
+        return mapped
+
+    def get_stats(self, table_name):
+        """
+        Возвращает статистику таблицы. Если таблицы нет в кэше, а
+        сохраненная статистика соответствует файлам таблицы, данные
+        таблицы не читаются.
+        """
+
+        if table_name not in self._tables and table_name not in self._logged_tables:
+            stats = load_table_stats(table_name)
+            stamp = get_table_stamp(table_name)
+            if (
+                stats is not None
+                and stats.get('snapshot') == get_snapshot_stamp(stamp, with_log=True)
+                and not has_stale_bounds(stats)
+            ):
+                return stats
+
+        table = self.get_table(table_name)
+        if table.stats is None:
+            return None
+
+        # Минимум и максимум, удаленные командами update и delete,
+        # уточняются только по своим столбцам
+        entry = self._tables[table_name]
+        if has_stale_bounds(table.stats):
+            refresh_bounds(table.stats, table)
+            entry.unsaved_stats = True
+
+        # Размер до контрольной точки - размер файлов вместе с еще
+        # не записанными добавлениями
+        return dict(table.stats, bytes=self._estimate_size(entry))
+
+    def create_index(self, table_name, column, kind='hash'):
+        """
+        Строит индекс указанного вида по столбцу, он будет сохранен
+        при flush()
+        """
+
+        self.get_table(table_name).add_index(column, kind)
+        self._tables[table_name].unsaved_indexes.add(column)
+        self._checkpoint_needed = True
+
+    def set_layout(self, table_name, table_schema, layout):
+        """
+        Переводит таблицу в кэше в другое представление в памяти
+        """
+
+        table = self.get_table(table_name)
+        if table.layout == layout:
+            return
+
+        # Статистика не зависит от представления и переносится как есть
+        new_table = make_table(table_schema, table.to_records(), layout)
+        new_table.int64_only = table.int64_only
+        new_table.stats = table.stats
+        for column, index in table.indexes.items():
+            new_table.add_index(column, index.kind)
+        self._tables[table_name].data = new_table
+        self._checkpoint_needed = True
+
+    def convert_format(self, table_name, table_format):
+        """
+        Записывает снимок таблицы в другом формате и только после этого
+        меняет формат в метаданных. Если значения нельзя сохранить
+        в новом формате, выбрасывает ValueError. Возвращает True при
+        успехе.
+        """
+
+        table = self.get_table(table_name)
+        if table_format == 'binary':
+            for record in table:
+                for column, value in record.items():
+                    check_int64(column, value)
+
+        self._mark_changed(table_name)
+        if not self._checkpoint({table_name: table_format}):
+            return False
+
+        entry = self._tables[table_name]
+        entry.data.int64_only = table_format == 'binary'
+        set_table_option(self._metadata, table_name, 'format', table_format)
+        self._metadata_dirty = True
+        self._checkpoint_needed = True
+        return True
+
+    def reserve_ids(self, table_name, count=1):
+        """
+        Резервирует count последовательных ID и возвращает первый из них.
+        ID выдаются из блока, зарезервированного в файле счетчика, новый
+        блок резервируется, когда текущий закончился.
+        """
+
+        entry = self._load_last_id(table_name)
+        if entry.reserved_id is None or entry.last_id + count > entry.reserved_id:
+            self._reserve_block(table_name, entry, count)
+
+        first_id = entry.last_id + 1
+        entry.last_id += count
+        return first_id
+
+    def append_record(self, table_name, record):
+        """
+        Добавляет запись в таблицу, на диск она будет дописана в журнал
+        """
+
+        self.append_records(table_name, [record])
+
+    def append_records(self, table_name, records):
+        """
+        Добавляет записи в таблицу, на диск они будут дописаны
+        в журнал одной операцией
+        """
+
+        table = self.get_table_for_write(table_name)
+        table.extend(records)
+
+        # Статистика обновляется сразу и сохраняется при flush()
+        if table.stats is not None:
+            add_records(table.stats, records)
+        self._log({'op': 'insert', 'table': table_name, 'records': records})
+
+    def update_records(self, table_name, record_ids, values):
+        """
+        Записывает в журнал обновление записей с указанными ID, уже
+        выполненное в таблице из кэша (см. core.update)
+        """
+
+        stats = self._tables[table_name].data.stats
+        if stats is not None:
+            update_values(stats, values)
+        self._log({
+            'op': 'update', 'table': table_name, 'ids': record_ids, 'values': values,
+        })
+
+    def delete_records(self, table_name, record_ids):
+        """
+        Записывает в журнал удаление записей с указанными ID, уже
+        выполненное в таблице из кэша (см. core.delete)
+        """
+
+        stats = self._tables[table_name].data.stats
+        if stats is not None:
+            stats['rows'] -= len(record_ids)
+        self._log({'op': 'delete', 'table': table_name, 'ids': record_ids})
+
+    def mark_dirty(self, table_name):
+        """
+        Отмечает, что таблица изменена и ее снимок нужно перезаписать
+        при ближайшей контрольной точке
+        """
+
+        self.get_table(table_name)
+        self._mark_changed(table_name)
+        self._checkpoint_needed = True
+
+    def forget(self, table_name):
+        """
+        Удаляет таблицу из кэша без сохранения изменений
+        """
+
+        self._tables.pop(table_name, None)
+        self._mapped.pop(table_name, None)
+        self._checkpoint_needed = True
+
+    def in_transaction(self):
+        return self._transaction is not None
+
+    def begin_transaction(self):
+        """
+        Начинает транзакцию: следующие изменения не записываются
+        в журнал до commit_transaction() и отменяются при откате
+        """
+
+        self._transaction = {}
+        self._transaction_log = []
+
+    def commit_transaction(self):
+        """
+        Фиксирует транзакцию одной записью журнала: после сбоя она
+        повторяется целиком или не повторяется совсем.
+        Возвращает True при успехе.
+        """
+
+        entries = self._transaction_log
+        for original, _ in self._transaction.values():
+            original.data.undo_log = None
+        self._transaction = None
+        self._transaction_log = []
+
+        if entries:
+            self._wal.append({'op': 'transaction', 'entries': entries})
+        if not self.commit():
+            return False
+
+        # Транзакция записывается на диск сразу, без групповой фиксации
+        try:
+            self._wal.sync()
+        except OSError as e:
+            print_error(f"Ошибка при записи журнала изменений: {e}")
+            return False
+        return True
+
+    def rollback_transaction(self):
+        """
+        Отменяет транзакцию: изменения таблиц отменяются по их журналам
+        отмены без обращения к диску
+        """
+
+        for table_name, (original, stats) in self._transaction.items():
+            original.data.undo()
+            original.data.stats = stats
+            self._tables[table_name] = original
+
+        self._transaction = None
+        self._transaction_log = []
+
+    def refresh(self):
+        """
+        Применяет к таблицам в кэше изменения, зафиксированные другими
+        процессами. Вызывается перед выполнением команды; внутри
+        транзакции таблицы не меняются до ее завершения.
+        """
+
+        if self._transaction is not None or not self._wal.changed():
+            return
+
+        with self._wal.lock():
+            self._read_log()
+
+    def commit(self):
+        """
+        Фиксирует выполненную команду: изменения данных дописываются
+        в журнал (fsync выполняется групповой фиксацией), после чего их
+        видят другие процессы. Контрольная точка выполняется после
+        изменения схемы и при переполнении или устаревании журнала.
+        Внутри транзакции ничего не делает. Возвращает True при успехе.
+        """
+
+        if self._transaction is not None:
+            return True
+
+        if self._checkpoint_needed or (
+            self._wal.entry_count + len(self._wal.pending)
+            and (
+                self._wal.size() >= WAL_CHECKPOINT_BYTES
+                or self._wal.age() >= WAL_CHECKPOINT_INTERVAL
+            )
+        ):
+            return self.checkpoint()
+
+        try:
+            if self._wal.pending:
+                with self._wal.lock(exclusive=True):
+                    self._write_log()
+            self._wal.commit()
+        except OSError as e:
+            print_error(f"Ошибка при записи журнала изменений: {e}")
+            return False
+        return True
+
+    def checkpoint(self):
+        """
+        Переносит изменения из журнала и остальные несохраненные изменения
+        в файлы таблиц и метаданных и начинает новое поколение журнала.
+        Если перенести изменения не удалось, журнал сохраняется.
+        Внутри транзакции откладывается до ее завершения.
+        """
+
+        return self._checkpoint()
+
+    def recover(self):
+        """
+        Переносит в файлы таблиц изменения, оставшиеся в журнале после
+        завершения процессов (в том числе аварийного). Изменения, которые
+        уже есть в файлах, повторно не применяются. Возвращает
+        количество перенесенных записей журнала.
+        """
+
+        with self._wal.lock(exclusive=True):
+            self._read_log()
+            recovered_count = self._wal.entry_count
+            if recovered_count:
+                self._checkpoint()
+
+        return recovered_count
+
+    def flush(self, table_formats=None):
+        """
+        Записывает на диск все несохраненные изменения, в том числе
+        изменения других процессов из журнала: таблицы с ними
+        загружаются в кэш. table_formats - форматы снимков таблиц,
+        отличные от форматов из метаданных. Вызывается на контрольной
+        точке под исключительной блокировкой журнала.
+        Возвращает True, если все изменения сохранены.
+        """
+
+        success = True
+        table_formats = table_formats or {}
+        metadata = self.get_metadata()
+
+        for table_name in sorted(self._logged_tables & set(metadata)):
+            self.get_table(table_name)
+
+        for table_name in list(self._tables):
+            entry = self._tables.get(table_name)
+            # Изменения таблицы, удаленной другим процессом, не записываются
+            if entry is None or table_name not in metadata:
+                continue
+            if not entry.needs_flush() and table_name not in table_formats:
+                continue
+
+            with table_lock(table_name, exclusive=True):
+                if not self._flush_table(
+                    table_name, entry, table_formats.get(table_name)
+                ):
+                    success = False
+
+        # Метаданные записываются, только если изменились схема или
+        # настройки таблиц. Файл перечитывается под блокировкой, и в нем
+        # заменяются только измененные таблицы.
+        if self._metadata_dirty and not get_changed_tables(
+            self._metadata_base, self._metadata
+        ):
+            self._metadata_dirty = False
+
+        if self._metadata_dirty:
+            with file_lock(f"{self.metadata_file}.lock", exclusive=True):
+                self._reload_metadata(get_file_stamp(self.metadata_file))
+                save_metadata(self.metadata_file, self._metadata)
+                self._metadata_dirty = False
+                self._metadata_stamp = get_file_stamp(self.metadata_file)
+                self._metadata_base = copy.deepcopy(self._metadata)
+
+        self._evict()
+        return success
+
+    def _flush_table(self, table_name, entry, table_format=None):
+        """
+        Записывает изменения таблицы (снимок - в формате table_format,
+        по умолчанию в формате из метаданных); вызывается под
+        исключительной блокировкой таблицы. Возвращает True при успехе.
+        """
+
+        metadata = self.get_metadata()
+        if table_format is None:
+            table_format = get_table_options(metadata, table_name).get('format', 'json')
+
+        if entry.dirty:
+            # На диск попадают только неудаленные записи, а индексы
+            # сохраняются заново для нового снимка
+            entry.data.compact()
+            saved = save_table_data(
+                table_name,
+                entry.data.to_records(),
+                table_format,
+                metadata.get(table_name),
+            )
+            entry.unsaved_indexes.update(entry.data.indexes)
+        elif entry.appended:
+            saved = append_table_records(table_name, entry.appended)
+        else:
+            saved = None
+
+        if saved is False:
+            return False
+
+        if saved:
+            # Статистика уже учитывает все изменения, она только
+            # отмечается актуальной для записанных файлов
+            entry.dirty = False
+            entry.appended = []
+            entry.stamp = get_table_stamp(table_name)
+            entry.size = get_stamp_size(entry.stamp)
+            self._update_stats(table_name, entry, recompute=False)
+
+        # Статистика сохраняется после данных, чтобы соответствовать
+        # записанным файлам
+        if entry.unsaved_stats:
+            if not save_table_stats(table_name, entry.data.stats):
+                return False
+            entry.unsaved_stats = False
+
+        return self._save_indexes(table_name, entry)
+
+    def compact(self, table_name):
+        """
+        Переносит журнал добавлений в снимок таблицы.
+        Возвращает количество перенесенных записей или None при ошибке.
+        """
+
+        # Несохраненные записи должны попасть в журнал до его переноса
+        if not self.checkpoint():
+            return None
+
+        log_count = len(load_table_log(table_name))
+        if not log_count:
+            return 0
+
+        self.mark_dirty(table_name)
+        if not self.checkpoint():
+            return None
+        return log_count
+
+    def close(self):
+        """
+        Переносит изменения в файлы таблиц перед выходом.
+        Незавершенная транзакция отменяется.
+        """
+
+        if self._transaction is not None:
+            self.rollback_transaction()
+
+        success = self.checkpoint()
+        for table_name in list(self._tables):
+            if not self._discard(table_name):
+                success = False
+        self._wal.close()
+        return success
+
+    def _checkpoint(self, table_formats=None):
+        if self._transaction is not None:
+            return True
+
+        try:
+            with self._wal.lock(exclusive=True):
+                # Изменения попадают в журнал раньше, чем в файлы таблиц
+                self._write_log()
+                self._wal.sync()
+
+                if not self.flush(table_formats):
+                    return False
+
+                sync_table_logs()
+                self._wal.reset()
+                self._read_log()
+        except OSError as e:
+            print_error(f"Ошибка при записи журнала изменений: {e}")
+            return False
+
+        self._checkpoint_needed = False
+        return True
+
+    def _write_log(self):
+        """
+        Дописывает в журнал изменения процесса после изменений других
+        процессов. Вызывается под исключительной блокировкой журнала.
+        """
+
+        if self._wal.pending:
+            self._wal.create()
+
+        # Изменения процесса повторяются поверх изменений других
+        # процессов, чтобы порядок изменений в памяти совпал с журналом
+        touched = self._read_log()
+        for wal_entry in self._wal.pending:
+            self._apply(wal_entry, tables=touched, track=False)
+
+        for wal_entry in self._wal.write():
+            self._logged_tables.update(get_entry_tables(wal_entry))
+
+    def _read_log(self):
+        """
+        Применяет к таблицам в кэше еще не прочитанные записи журнала
+        и переходит к новому поколению журнала после контрольной точки.
+        Вызывается под блокировкой журнала. Возвращает имена таблиц,
+        к которым применены записи.
+        """
+
+        touched = set()
+
+        while True:
+            generation = self._wal.generation
+            for start, _, wal_entry in self._wal.read():
+                self._logged_tables.update(get_entry_tables(wal_entry))
+                touched |= self._apply(wal_entry, log_position=(generation, start))
+
+            header = self._wal.switch()
+            if header is None:
+                return touched
+            self._switch_generation(generation, header['generation'])
+
+    def _switch_generation(self, drained, generation):
+        """
+        Переходит к новому поколению журнала. В кэше остаются таблицы,
+        уже прочитанные вместе с новым поколением, и таблицы, файлы
+        которых контрольная точка не меняла, если процесс дочитал
+        предыдущее поколение. Остальные таблицы читаются заново при
+        обращении к ним.
+        """
+
+        self._logged_tables = set()
+
+        for table_name, entry in list(self._tables.items()):
+            if entry.position[0] >= generation:
+                continue
+
+            if entry.position[0] == drained == generation - 1 and (
+                entry.stamp == get_table_stamp(table_name)
+            ):
+                entry.position = (generation, 0)
+                entry.dirty = False
+                entry.appended = []
+            else:
+                self._discard(table_name)
+
+        # Изменения процесса, которые еще не записаны в журнал
+        for wal_entry in self._wal.pending:
+            self._track(wal_entry)
+
+    def _log(self, wal_entry):
+        self._track(wal_entry)
+        if self._transaction is not None:
+            self._transaction_log.append(wal_entry)
+        else:
+            self._wal.append(wal_entry)
+
+    def _track(self, wal_entry):
+        """
+        Отмечает, как перенести изменение в файлы таблицы: добавленные
+        записи дописываются в журнал таблицы, после остальных изменений
+        снимок перезаписывается целиком
+        """
+
+        if wal_entry['op'] == 'transaction':
+            for transaction_entry in wal_entry['entries']:
+                self._track(transaction_entry)
+            return
+
+        table_name = wal_entry['table']
+        entry = self._tables.get(table_name)
+        if entry is None:
+            return
+
+        if wal_entry['op'] != 'insert':
+            self._mark_changed(table_name)
+        elif not entry.dirty:
+            entry.appended.extend(wal_entry['records'])
+
+    def _mark_changed(self, table_name):
+        entry = self._tables[table_name]
+        entry.dirty = True
+        entry.appended = []
+
+    def _apply(self, wal_entry, log_position=None, tables=None, track=True):
+        """
+        Применяет запись журнала к таблицам в кэше (если задано tables -
+        только к ним). Запись с позицией log_position раньше позиции
+        таблицы уже учтена в ней. Записи с уже существующими ID не добавляются,
+        отсутствующие ID пропускаются, поэтому повторное применение
+        не меняет результат. Возвращает имена измененных таблиц.
+        """
+
+        if wal_entry['op'] == 'transaction':
+            return set().union(*(
+                self._apply(transaction_entry, log_position, tables, track)
+                for transaction_entry in wal_entry['entries']
+            ))
+
+        table_name = wal_entry['table']
+        entry = self._tables.get(table_name)
+        self._mapped.pop(table_name, None)
+        if (
+            entry is None
+            or (tables is not None and table_name not in tables)
+            or (log_position is not None and log_position < entry.position)
+        ):
+            return set()
+
+        table = entry.data
+
+        match wal_entry['op']:
+            case 'insert':
+                records = [
+                    record for record in wal_entry['records']
+                    if table.find_position(record['ID']) is None
+                ]
+                if not records:
+                    return set()
+                table.extend(records)
+                if table.stats is not None:
+                    add_records(table.stats, records)
+                wal_entry = dict(wal_entry, records=records)
+
+            case 'update':
+                values = wal_entry['values']
+                for record_id in wal_entry['ids']:
+                    position = table.find_position(record_id)
+                    if position is None:
+                        continue
+                    for column, value in values.items():
+                        if column != 'ID':
+                            table.set_value(position, column, value)
+                if table.stats is not None:
+                    update_values(table.stats, values)
+
+            case 'delete':
+                deleted_count = 0
+                for record_id in wal_entry['ids']:
+                    position = table.find_position(record_id)
+                    if position is not None:
+                        table.remove(position)
+                        deleted_count += 1
+                if table.stats is not None:
+                    table.stats['rows'] -= deleted_count
+
+        if track:
+            self._track(wal_entry)
+        return {table_name}
+
+    def _load_last_id(self, table_name):
+        table = self.get_table(table_name)
+        entry = self._tables[table_name]
+
+        if entry.last_id is None:
+            entry.last_id = load_last_id(table_name)
+            entry.reserved_id = entry.last_id
+
+        if entry.last_id is None:
+            # Счетчик восстанавливается по уже загруженным данным
+            entry.last_id = table.max_id()
+
+        return entry
+
+    def _reserve_block(self, table_name, entry, count):
+        """
+        Резервирует в файле счетчика блок ID после последнего выданного.
+        Если счетчик сдвинул другой процесс, блок начинается после
+        зарезервированных им ID.
+        """
+
+        with table_lock(table_name, exclusive=True):
+            stored_id = load_last_id(table_name)
+            if stored_id is not None and stored_id != entry.reserved_id:
+                entry.last_id = max(entry.last_id, stored_id)
+
+            reserved_id = entry.last_id + count + ID_BLOCK_SIZE
+            save_last_id(table_name, reserved_id)
+            entry.reserved_id = reserved_id
+
+    def _release_ids(self, table_name, entry):
+        """
+        Возвращает в счетчик неиспользованные ID блока, если после
+        него другие процессы ID не резервировали
+        """
+
+        if entry.reserved_id in (None, entry.last_id):
+            return
+
+        with table_lock(table_name, exclusive=True):
+            if load_last_id(table_name) == entry.reserved_id:
+                save_last_id(table_name, entry.last_id)
+        entry.reserved_id = entry.last_id
+
+    def _reload_metadata(self, stamp):
+        """
+        Перечитывает метаданные. Несохраненные изменения таблиц
+        переносятся в прочитанную версию.
+        """
+
+        metadata = load_metadata(self.metadata_file)
+        base = copy.deepcopy(metadata)
+
+        # Таблицы, схему или настройки которых изменил другой процесс,
+        # читаются заново
+        if self._metadata_base is not None:
+            for table_name in get_changed_tables(self._metadata_base, base):
+                if table_name not in (self._transaction or ()):
+                    self._tables.pop(table_name, None)
+                    self._mapped.pop(table_name, None)
+
+        if self._metadata_dirty:
+            changed_tables = get_changed_tables(self._metadata_base, self._metadata)
+            merge_table_metadata(metadata, self._metadata, changed_tables)
+
+        self._metadata = metadata
+        self._metadata_base = base
+        self._metadata_stamp = stamp
+
+    def _update_stats(self, table_name, entry, recompute=True):
+        """
+        Пересчитывает (или только отмечает актуальной для текущих файлов)
+        статистику таблицы. Сохраняется при flush().
+        """
+
+        metadata = self.get_metadata()
+        if table_name not in metadata:
+            return
+
+        stats = entry.data.stats
+        if recompute or stats is None:
+            stats = compute_stats(metadata[table_name], entry.data)
+
+        stats['bytes'] = entry.size
+        stats['snapshot'] = get_snapshot_stamp(entry.stamp, with_log=True)
+        entry.data.stats = stats
+        entry.unsaved_stats = True
+
+    def _estimate_size(self, entry):
+        """
+        Размер файлов таблицы с учетом записей, еще не дописанных
+        в журнал таблицы
+        """
+
+        appended_size = sum(
+            len(json.dumps(record, ensure_ascii=False).encode('utf-8')) + 1
+            for record in entry.appended
+        )
+        return entry.size + appended_size
+
+    def _load_indexes(self, table_name, entry):
+        """
+        Загружает индексы таблицы. Индекс, сохраненный для другой версии
+        снимка, строится заново; записи из журнала добавляются в индекс.
+        """
+
+        table = entry.data
+        snapshot_stamp = get_snapshot_stamp(entry.stamp)
+
+        table_indexes = get_table_indexes(self.get_metadata(), table_name)
+
+        for column, kind in table_indexes.items():
+            index = self._load_saved_index(
+                table_name, column, kind, table, snapshot_stamp
+            )
+            if index is not None:
+                table.indexes[column] = index
+            else:
+                table.add_index(column, kind)
+                entry.unsaved_indexes.add(column)
+
+    def _load_saved_index(self, table_name, column, kind, table, snapshot_stamp):
+        """
+        Загружает индекс, сохраненный для снимка snapshot_stamp, и добавляет
+        в него записи из журнала. Возвращает None, если индекса нет или
+        он сохранен для другой версии снимка.
+        """
+
+        index_data = load_index_data(table_name, column)
+
+        if (
+            index_data is None
+            or index_data.get('kind', 'hash') != kind
+            or index_data.get('snapshot') != snapshot_stamp
+            or index_data['rows'] > table.position_count()
+        ):
+            return None
+
+        index = index_from_dict(index_data)
+        index.extend(table)
+        return index
+
+    def _save_indexes(self, table_name, entry):
+        """
+        Сохраняет измененные индексы вместе с отметкой снимка таблицы
+        """
+
+        if not entry.unsaved_indexes:
+            return True
+
+        snapshot_stamp = get_snapshot_stamp(entry.stamp)
+
+        for column in list(entry.unsaved_indexes):
+            index_data = entry.data.indexes[column].to_dict()
+            index_data['snapshot'] = snapshot_stamp
+            if not save_index_data(table_name, column, index_data):
+                return False
+            entry.unsaved_indexes.discard(column)
+
+        return True
+
+    def _evict(self):
+        """
+        Вытесняет давно не использованные таблицы без изменений,
+        пока кэш превышает ограничение по размеру
+        """
+
+        total_size = sum(entry.size for entry in self._tables.values())
+
+        # Последнюю использованную таблицу не вытесняем
+        for table_name in list(self._tables)[:-1]:
+            if total_size <= self.max_bytes:
+                break
+
+            entry = self._tables[table_name]
+            if entry.has_changes() or table_name in (self._transaction or ()):
+                continue
+
+            total_size -= entry.size
+            self._discard(table_name)
+
+    def _discard(self, table_name):
+        """
+        Удаляет таблицу из кэша и возвращает в счетчик неиспользованные
+        ID ее блока. Возвращает False, если счетчик не удалось сохранить.
+        """
+
+        entry = self._tables.pop(table_name)
+        self._mapped.pop(table_name, None)
+
+        try:
+            self._release_ids(table_name, entry)
+        except OSError as e:
+            print_error(f"Ошибка при сохранении счетчика ID {table_name}: {e}")
+            return False
+        return True
@@ -0,0 +1,150 @@
+import json
+import queue
+import socket
+import threading
+from contextlib import contextmanager
+
+
+class QueryError(Exception):
+    """
+    Команда завершилась с ошибкой; result - ответ сервера
+    """
+
+    def __init__(self, result):
+        super().__init__("\n".join(result.get('output', ())) or "Ошибка запроса")
+        self.result = result
+
+
+class Connection:
+    """
+    Соединение с сервером базы данных (database serve) через Unix-сокет
+    socket_path или по TCP с host:port
+    """
+
+    def __init__(self, socket_path=None, host=None, port=None, timeout=None):
+        if socket_path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            try:
+                self._socket.connect(socket_path)
+            except OSError:
+                self._socket.close()
+                raise
+        else:
+            self._socket = socket.create_connection(
+                (host or '127.0.0.1', port), timeout=timeout
+            )
+        self._file = self._socket.makefile('rwb')
+
+    def execute(self, command):
+        """
+        Выполняет команду и возвращает ответ сервера:
+        {'ok', 'output', 'columns', 'rows'}
+        """
+
+        request = json.dumps({'command': command}, ensure_ascii=False)
+        self._file.write(request.encode() + b'\n')
+        self._file.flush()
+
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("Сервер закрыл соединение")
+        return json.loads(line)
+
+    def query(self, command):
+        """
+        Выполняет команду и возвращает записи select списком словарей.
+        Если команда завершилась с ошибкой, вызывает QueryError.
+        """
+
+        result = self.execute(command)
+        if not result['ok']:
+            raise QueryError(result)
+        columns = result['columns']
+        return [dict(zip(columns, row)) for row in result['rows']]
+
+    def close(self):
+        try:
+            self._file.close()
+        finally:
+            self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Пул соединений с сервером для нескольких потоков. Соединения
+    создаются по мере необходимости, но не больше size одновременно;
+    освобожденные соединения используются повторно.
+    """
+
+    def __init__(self, socket_path=None, host=None, port=None, size=4, timeout=None):
+        self._connect_args = (socket_path, host, port, timeout)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @contextmanager
+    def connection(self):
+        """
+        Выдает соединение на время блока with. Транзакцию, начатую
+        в соединении, нужно завершить внутри блока.
+        """
+
+        connection = self._acquire()
+        try:
+            yield connection
+        except (OSError, ValueError):
+            # Соединение в неизвестном состоянии не возвращается в пул
+            self._release(connection, broken=True)
+            raise
+        except BaseException:
+            self._release(connection)
+            raise
+        else:
+            self._release(connection)
+
+    def execute(self, command):
+        with self.connection() as connection:
+            return connection.execute(command)
+
+    def query(self, command):
+        with self.connection() as connection:
+            return connection.query(command)
+
+    def close(self):
+        """
+        Закрывает свободные соединения; занятые закрываются при возврате
+        """
+
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        try:
+            return Connection(*self._connect_args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _release(self, connection, broken=False):
+        if broken or self._closed:
+            connection.close()
+        else:
+            self._idle.put(connection)
+        self._slots.release()
@@ -1,7 +1,32 @@
 import copy
+import heapq
+from itertools import islice
 
 from prettytable import PrettyTable
 
+from .aggregate import aggregate, aggregate_from_indexes, aggregate_rows
+from .index import find_index
+from .parallel import is_enabled, parallel_aggregate, parallel_positions
+from .parser import PARAMETER, PARAMETER_MARK
+from .predicate import compile_predicate, equality_terms, range_terms
+from .stats import RANGE_SCAN_MAX_FRACTION, range_fraction
+from .utils import (
+    TABLE_OPTIONS_KEY,
+    get_table_names,
+    print_error,
+    remove_table_options,
+)
+from .vectorized import (
+    condition_mask,
+    mask_ids,
+    mask_positions,
+    masked_delete,
+    masked_update,
+)
+
+# Количество строк, которое форматируется и выводится за один раз
+DISPLAY_CHUNK_ROWS = 50
+
 
 def create_table(metadata, table_name, columns):
     """
@@ -16,7 +41,11 @@ def create_table(metadata, table_name, columns):
         dict: Обновленные метаданные или исходные метаданные в случае ошибки
     """
     if table_name in metadata:
-        print(f"Ошибка: Таблица '{table_name}' уже существует")
+        print_error(f"Ошибка: Таблица '{table_name}' уже существует")
+        return metadata
+
+    if table_name == TABLE_OPTIONS_KEY:
+        print_error(f"Ошибка: Имя '{table_name}' зарезервировано")
         return metadata
 
     new_metadata = copy.deepcopy(metadata)
@@ -26,7 +55,7 @@ def create_table(metadata, table_name, columns):
         col_type = col_type.lower().strip()
 
         if col_type not in ["int", "str", "bool"]:
-            print(
+            print_error(
                 f"Ошибка: Неподдерживаемый тип данных '{col_type}' "
                 f"для столбца '{col_name}'. "
                 f"Поддерживаемые типы: int, str, bool"
@@ -34,7 +63,9 @@ def create_table(metadata, table_name, columns):
             return metadata
 
         if col_name in table_columns:
-            print(f"Ошибка: Столбец с именем '{col_name}' уже существует в таблице")
+            print_error(
+                f"Ошибка: Столбец с именем '{col_name}' уже существует в таблице"
+            )
             return metadata
 
         table_columns[col_name] = col_type
@@ -57,10 +88,11 @@ def drop_table(metadata, table_name):
     """
 
     if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return metadata
 
     del metadata[table_name]
+    remove_table_options(metadata, table_name)
     print(f"Таблица '{table_name}' успешно удалена")
     return metadata
 
@@ -71,153 +103,449 @@ def list_tables(metadata):
     Args:
         metadata (dict): Метаданные базы данных
     """
-    if not metadata:
+    if not get_table_names(metadata):
         print("В базе данных нет таблиц.")
         return
     
     print("Таблицы в базе данных:")
-    for i, table_name in enumerate(metadata.keys(), 1):
+    for i, table_name in enumerate(get_table_names(metadata), 1):
         print(f"{i}. {table_name}")
         
-def create_insert_function(get_next_id):
+def convert_column_value(col_name, col_type, value):
     """
-    Создает функцию insert с доступом к генератору ID
+    Преобразует строковое значение к типу столбца.
+    При ошибке выбрасывает ValueError с текстом сообщения.
     """
-    
-    def insert(metadata: dict, table_name: str, values: list):
 
-        """
-        Добавляет новую запись в таблицу
-        """
-        
-        table_schema = metadata[table_name]
-        expected_columns = [col for col in table_schema.keys() if col != 'ID']
-            
-        next_id = get_next_id(table_name)
-        
-        new_record = {'ID': next_id}
-        for i, col_name in enumerate(expected_columns):
-            value = values[i]
-            col_type = table_schema[col_name]
-            
+    if value == PARAMETER_MARK:
+        return PARAMETER
+
+    match col_type:
+        case 'int':
             try:
-                match col_type:
-                    case 'int':
-                        new_record[col_name] = int(value)
-                    case 'bool':
-                        if value.lower() in ['true', '1', 'yes']:
-                            new_record[col_name] = True
-                        elif value.lower() in ['false', '0', 'no']:
-                            new_record[col_name] = False
-                        else:
-                            print(
-                                f"Ошибка: Некорректное булево значение "
-                                f"'{value}' для столбца '{col_name}'"
-                                )
-                            return None
-                    case 'str':  
-                            new_record[col_name] = value
-                    case _:
-                        print(f"Ошибка: Неверный тип данных для столбца '{col_name}'")
-                        return None
+                return int(value)
             except ValueError:
-                print(
-                    f"Ошибка: Некорректное значение '{value}' "
+                raise ValueError(
+                    f"Некорректное значение '{value}' "
                     f"для столбца '{col_name}' типа {col_type}"
+                )
+        case 'bool':
+            if value.lower() in ['true', '1', 'yes']:
+                return True
+            elif value.lower() in ['false', '0', 'no']:
+                return False
+            raise ValueError(
+                f"Некорректное булево значение "
+                f"'{value}' для столбца '{col_name}'"
+            )
+        case 'str':
+            return value
+        case _:
+            raise ValueError(f"Неверный тип данных для столбца '{col_name}'")
+
+def convert_record(table_schema, values):
+    """
+    Преобразует значения команды insert (по порядку столбцов схемы
+    без ID) к типам столбцов. Возвращает запись без ID или None
+    при ошибке.
+    """
+
+    expected_columns = [col for col in table_schema.keys() if col != 'ID']
+
+    new_record = {}
+    for i, col_name in enumerate(expected_columns):
+        try:
+            new_record[col_name] = convert_column_value(
+                col_name, table_schema[col_name], values[i]
+            )
+        except ValueError as e:
+            print_error(f"Ошибка: {e}")
+            return None
+
+    return new_record
+
+def build_records(table_schema, rows):
+    """
+    Преобразует строки загружаемого файла в записи таблицы.
+
+    Args:
+        table_schema (dict): Схема таблицы
+        rows: Итератор пар (номер_строки, {столбец: значение})
+
+    Returns:
+        list: Записи с незаполненным ID или None при первой ошибке
+    """
+
+    columns = {col.lower(): col for col in table_schema if col != 'ID'}
+    records = []
+
+    for line_number, row in rows:
+        values = {}
+
+        for key, value in row.items():
+            if key is None:
+                print_error(f"Ошибка в строке {line_number}: Лишние значения {value}")
+                return None
+
+            col_name = columns.get(key.lower())
+            if col_name is None:
+                if key.lower() == 'id':
+                    print_error("Ошибка: Столбец ID заполняется автоматически")
+                else:
+                    print_error(
+                        f"Ошибка в строке {line_number}: "
+                        f"Столбец '{key}' не существует в таблице"
                     )
                 return None
-        
-        return new_record
-    
-    return insert
 
-def select(table_data, where_clause =  None):
+            if value is None:
+                print_error(
+                    f"Ошибка в строке {line_number}: "
+                    f"Отсутствует значение для столбца '{col_name}'"
+                )
+                return None
+
+            try:
+                values[col_name] = convert_column_value(
+                    col_name, table_schema[col_name], str(value)
+                )
+            except ValueError as e:
+                print_error(f"Ошибка в строке {line_number}: {e}")
+                return None
+
+        if len(values) != len(columns):
+            missing = [col for col in columns.values() if col not in values]
+            print_error(
+                f"Ошибка в строке {line_number}: "
+                f"Отсутствуют значения для столбцов: {', '.join(missing)}"
+            )
+            return None
+
+        record = {'ID': None}
+        for col_name in columns.values():
+            record[col_name] = values[col_name]
+        records.append(record)
+
+    return records
+
+def candidate_positions(table, condition):
+    """
+    Возвращает позиции записей, которые нужно проверить условием WHERE.
+    Равенство по ID и по индексированному столбцу и узкий диапазон
+    значений столбца с упорядоченным индексом, обязательные для всех
+    подходящих записей, обходятся без полного просмотра таблицы.
+    """
+
+    positions = indexed_positions(table, condition)
+    return table.positions() if positions is None else positions
+
+def indexed_positions(table, condition):
+    """
+    Возвращает позиции записей, найденные по ID или индексу,
+    или None, если для условия нужен полный просмотр таблицы
+    """
+
+    if condition is None:
+        return None
+
+    terms = equality_terms(condition)
+
+    if 'ID' in terms:
+        position = table.find_position(terms['ID'])
+        return [] if position is None else [position]
+
+    index, value = find_index(table.indexes, terms)
+    if index is not None:
+        return index.lookup(value)
+
+    for column, bounds in range_terms(condition).items():
+        index = table.indexes.get(column)
+        if index is None or index.kind != 'sorted':
+            continue
+
+        # Широкий диапазон (по статистике таблицы) выгоднее просмотреть целиком
+        fraction = range_fraction(table.stats, column, bounds)
+        if fraction is not None and fraction > RANGE_SCAN_MAX_FRACTION:
+            continue
+
+        # Записи выдаются в порядке позиций, как при полном просмотре
+        return sorted(index.range(*bounds))
+
+    return None
+
+def scan_mask(table, condition):
+    """
+    Возвращает маску подходящих записей (см. vectorized.py), если
+    условие проверяется полным просмотром таблицы и его можно
+    вычислить сразу для всех записей, иначе None
+    """
+
+    if condition is not None and indexed_positions(table, condition) is not None:
+        return None
+    return condition_mask(table, condition)
+
+def matching_positions(table, condition, parallel=True):
+    """
+    Возвращает позиции записей, удовлетворяющих условию WHERE,
+    по мере их нахождения. Если parallel и таблица большая, полный
+    просмотр выполняется в нескольких процессах (см. parallel.py).
+    """
+
+    if condition is None:
+        return table.positions()
+
+    positions = indexed_positions(table, condition)
+    return _scan_positions(table, condition, positions, parallel)
+
+def _scan_positions(table, condition, positions, parallel=True):
+    """
+    Проверяет условие по найденным через индекс позициям или,
+    если их нет (None), по всей таблице
+    """
+
+    if positions is None:
+        mask = condition_mask(table, condition)
+        if mask is not None:
+            return mask_positions(mask)
+
+        if parallel and is_enabled(table):
+            positions = parallel_positions(table, condition)
+            if positions is not None:
+                return positions
+
+        positions = table.positions()
+
+    return filter(compile_predicate(condition, table), positions)
+
+def ordered_positions(table, condition, order_by, limit=None):
+    """
+    Возвращает позиции подходящих записей, упорядоченные по столбцу.
+    По упорядоченному индексу записи обходятся сразу в нужном порядке
+    (с учетом диапазона из условия) по мере чтения результата. Иначе
+    подходящие записи сортируются, а при заданном limit выбираются
+    первые limit из них.
     """
-    Выбирает записи из таблицы с возможностью фильтрации
+
+    column, descending = order_by
+    test = compile_predicate(condition, table) if condition else None
+    index = table.indexes.get(column)
+
+    if index is not None and index.kind == 'sorted':
+        bounds = range_terms(condition).get(column, (None, True, None, True))
+        positions = index.range(*bounds, descending=descending)
+        if test is not None:
+            positions = filter(test, positions)
+        return positions
+
+    positions = matching_positions(table, condition)
+    get = table.column_getter(column)
+
+    def key(position):
+        # Позиция упорядочивает равные значения так же, как в индексе
+        return get(position), position
+
+    if limit is None:
+        return sorted(positions, key=key, reverse=descending)
+    if descending:
+        return heapq.nlargest(limit, positions, key=key)
+    return heapq.nsmallest(limit, positions, key=key)
+
+def select(
+    table_data, condition = None, order_by = None, limit = None, offset = 0,
+    columns = None,
+):
+    """
+    Выбирает записи из таблицы с возможностью фильтрации,
+    сортировки (order_by - пара (столбец, по_убыванию)), пропуска
+    offset записей и ограничения их количества. Если задан список
+    columns, записи содержат только эти столбцы и остальные столбцы
+    не читаются.
+
+    Возвращает итератор записей: таблица просматривается по мере чтения
+    результата и просмотр прекращается, как только набрано нужное
+    количество записей.
     """
     
     if not table_data:
-        return []
-    
-    if where_clause is None:
-        return table_data
-    
-    filtered_data = []
-    for record in table_data:
-        equally = True
-        for key, value in where_clause.items():
-            if key.lower() not in record or record[key.lower()] != value:
-                equally = False
-                break
-        if equally:
-            filtered_data.append(record)
+        return iter(())
+
+    stop = None if limit is None else offset + limit
+
+    if order_by is not None:
+        positions = ordered_positions(table_data, condition, order_by, stop)
+    else:
+        # При ограниченном количестве записей просмотр останавливается
+        # раньше, чем закончился бы просмотр таблицы в нескольких процессах
+        positions = matching_positions(table_data, condition, parallel=stop is None)
     
-    return filtered_data
+    get = table_data.get if columns is None else table_data.row_getter(columns)
+
+    # Словари записей создаются только для выдаваемых позиций
+    return (get(position) for position in islice(positions, offset, stop))
+
+def select_aggregates(table_data, aggregates, condition = None, group_by = ()):
+    """
+    Вычисляет агрегатные функции (список пар (функция, столбец)) по
+    записям, удовлетворяющим условию, с группировкой по столбцам
+    group_by. Без условия результат по возможности берется из счетчика
+    записей и индексов без чтения самих записей.
+    """
+
+    if condition is None:
+        rows = aggregate_from_indexes(table_data, aggregates, group_by)
+        if rows is not None:
+            return rows
+        return _aggregate_scan(table_data, aggregates, condition, group_by)
+
+    positions = indexed_positions(table_data, condition)
+    if positions is None:
+        return _aggregate_scan(table_data, aggregates, condition, group_by)
+
+    positions = _scan_positions(table_data, condition, positions)
+    return aggregate(table_data, positions, aggregates, group_by)
+
+def _aggregate_scan(table_data, aggregates, condition, group_by):
+    """
+    Агрегаты по полному просмотру таблицы: у большой таблицы части
+    просматриваются в нескольких процессах, а состояния объединяются
+    """
+
+    if is_enabled(table_data):
+        groups = parallel_aggregate(table_data, condition, aggregates, group_by)
+        if groups is not None:
+            return aggregate_rows(groups, aggregates, group_by)
 
-def update(table_data, set_clause, where_clause = None):
+    positions = matching_positions(table_data, condition, parallel=False)
+    return aggregate(table_data, positions, aggregates, group_by)
+
+def update(table_data, set_clause, condition = None, changed_ids = None):
     """
-    Обновляет записи в таблице
+    Обновляет записи в таблице. Если передан список changed_ids,
+    в него добавляются ID обновленных записей.
     """
     
-    updated_data = table_data.copy()
     updated_count = 0
 
-    
-    for i, record in enumerate(updated_data):
-        equally = True
-        if where_clause:
-            for key, value in where_clause.items():
-                if key.lower() not in record or record[key.lower()] != value:
-                    equally = False
-                    break
-        
-        if equally:
-            for key, value in set_clause.items():
-                if key.lower() in record and key != 'ID':
-                    updated_data[i][key] = value
-            updated_count += 1
+    # ID не изменяется, остальные столбцы проверены при разборе команды
+    columns = [key for key in set_clause if key != 'ID']
+
+    # Значения проверяются до изменения записей, чтобы ошибка
+    # не оставила таблицу обновленной частично
+    for key in columns:
+        table_data.check_value(key, set_clause[key])
+
+    mask = scan_mask(table_data, condition)
+    if mask is not None:
+        values = {key: set_clause[key] for key in columns}
+        masked_count = masked_update(table_data, mask, values)
+        if masked_count is not None:
+            if changed_ids is not None:
+                changed_ids.extend(mask_ids(table_data, mask))
+            return table_data, masked_count
+
+    # Позиции отбираются до изменений, чтобы изменения не влияли на отбор
+    positions = list(matching_positions(table_data, condition))
+    if changed_ids is not None:
+        changed_ids.extend(table_data.value(position, 'ID') for position in positions)
 
-    return updated_data, updated_count
+    for position in positions:
+        for key in columns:
+            table_data.set_value(position, key, set_clause[key])
+        updated_count += 1
 
-def delete(table_data, where_clause = None):
+    return table_data, updated_count
+
+def delete(table_data, condition = None, changed_ids = None):
     """
-    Удаляет записи из таблицы
+    Удаляет записи из таблицы. Если передан список changed_ids,
+    в него добавляются ID удаленных записей.
     """
 
-    if where_clause is None:
-        return [], len(table_data)
-    
-    remaining_data = []
-    deleted_count = 0
+    if condition is None:
+        if changed_ids is not None:
+            changed_ids.extend(record['ID'] for record in table_data)
+        deleted_count = len(table_data)
+        table_data.clear()
+        return table_data, deleted_count
     
-    for record in table_data:
-        equally = True
-        for key, value in where_clause.items():
-            if key.lower() not in record or record[key.lower()] != value:
-                equally = False
-                break
-        
-        if not equally:
-            remaining_data.append(record)
-        else:
-            deleted_count += 1
+    mask = scan_mask(table_data, condition)
+    if mask is not None:
+        deleted_count = masked_delete(table_data, mask)
+        if deleted_count is not None:
+            # Столбец ID удаленных записей сохраняется до сжатия таблицы
+            if changed_ids is not None:
+                changed_ids.extend(mask_ids(table_data, mask))
+            return table_data, deleted_count
+
+    positions = list(matching_positions(table_data, condition))
+    if changed_ids is not None:
+        changed_ids.extend(table_data.value(position, 'ID') for position in positions)
+
+    for position in positions:
+        table_data.remove(position)
     
-    return remaining_data, deleted_count
+    return table_data, len(positions)
 
-def display_table(data, columns):
+def collect_rows(data, columns, result):
+    """
+    Сохраняет записи в result вместо вывода на экран: имена столбцов
+    в result['columns'], значения - списками в result['rows'].
+    Возвращает количество записей.
     """
-    Отображает данные в виде красивой таблицы
+
+    result['columns'] = list(columns)
+    result['rows'] = [[record.get(col) for col in columns] for record in data]
+    return len(result['rows'])
+
+def display_table(data, columns, pager=None):
+    """
+    Отображает данные в виде красивой таблицы.
+
+    Записи читаются и выводятся частями по DISPLAY_CHUNK_ROWS строк,
+    поэтому первые строки появляются сразу, а в памяти не хранится
+    весь результат. После каждой части, если записи еще остались,
+    вызывается pager(); если он вернет False, вывод прекращается.
+    Возвращает количество выведенных записей.
     """
     
-    if not data:
+    records = iter(data)
+    chunk = list(islice(records, DISPLAY_CHUNK_ROWS))
+
+    if not chunk:
         print("Нет данных для отображения")
-        return
-    
-    table = PrettyTable()
-    table.field_names = columns
-    
-    for record in data:
-        row = [record.get(col, '') for col in columns]
-        table.add_row(row)
-    
-    print(table)
\ No newline at end of file
+        return 0
+
+    # Ширина столбцов не уменьшается от части к части, чтобы части
+    # складывались в одну таблицу
+    widths = {col: len(str(col)) for col in columns}
+    shown = 0
+    last_border = None
+
+    while chunk:
+        table = PrettyTable()
+        table.field_names = columns
+        table.header = last_border is None
+
+        for record in chunk:
+            row = [record.get(col, '') for col in columns]
+            table.add_row(row)
+            for col, value in zip(columns, row):
+                widths[col] = max(widths[col], len(str(value)))
+
+        for col in columns:
+            table.min_width[col] = widths[col]
+
+        lines = table.get_string().splitlines()
+        if lines[0] == last_border:
+            # Верхняя граница совпадает с нижней границей предыдущей части
+            lines = lines[1:]
+        print("\n".join(lines))
+
+        last_border = lines[-1]
+        shown += len(chunk)
+        chunk = list(islice(records, DISPLAY_CHUNK_ROWS))
+
+        if chunk and pager is not None and not pager(shown):
+            break
+
+    return shown
@@ -1,34 +1,86 @@
-import os
+import copy
 import shlex
+import sys
+from itertools import chain, islice
 
 import prompt
 
+from .aggregate import AGGREGATE_FUNCTIONS, aggregate_label
+from .cache import TableCache
 from .core import (
-    create_insert_function,
+    build_records,
+    collect_rows,
+    convert_record,
     create_table,
     delete,
     display_table,
     drop_table,
     list_tables,
     select,
+    select_aggregates,
     update,
 )
+from .index import INDEX_KINDS, INDEXABLE_TYPES
+from .locks import get_lock_waits, table_lock
 from .parser import (
+    condition_columns,
+    convert_condition,
     convert_where_clause,
+    get_where_text,
+    parse_aggregate,
     parse_conditions,
+    parse_group_by,
+    parse_order_by,
+    parse_row_count,
+    parse_where,
     split_by_commas,
+    split_clauses,
     validate_set_conditions,
-    validate_where_conditions,
 )
+from .plans import PlanCache, bind_parameters, count_parameters, mark_parameters
+from .stats import distinct_estimate
+from .table import TABLE_LAYOUTS
 from .utils import (
-    DATA_DIR,
-    METADATA_FILE,
-    get_next_id,
-    load_metadata,
-    load_table_data,
+    TABLE_FORMATS,
+    get_error_count,
+    get_table_indexes,
+    get_table_names,
+    iter_import_rows,
     normalize_table_schema,
-    save_metadata,
-    save_table_data,
+    print_error,
+    remove_table_files,
+    resolve_column_names,
+    set_table_option,
+)
+
+# Кэш метаданных и таблиц на время сессии
+table_cache = TableCache()
+
+# Кэш планов команд insert, select, update и delete
+plan_cache = PlanCache()
+
+# Подготовленные команды (prepare) сеанса: имя -> текст команды с местами
+# для значений. Сервер хранит такой словарь для каждого клиента.
+prepared_statements = {}
+
+
+# Необязательные части команды select
+SELECT_CLAUSES = ("where", "group", "order", "limit", "offset")
+
+# Команды, которые можно подготовить командой prepare
+PREPARABLE_COMMANDS = ("insert", "select", "update", "delete")
+
+# Команды завершения работы
+EXIT_COMMANDS = ["exit", "quit", "выход"]
+
+# Команды, изменяющие схему и файлы таблиц, недоступны внутри транзакции
+NON_TRANSACTIONAL_COMMANDS = (
+    "create_table",
+    "drop_table",
+    "create_index",
+    "convert_table",
+    "set_layout",
+    "compact",
 )
 
 
@@ -41,103 +93,302 @@ def run():
     print("Введите 'help' для просмотра доступных команд.")
     print("Введите 'exit' для выхода из программы.")
 
+    # Постраничный вывод нужен, только если результат читает человек
+    pager = ask_next_page if sys.stdout.isatty() else None
+
+    recover_changes()
+
     while True:
 
         try:
-            metadata = load_metadata(METADATA_FILE)
-
             user_input = prompt.string("\n>>>Введите команду: ").strip()
 
-            if user_input.lower() in ["exit", "quit", "выход"]:
+            if user_input.lower() in EXIT_COMMANDS:
+                table_cache.close()
                 print("До свидания!")
                 break
 
             if not user_input:
                 continue
 
-            args = shlex.split(user_input)
-            command = args[0].lower()
+            execute_command(user_input, pager)
 
-            match command:
+            # Каждая команда фиксируется сразу после выполнения
+            if not table_cache.commit():
+                print_error("Ошибка при сохранении данных")
 
-                case "help":
-                    print_help()
+        except KeyboardInterrupt:
+            table_cache.close()
+            print("\n\nПрограмма прервана пользователем. До свидания!")
+            break
+        except EOFError:
+            table_cache.close()
+            print("\nДо свидания!")
+            break
+        except Exception as e:
+            print_error(f"Произошла непредвиденная ошибка: {e}")
 
-                case "create_table":
-                    if len(args) < 3:
-                        print("Ошибка: Недостаточно аргументов для create_table")
-                        print(
-                            "Использование: create_table <имя_таблицы> "
-                            "<столбец1:тип> <столбец2:тип> ..."
-                        )
-                        continue
 
-                    table_name = args[1]
-                    columns_list = args[2:]
-                    columns_dict = {}
+def recover_changes():
+    """
+    Повторяет изменения, не перенесенные в файлы таблиц из-за
+    аварийного завершения предыдущего запуска
+    """
 
-                    for item in columns_list:
+    recovered_count = table_cache.recover()
+    if recovered_count:
+        print(f"Восстановлено изменений из журнала: {recovered_count}")
 
-                        if ":" not in item:
-                            print(f"Ошибка: Неверный формат '{item}'.")
-                            print("Используйте 'столбец:тип'")
-                            break
-                        col_name, col_type = item.split(":", 1)
-                        col_type = col_type.lower().strip()
 
-                        columns_dict[col_name] = col_type
+def ask_next_page(shown_count):
+    """
+    Спрашивает, выводить ли следующую страницу результата
+    """
 
-                    new_metadata = create_table(metadata, table_name, columns_dict)
+    answer = prompt.string(
+        f"-- Показано записей: {shown_count}. "
+        "Enter - продолжить, q - прервать вывод: "
+    )
+    return answer.strip().lower() not in ("q", "й")
 
-                    if new_metadata != metadata:
-                        save_metadata(METADATA_FILE, new_metadata)
 
-                case "drop_table":
-                    if len(args) < 2:
-                        print("Ошибка: Недостаточно аргументов для drop_table")
-                        print("Использование: drop_table <имя_таблицы>")
-                        continue
+def run_script(lines, checkpoint=0):
+    """
+    Выполняет команды из файла или стандартного ввода без интерактивного
+    режима.
 
-                    table_name = args[1]
-                    new_metadata = handle_drop_table(metadata, table_name)
-                    save_metadata(METADATA_FILE, new_metadata)
+    Args:
+        lines: Итератор строк с командами (по одной команде на строку)
+        checkpoint (int): Переносить изменения в файлы таблиц каждые
+            checkpoint команд. 0 - только в конце и когда журнал
+            предзаписи переполнен или устарел.
 
-                case "list_tables":
-                    list_tables(metadata)
+    Returns:
+        bool: True, если все изменения сохранены
+    """
 
-                case "insert":
-                    handle_insert(metadata, args)
+    executed_count = 0
+    recover_changes()
 
-                case "select":
-                    handle_select(metadata, args)
+    try:
+        for line in lines:
+            user_input = line.strip().removesuffix(";").strip()
 
-                case "update":
-                    handle_update(metadata, args)
+            # Пустые строки и комментарии пропускаются
+            if not user_input or user_input.startswith(("--", "#")):
+                continue
 
-                case "delete":
-                    handle_delete(metadata, args)
+            if user_input.lower() in EXIT_COMMANDS:
+                break
 
-                case "info":
-                    handle_info(metadata, args)
+            try:
+                execute_command(user_input)
+            except Exception as e:
+                print_error(f"Произошла непредвиденная ошибка: {e}")
 
-                case _:
-                    print(f"Функции '{command}' нет. Попробуйте снова.")
-                    print("Введите 'help' для просмотра доступных команд.")
+            executed_count += 1
+            # Файлы таблиц записываются только на контрольных точках
+            if checkpoint and executed_count % checkpoint == 0:
+                saved = table_cache.checkpoint()
+            else:
+                saved = table_cache.commit()
+            if not saved:
+                print_error("Ошибка при сохранении данных")
 
-        except KeyboardInterrupt:
-            print("\n\nПрограмма прервана пользователем. До свидания!")
-            break
-        except EOFError:
-            print("\nДо свидания!")
-            break
-        except Exception as e:
-            print(f"Произошла непредвиденная ошибка: {e}")
+    except KeyboardInterrupt:
+        print("\nВыполнение прервано пользователем")
+
+    finally:
+        saved = table_cache.close()
+
+    if not saved:
+        print_error("Ошибка при сохранении данных")
+    return saved
+
+
+def execute_command(user_input, pager=None, result=None, prepared=None):
+    """
+    Разбирает и выполняет одну команду. Изменения остаются в кэше
+    до вызова table_cache.commit(). pager вызывается между страницами
+    длинного результата select (см. display_table). Если передан
+    словарь result, записи select сохраняются в него (см. collect_rows),
+    а не выводятся. prepared - подготовленные команды сеанса (по
+    умолчанию prepared_statements).
+
+    Возвращает True, если команда выполнена без ошибок (ни одной
+    ошибки не выведено через print_error).
+    """
+
+    error_count = get_error_count()
+    # Команда выполняется после изменений, зафиксированных другими процессами
+    table_cache.refresh()
+    dispatch_command(user_input, pager, result, prepared)
+    return get_error_count() == error_count
+
+
+def dispatch_command(user_input, pager=None, result=None, prepared=None):
+    """
+    Выполняет команду по ее первому слову (см. execute_command)
+    """
+
+    metadata = table_cache.get_metadata()
+
+    # Повторная команда выполняется по сохраненному плану без разбора
+    plan = plan_cache.get(user_input, metadata)
+    if plan is not None:
+        run_plan(plan, pager, result)
+        return
+
+    # Текст подготавливаемой команды разбирается отдельно (см. handle_prepare)
+    command = user_input.split(None, 1)[0].lower()
+    if prepared is None:
+        prepared = prepared_statements
+    if command == "prepare":
+        handle_prepare(metadata, user_input, prepared)
+        return
+    if command == "execute":
+        handle_execute(metadata, user_input, prepared, pager, result)
+        return
+
+    args = shlex.split(user_input)
+    command = args[0].lower()
+
+    if command in NON_TRANSACTIONAL_COMMANDS and table_cache.in_transaction():
+        print_error(f"Ошибка: Команда '{command}' недоступна внутри транзакции")
+        print("Завершите транзакцию командой commit или rollback")
+        return
+
+    match command:
+
+        case "help":
+            print_help()
+
+        case "begin":
+            handle_begin()
+
+        case "commit":
+            handle_commit()
+
+        case "rollback":
+            handle_rollback()
+
+        case "create_table":
+            if len(args) < 3:
+                print_error("Ошибка: Недостаточно аргументов для create_table")
+                print(
+                    "Использование: create_table <имя_таблицы> "
+                    "<столбец1:тип> <столбец2:тип> ..."
+                )
+                return
+
+            table_name = args[1]
+            columns_list = args[2:]
+            columns_dict = {}
+
+            for item in columns_list:
+
+                if ":" not in item:
+                    print_error(f"Ошибка: Неверный формат '{item}'.")
+                    print("Используйте 'столбец:тип'")
+                    return
+                col_name, col_type = item.split(":", 1)
+                col_type = col_type.lower().strip()
+
+                columns_dict[col_name] = col_type
+
+            new_metadata = create_table(metadata, table_name, columns_dict)
+
+            if new_metadata != metadata:
+                table_cache.set_metadata(new_metadata)
+
+        case "drop_table":
+            if len(args) < 2:
+                print_error("Ошибка: Недостаточно аргументов для drop_table")
+                print("Использование: drop_table <имя_таблицы>")
+                return
+
+            table_name = args[1]
+            new_metadata = handle_drop_table(metadata, table_name)
+            table_cache.set_metadata(new_metadata)
+
+        case "list_tables":
+            list_tables(metadata)
+
+        case "insert" | "select" | "update" | "delete":
+            plan = build_plan(metadata, args, user_input)
+            if plan is not None:
+                plan_cache.put(user_input, plan)
+                run_plan(plan, pager, result)
+
+        case "load":
+            handle_load(metadata, args)
+
+        case "info":
+            handle_info(metadata, args)
+
+        case "lock_stats":
+            handle_lock_stats()
+
+        case "compact":
+            handle_compact(metadata, args)
+
+        case "create_index":
+            new_metadata = handle_create_index(metadata, args)
+            if new_metadata is not None:
+                table_cache.set_metadata(new_metadata)
+
+        case "convert_table":
+            new_metadata = handle_convert_table(metadata, args)
+            if new_metadata is not None:
+                table_cache.set_metadata(new_metadata)
+
+        case "set_layout":
+            new_metadata = handle_set_layout(metadata, args)
+            if new_metadata is not None:
+                table_cache.set_metadata(new_metadata)
+
+        case _:
+            print_error(f"Функции '{command}' нет. Попробуйте снова.")
+            print("Введите 'help' для просмотра доступных команд.")
 
 
 if __name__ == "__main__":
     run()
 
 
+def build_plan(metadata, args, statement):
+    """
+    Разбирает команду insert, select, update или delete и возвращает
+    ее план (см. plans.PlanCache) или None при ошибке
+    """
+
+    match args[0].lower():
+        case "insert":
+            return plan_insert(metadata, args)
+        case "select":
+            return plan_select(metadata, args, statement)
+        case "update":
+            return plan_update(metadata, args, statement)
+        case "delete":
+            return plan_delete(metadata, args, statement)
+
+
+def run_plan(plan, pager=None, result=None):
+    """
+    Выполняет план команды
+    """
+
+    match plan["command"]:
+        case "insert":
+            run_insert(plan)
+        case "select":
+            run_select(plan, pager, result)
+        case "update":
+            run_update(plan)
+        case "delete":
+            run_delete(plan)
+
+
 def print_help():
     """Prints the help message for the current mode."""
 
@@ -154,32 +405,220 @@ def print_help():
         " - создать запись"
     )
     print(
-        "<command> select from <имя_таблицы> where <столбец> = <значение> "
-        "- прочитать записи по условию"
+        "<command> select from <имя_таблицы> where <условие> "
+        "- прочитать записи по условию (=, !=, <, <=, >, >=, IN, BETWEEN, "
+        "AND, OR, NOT)"
+    )
+    print(
+        "<command> select from <имя_таблицы> [where <условие>] order by "
+        "<столбец> [asc|desc] limit <количество> offset <количество> "
+        "- страница записей по порядку"
+    )
+    print(
+        "<command> load <имя_таблицы> from <файл.csv|файл.jsonl> "
+        "- загрузить записи из файла"
     )
     print("<command> select from <имя_таблицы> - прочитать все записи")
+    print(
+        "<command> select <столбец1>, <столбец2> from <имя_таблицы> ... "
+        "- прочитать только указанные столбцы"
+    )
+    print(
+        "<command> select <столбец>, count(*), sum(<столбец>) from <имя_таблицы> "
+        "[where <условие>] group by <столбец> - агрегатные функции "
+        "(count, sum, min, max, avg)"
+    )
     print(
         "<command> update <имя_таблицы> set <столбец1> = <новое_значение1> where "
         "<столбец_условия> = <значение_условия> - обновить запись."
     )
     print(
-        "<command> delete from <имя_таблицы> where <столбец> = <значение> "
+        "<command> delete from <имя_таблицы> where <условие> "
         "- удалить запись"
     )
+    print(
+        "<command> prepare <имя> as <команда> - подготовить insert, select, "
+        "update или delete; ? - место для значения"
+    )
+    print(
+        "<command> execute <имя> (<значение1>, <значение2>, ...) - выполнить "
+        "подготовленную команду"
+    )
     print("<command> info <имя_таблицы> - вывести информацию о таблице")
+    print(
+        "<command> lock_stats - время ожидания блокировок таблиц "
+        "другими процессами"
+    )
+    print(
+        "<command> compact <имя_таблицы> - перенести журнал добавлений "
+        "в файл таблицы"
+    )
+    print(
+        "<command> create_index <имя_таблицы> <столбец> [hash|sorted] - создать "
+        "индекс (sorted - для диапазонов и order by)"
+    )
+    print(
+        "<command> set_layout <имя_таблицы> <rows|columnar> - выбрать "
+        "представление таблицы в памяти"
+    )
+    print(
+        "<command> convert_table <имя_таблицы> <json|binary> - изменить "
+        "формат файла таблицы"
+    )
+
+    print("\n***Транзакции***")
+    print("Функции:")
+    print("<command> begin - начать транзакцию")
+    print("<command> commit - зафиксировать изменения транзакции")
+    print("<command> rollback - отменить изменения транзакции")
 
     print("\nОбщие команды:")
     print("<command> exit - выход из программы")
     print("<command> help - справочная информация\n")
 
 
-def handle_insert(metadata, args):
+def handle_begin():
+    """
+    Обрабатывает команду begin - начинает транзакцию
+    """
+
+    if table_cache.in_transaction():
+        print_error("Ошибка: Транзакция уже начата")
+        return
+
+    table_cache.begin_transaction()
+    print("Транзакция начата")
+
+
+def handle_commit():
+    """
+    Обрабатывает команду commit - фиксирует изменения транзакции
+    """
+
+    if not table_cache.in_transaction():
+        print_error("Ошибка: Нет активной транзакции")
+        return
+
+    if table_cache.commit_transaction():
+        print("Транзакция зафиксирована")
+
+
+def handle_rollback():
+    """
+    Обрабатывает команду rollback - отменяет изменения транзакции
+    """
+
+    if not table_cache.in_transaction():
+        print_error("Ошибка: Нет активной транзакции")
+        return
+
+    table_cache.rollback_transaction()
+    print("Транзакция отменена")
+
+
+def handle_prepare(metadata, user_input, prepared):
+    """
+    Обрабатывает команду prepare в формате: prepare <имя> as <команда>.
+    Знаки ? вне кавычек в команде - места для значений, которые
+    передаются в execute. Команда сохраняется в словаре prepared.
+    """
+
+    parts = user_input.split(None, 3)
+    if len(parts) < 4 or parts[2].lower() != "as":
+        print_error("Ошибка: Недостаточно аргументов для prepare")
+        print("Использование: prepare <имя> as <команда>")
+        return
+
+    name, statement = parts[1].lower(), mark_parameters(parts[3])
+    if statement.split(None, 1)[0].lower() not in PREPARABLE_COMMANDS:
+        print_error(
+            "Ошибка: Подготовить можно только insert, select, update или delete"
+        )
+        return
+
+    try:
+        plan = build_plan(metadata, shlex.split(statement), statement)
+    except ValueError as e:
+        print_error(f"Ошибка при разборе команды: {e}")
+        return
+    if plan is None:
+        return
+
+    plan_cache.put(statement, plan)
+    prepared[name] = statement
+    print(
+        f"Команда '{name}' подготовлена. "
+        f"Параметров: {count_parameters(plan)}"
+    )
+
+
+def handle_execute(metadata, user_input, prepared, pager=None, result=None):
+    """
+    Обрабатывает команду execute в формате: execute <имя> [(<значение1>, ...)].
+    Команда ищется в словаре prepared.
+    """
+
+    parts = user_input.split(None, 2)
+    if len(parts) < 2:
+        print_error("Ошибка: Недостаточно аргументов для execute")
+        print("Использование: execute <имя> [(<значение1>, <значение2>, ...)]")
+        return
+
+    name = parts[1].lower()
+    statement = prepared.get(name)
+    if statement is None:
+        print_error(f"Ошибка: Подготовленная команда '{name}' не найдена")
+        return
+
+    values_str = parts[2].strip() if len(parts) > 2 else ""
+    if values_str and not (values_str.startswith("(") and values_str.endswith(")")):
+        print_error("Ошибка: Значения параметров указываются в скобках")
+        print("Использование: execute <имя> [(<значение1>, <значение2>, ...)]")
+        return
+    values = [strip_quotes(value) for value in split_by_commas(values_str[1:-1])]
+
+    # План перестраивается, если схема таблицы изменилась после prepare
+    plan = plan_cache.get(statement, metadata)
+    if plan is None:
+        plan = build_plan(metadata, shlex.split(statement), statement)
+        if plan is None:
+            return
+        plan_cache.put(statement, plan)
+
+    expected_count = count_parameters(plan)
+    if len(values) != expected_count:
+        print_error("Ошибка: Неверное количество значений параметров")
+        print(f"Ожидается: {expected_count}, получено: {len(values)}")
+        return
+
+    try:
+        plan = bind_parameters(plan, values)
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
+        return
+
+    run_plan(plan, pager, result)
+
+
+def strip_quotes(value):
+    """
+    Убирает кавычки вокруг значения параметра
+    """
+
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+
+def plan_insert(metadata, args):
     """
-    Обрабатывает команду insert в формате: insert into <table> values (val1, val2, ...)
+    Разбирает команду insert в формате:
+    insert into <table> values (val1, val2, ...)
+    Возвращает план команды или None при ошибке.
     """
 
     if len(args) < 5:
-        print("Ошибка: Недостаточно аргументов для insert")
+        print_error("Ошибка: Недостаточно аргументов для insert")
         print(
             "Использование: insert into <имя_таблицы> values "
             "(<значение1>, <значение2>, ...)"
@@ -187,7 +626,7 @@ def handle_insert(metadata, args):
         return
 
     if args[1].lower() != "into":
-        print("Ошибка: Ожидается ключевое слово 'into'")
+        print_error("Ошибка: Ожидается ключевое слово 'into'")
         print(
             "Использование: insert into <имя_таблицы> values "
             "(<значение1>, <значение2>, ...)"
@@ -195,12 +634,12 @@ def handle_insert(metadata, args):
         return
     
     table_name = args[2].lower()
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return
 
     if args[3].lower() != "values":
-        print("Ошибка: Ожидается ключевое слово 'values'")
+        print_error("Ошибка: Ожидается ключевое слово 'values'")
         return
 
     table_schema = metadata[table_name]
@@ -212,15 +651,15 @@ def handle_insert(metadata, args):
     has_closing_bracket = values_str.endswith(')')
     
     if not has_opening_bracket and not has_closing_bracket:
-        print("Ошибка: Отсутствуют скобки вокруг значений")
+        print_error("Ошибка: Отсутствуют скобки вокруг значений")
         print("Использование: values (<значение1>, <значение2>, ...)")
         return
     elif not has_opening_bracket:
-        print("Ошибка: Отсутствует открывающая скобка '('")
+        print_error("Ошибка: Отсутствует открывающая скобка '('")
         print("Использование: values (<значение1>, <значение2>, ...)")
         return
     elif not has_closing_bracket:
-        print("Ошибка: Отсутствует закрывающая скобка ')'")
+        print_error("Ошибка: Отсутствует закрывающая скобка ')'")
         print("Использование: values (<значение1>, <значение2>, ...)")
         return
 
@@ -232,11 +671,11 @@ def handle_insert(metadata, args):
         values = [v.strip() for v in values]
 
     except Exception as e:
-        print(f"Ошибка при разборе значений: {e}")
+        print_error(f"Ошибка при разборе значений: {e}")
         return
 
     if len(values) != len(expected_columns):
-        print("Ошибка: Неверное количество значений")
+        print_error("Ошибка: Неверное количество значений")
         print(
             f"Ожидается: {len(expected_columns)} (столбцы: "
             f"{', '.join(expected_columns)})"
@@ -244,241 +683,479 @@ def handle_insert(metadata, args):
         print(f"Получено: {len(values)}")
         return
 
-    insert = create_insert_function(get_next_id)
-    new_record = insert(metadata, table_name, values)
+    record = convert_record(table_schema, values)
+    if record is None:
+        return
 
-    
-    table_schema = metadata[table_name]
-    expected_columns = [col for col in table_schema.keys() if col != "ID"]
+    return {
+        "command": "insert",
+        "table": table_name,
+        "schema": dict(table_schema),
+        "record": record,
+    }
 
-    if len(values) != len(expected_columns):
-        print("Ошибка: Неверное количество значений")
-        print(
-            f"Ожидается: {len(expected_columns)} (столбцы: "
-            f"{', '.join(expected_columns)})"
-        )
-        print(f"Получено: {len(values)}")
+
+def run_insert(plan):
+    """
+    Выполняет план команды insert
+    """
+
+    # ID выдается только после успешной проверки всех значений
+    new_record = {"ID": table_cache.reserve_ids(plan["table"]), **plan["record"]}
+    try:
+        table_cache.append_record(plan["table"], new_record)
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
         return
+    print(f"Запись успешно добавлена с ID: {new_record['ID']}")
 
-    if new_record:
-        table_data = load_table_data(table_name)
 
-        table_data.append(new_record)
+def handle_load(metadata, args):
+    """
+    Обрабатывает команду load в формате: load <table> from <файл.csv|файл.jsonl>
+    """
 
-        if save_table_data(table_name, table_data):
-            print(f"Запись успешно добавлена с ID: {new_record['ID']}")
-        else:
-            print("Ошибка при сохранении данных")
+    if len(args) < 4:
+        print_error("Ошибка: Недостаточно аргументов для load")
+        print("Использование: load <имя_таблицы> from <файл.csv|файл.jsonl>")
+        return
+
+    table_name = args[1].lower()
 
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
+        return
+
+    if args[2].lower() != "from":
+        print_error("Ошибка: Ожидается ключевое слово 'from'")
+        return
 
-def handle_select(metadata, args):
+    filepath = args[3]
+
+    try:
+        records = build_records(metadata[table_name], iter_import_rows(filepath))
+    except FileNotFoundError:
+        print_error(f"Ошибка: Файл '{filepath}' не найден")
+        return
+    except (OSError, ValueError) as e:
+        print_error(f"Ошибка при чтении файла '{filepath}': {e}")
+        return
+
+    if records is None:
+        return
+
+    if not records:
+        print("Файл не содержит записей")
+        return
+
+    # ID выдаются одним блоком для всех загруженных записей
+    first_id = table_cache.reserve_ids(table_name, len(records))
+    for offset, record in enumerate(records):
+        record['ID'] = first_id + offset
+
+    try:
+        table_cache.append_records(table_name, records)
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
+        return
+    print(f"Загружено записей: {len(records)}")
+
+
+def plan_select(metadata, args, statement):
     """
-    Обрабатывает команду select в формате:
-    select from <table> where <столбец> = <значение>
+    Разбирает команду select в формате:
+    select [<столбец1>, <функция>(<столбец>), ... | *] from <table>
+    [where <условие>] [group by <столбцы>] [order by <столбец> [asc|desc]]
+    [limit <количество>] [offset <количество>]
+    Возвращает план команды или None при ошибке.
     """
     
     if len(args) < 3:
-        print("Ошибка: Недостаточно аргументов для select")
-        print("Использование: select from <имя_таблицы> where <столбец> = <значение>")
+        print_error("Ошибка: Недостаточно аргументов для select")
+        print("Использование: select from <имя_таблицы> where <условие>")
         return
 
-    if args[1].lower() != "from":
-        print("Ошибка: Ожидается ключевое слово 'from'")
+    from_index = next(
+        (i for i, arg in enumerate(args) if arg.lower() == "from"), None
+    )
+    if from_index is None:
+        print_error("Ошибка: Ожидается ключевое слово 'from'")
         return
 
-    if not validate_where_conditions(args, 4): 
-            return
-    
-    table_name = args[2].lower()
+    if from_index + 1 >= len(args):
+        print_error("Ошибка: Отсутствует имя таблицы после 'from'")
+        return
+
+    table_name = args[from_index + 1].lower()
     
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return
 
     table_schema = metadata[table_name]
-    table_schema_norm = normalize_table_schema(table_schema)
 
-    if len(args) == 3:
-        table_data = load_table_data(table_name)
-        if not table_data:
-            print(f"Таблица '{table_name}' пуста")
-            return
-        
-        result_data = select(table_data, None)  
-        columns = list(table_schema)
-        display_table(result_data, columns)
+    columns = resolve_projection(table_name, table_schema, args[1:from_index])
+    if columns is None:
         return
 
-    
-    if args[3].lower() != "where":
-        print("Ошибка: Ожидается ключевое слово 'where'")
-        return
-    
-    if len(args) == 4:
-        print("Ошибка: Отсутствуют условия после 'where'")
-        print("Использование: select from <таблица> where <столбец> = <значение>")
+    clause_index = from_index + 2
+    if len(args) > clause_index and args[clause_index].lower() not in SELECT_CLAUSES:
+        print_error(
+            "Ошибка: Ожидается ключевое слово 'where', 'group', 'order', "
+            "'limit' или 'offset'"
+        )
         return
 
-    where_str = " ".join(args[4:])
-    where_clause = parse_conditions(where_str)
+    _, clauses = split_clauses(statement, SELECT_CLAUSES)
 
-    if where_clause is None:
-        return
+    condition = None
+    if "where" in clauses:
+        if not clauses["where"]:
+            print_error("Ошибка: Отсутствуют условия после 'where'")
+            print("Использование: select from <таблица> where <условие>")
+            return
 
-    for col_name in where_clause.keys():
-        if col_name.lower() not in table_schema_norm:
-            print(
-                f"Ошибка: Столбец '{col_name}' не существует в таблице '{table_name}'"
+        condition = prepare_condition(table_name, table_schema, clauses["where"])
+        if condition is None:
+            return
+
+    order_by = None
+    if "order" in clauses:
+        order_by = parse_order_by(clauses["order"])
+        if order_by is None:
+            return
+
+        column = resolve_column(table_name, table_schema, order_by[0])
+        if column is None:
+            return
+        order_by = (column, order_by[1])
+
+    group_by = []
+    if "group" in clauses:
+        group_columns = parse_group_by(clauses["group"])
+        if group_columns is None:
+            return
+
+        for col_name in group_columns:
+            column = resolve_column(table_name, table_schema, col_name)
+            if column is None:
+                return
+            if column not in group_by:
+                group_by.append(column)
+
+    limit = None
+    if "limit" in clauses:
+        limit = parse_row_count(clauses["limit"], "LIMIT")
+        if limit is None:
+            return
+
+    offset = 0
+    if "offset" in clauses:
+        offset = parse_row_count(clauses["offset"], "OFFSET")
+        if offset is None:
+            return
+    
+    aggregates = [item for item in columns if isinstance(item, tuple)]
+    if aggregates or group_by:
+        if order_by is not None:
+            print_error(
+                "Ошибка: order by не поддерживается вместе с агрегатными функциями"
             )
-            print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
             return
 
-    try:
-        converted_where = convert_where_clause(where_clause, table_schema_norm)
-        where_clause = converted_where
-    except ValueError as e:
-        print(f"Ошибка типов в условии WHERE: {e}")
+        for column in columns:
+            if not isinstance(column, tuple) and column not in group_by:
+                print_error(
+                    f"Ошибка: Столбец '{column}' должен быть указан в group by "
+                    "или использоваться в агрегатной функции"
+                )
+                return
+
+    return {
+        "command": "select",
+        "table": table_name,
+        "schema": dict(table_schema),
+        "columns": columns,
+        "aggregates": aggregates,
+        "condition": condition,
+        "group_by": group_by,
+        "order_by": order_by,
+        "limit": limit,
+        "offset": offset,
+    }
+
+
+def run_select(plan, pager=None, result=None):
+    """
+    Выполняет план команды select. Записи выводятся таблицей или,
+    если передан словарь result, сохраняются в него.
+    """
+
+    if plan["aggregates"] or plan["group_by"]:
+        run_aggregate_select(plan, pager, result)
         return
-    
-    table_data = load_table_data(table_name)
+
+    table_name = plan["table"]
+    columns = plan["columns"]
+    table_data = table_cache.get_table_for_read(table_name)
     
     if not table_data:
         print(f"Таблица '{table_name}' пуста")
         return
     
-    result_data = select(table_data, where_clause)
+    # Если выбраны все столбцы, записи выдаются без копирования
+    projection = None if columns == list(plan["schema"]) else columns
+
+    records = select(
+        table_data, plan["condition"], plan["order_by"], plan["limit"],
+        plan["offset"], projection,
+    )
+    first_record = next(records, None)
+
+    if first_record is None:
+        print("Записи не найдены")
+        return
+
+    records = chain([first_record], records)
+    if result is not None:
+        collect_rows(records, columns, result)
+    else:
+        display_table(records, columns, pager)
 
-    if not result_data:
+
+def run_aggregate_select(plan, pager=None, result=None):
+    """
+    Выполняет select с агрегатными функциями и/или group by
+    """
+
+    table_data = table_cache.get_table_for_read(plan["table"])
+    rows = select_aggregates(
+        table_data, plan["aggregates"], plan["condition"], plan["group_by"]
+    )
+
+    offset, limit = plan["offset"], plan["limit"]
+    stop = None if limit is None else offset + limit
+    rows = list(islice(rows, offset, stop))
+
+    if not rows:
         print("Записи не найдены")
         return
 
-    if table_name in metadata:
-        columns = list(metadata[table_name].keys())
+    labels = [
+        aggregate_label(*column) if isinstance(column, tuple) else column
+        for column in plan["columns"]
+    ]
+    if result is not None:
+        collect_rows(rows, labels, result)
     else:
-        columns = list(result_data[0].keys())
- 
-    display_table(result_data, columns)
+        display_table(rows, labels, pager)
+
+
+def resolve_projection(table_name, table_schema, column_args):
+    """
+    Разбирает список столбцов команды select (через запятую или *).
+    Элемент списка - имя столбца из схемы таблицы или пара
+    (функция, столбец) для агрегатной функции. Возвращает список
+    элементов или None при ошибке.
+    """
+
+    columns_str = " ".join(column_args).strip()
+    if columns_str in ("", "*"):
+        return list(table_schema)
+
+    items = []
+
+    for item_str in split_by_commas(columns_str):
+        item = parse_aggregate(item_str)
+
+        if item is None:
+            item = resolve_column(table_name, table_schema, item_str.strip())
+            if item is None:
+                return None
+        else:
+            function, col_name = item
+            if function not in AGGREGATE_FUNCTIONS:
+                print_error(f"Ошибка: Неизвестная агрегатная функция '{function}'")
+                print(f"Доступные функции: {', '.join(AGGREGATE_FUNCTIONS)}")
+                return None
+
+            column = None
+            if col_name is not None:
+                column = resolve_column(table_name, table_schema, col_name)
+                if column is None:
+                    return None
+                if table_schema[column] not in AGGREGATE_FUNCTIONS[function]:
+                    print_error(
+                        f"Ошибка: Функция '{function}' не применима к столбцу "
+                        f"'{column}' типа '{table_schema[column]}'"
+                    )
+                    return None
+            elif function != "count":
+                print_error(f"Ошибка: Функции '{function}' нужно указать столбец")
+                return None
+            item = (function, column)
+
+        if item not in items:
+            items.append(item)
+
+    return items
+
+
+def resolve_column(table_name, table_schema, col_name):
+    """
+    Возвращает имя столбца из схемы таблицы (без учета регистра)
+    или None, если такого столбца нет
+    """
+
+    column = resolve_column_names({col_name: None}, table_schema).popitem()[0]
+    if column not in table_schema:
+        print_error(
+            f"Ошибка: Столбец '{col_name}' не существует в таблице '{table_name}'"
+        )
+        print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
+        return None
+    return column
+
 
+def prepare_condition(table_name, table_schema, where_str):
+    """
+    Разбирает условие WHERE, проверяет столбцы и преобразует значения
+    к их типам. Возвращает дерево условия или None при ошибке.
+    """
+
+    condition = parse_where(where_str)
+    if condition is None:
+        return None
+
+    table_schema_norm = normalize_table_schema(table_schema)
+
+    for col_name in condition_columns(condition):
+        if col_name.lower() not in table_schema_norm:
+            print_error(
+                f"Ошибка: Столбец '{col_name}' не существует в таблице '{table_name}'"
+            )
+            print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
+            return None
+
+    try:
+        return convert_condition(condition, table_schema)
+    except ValueError as e:
+        print_error(f"Ошибка типов в условии WHERE: {e}")
+        return None
 
 
-def handle_delete(metadata, args):
+def plan_delete(metadata, args, statement):
     """
-    Обрабатывает команду delete в формате: delete from <table> where <условия>
+    Разбирает команду delete в формате: delete from <table> where <условие>.
+    Возвращает план команды или None при ошибке.
     """
 
     if len(args) < 4:
-        print("Ошибка: Недостаточно аргументов для delete")
-        print("Использование: delete from <имя_таблицы> where <условия>")
+        print_error("Ошибка: Недостаточно аргументов для delete")
+        print("Использование: delete from <имя_таблицы> where <условие>")
         return
 
     if args[1].lower() != "from":
-        print("Ошибка: Ожидается ключевое слово 'from'")
+        print_error("Ошибка: Ожидается ключевое слово 'from'")
         return
 
-    if not validate_where_conditions(args, 4): 
-        return 
-    
     table_name = args[2].lower()
 
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return
 
     if args[3].lower() != "where":
-        print("Ошибка: Ожидается ключевое слово 'where'")
+        print_error("Ошибка: Ожидается ключевое слово 'where'")
         return
 
     if len(args) == 4:
-        print("Ошибка: Отсутствуют условия после WHERE")
-        print("Использование: delete from <таблица> where <условия>")
-        return
-
-    where_str = " ".join(args[4:])
-    where_clause = parse_conditions(where_str)
-    if where_clause is None:
+        print_error("Ошибка: Отсутствуют условия после WHERE")
+        print("Использование: delete from <таблица> where <условие>")
         return
 
     table_schema = metadata[table_name]
-    table_schema_norm = normalize_table_schema(table_schema)
-    table_data = load_table_data(table_name)
 
-    if not table_data:
-        print(f"Таблица '{table_name}' пуста")
+    condition = prepare_condition(
+        table_name, table_schema, get_where_text(statement) or ""
+    )
+    if condition is None:
         return
 
-    for col_name in where_clause.keys():
-        if col_name.lower() not in table_schema_norm:
-            print(
-                f"Ошибка: Столбец '{col_name}' "
-                f"не существует в таблице '{table_name}'"
-                )
-            print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
-            return
+    return {
+        "command": "delete",
+        "table": table_name,
+        "schema": dict(table_schema),
+        "condition": condition,
+    }
 
-    try:
-        converted_where = convert_where_clause(where_clause, table_schema_norm)
-        where_clause = converted_where
-    except ValueError as e:
-        print(f"Ошибка типов в условии WHERE: {e}")
+
+def run_delete(plan):
+    """
+    Выполняет план команды delete
+    """
+
+    table_name = plan["table"]
+    table_data = table_cache.get_table_for_write(table_name)
+
+    if not table_data:
+        print(f"Таблица '{table_name}' пуста")
         return
     
-    remaining_data, deleted_count = delete(table_data, where_clause)
+    deleted_ids = []
+    table_data, deleted_count = delete(table_data, plan["condition"], deleted_ids)
 
     if deleted_count > 0:
-        if save_table_data(table_name, remaining_data):
-            print(f"Удалено записей: {deleted_count}")
-        else:
-            print("Ошибка при сохранении данных")
+        table_cache.delete_records(table_name, deleted_ids)
+        print(f"Удалено записей: {deleted_count}")
     else:
         print("Записи для удаления не найдены")
 
 
-def handle_update(metadata, args):
+def plan_update(metadata, args, statement):
     """
-    Обрабатывает команду update в формате: update <table> set <условия> where <условия>
+    Разбирает команду update в формате:
+    update <table> set <условия> where <условие>
+    Возвращает план команды или None при ошибке.
     """
 
     if len(args) < 6:
-        print("Ошибка: Недостаточно аргументов для update")
+        print_error("Ошибка: Недостаточно аргументов для update")
         print("Использование: update <имя_таблицы> set <условия> where <условия>")
         return
 
     table_name = args[1].lower()
     
     
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return
 
     if args[2].lower() != "set":
-        print("Ошибка: Ожидается ключевое слово 'set'")
+        print_error("Ошибка: Ожидается ключевое слово 'set'")
         return
 
-    where_index = -1
-    for i, arg in enumerate(args):
-        if arg.lower() == "where":
-            where_index = i
-            break
+    # SET и WHERE берутся из одного разбиения команды: слово where
+    # в кавычках относится к значению, а не к условию
+    head, clauses = split_clauses(statement, ('where',))
+    where_str = clauses.get('where')
 
-    if where_index == -1:
-        print("Ошибка: Ожидается ключевое слово 'where'")
+    if where_str is None:
+        print_error("Ошибка: Ожидается ключевое слово 'where'")
         return
 
-    if not validate_set_conditions(args, 3):  # начинаем с индекса 3 (после 'set')
-        return
-    
-    if not validate_where_conditions(args, where_index + 1):  # начинаем после 'where'
+    set_args = shlex.split(head)[3:]
+
+    # Условие WHERE проверяется отдельно при его разборе
+    if not validate_set_conditions(set_args, 0):
         return
 
-    set_str = " ".join(args[3:where_index])
-    where_str = " ".join(args[where_index + 1 :])
+    set_str = " ".join(set_args)
 
     set_clause = parse_conditions(set_str)
-    where_clause = parse_conditions(where_str)
-
 
     if set_str.strip() == "" or set_clause is None or len(set_clause) == 0:
-        print("Ошибка: Отсутствуют условия для обновления после SET")
+        print_error("Ошибка: Отсутствуют условия для обновления после SET")
         print(
             "Использование: update <таблица> set <столбец>=<значение> "
             "where <столбец_условия> = <значение_условия>"
@@ -486,65 +1163,73 @@ def handle_update(metadata, args):
         return
 
     if where_str.strip() == "":
-        print("Ошибка: Отсутствуют условия после WHERE")
+        print_error("Ошибка: Отсутствуют условия после WHERE")
         print(
             "Использование: update <таблица> set "
             "<столбец>=<значение> where <условия>"
             )
         return
 
-    if set_clause is None or where_clause is None:
+    if set_clause is None:
         return
 
-    table_data = load_table_data(table_name)
     table_schema = metadata[table_name]
     
     table_schema_norm = normalize_table_schema(table_schema)
 
     for col_name in set_clause.keys():
         if col_name.lower() not in table_schema_norm and col_name not in ('ID', 'id'):
-            print(
+            print_error(
                 f"Ошибка: Столбец '{col_name}' не существует в таблице "
                 f"'{table_name}'"
                 )
             print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
             return
     
-    for col_name in where_clause.keys():
-        if col_name.lower() not in table_schema_norm:
-            print(
-                f"Ошибка: Столбец '{col_name}' не существует в таблице "
-                f"'{table_name}'"
-                )
-            print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
-            return
-
     try:
         converted_set = convert_where_clause(set_clause, table_schema_norm)
-        set_clause = converted_set
+        set_clause = resolve_column_names(converted_set, table_schema)
     except ValueError as e:
-        print(f"Ошибка типов в условии SET: {e}")
+        print_error(f"Ошибка типов в условии SET: {e}")
         return
     
-    try:
-        converted_where = convert_where_clause(where_clause, table_schema_norm)
-        where_clause = converted_where
-    except ValueError as e:
-        print(f"Ошибка типов в условии WHERE: {e}")
+    condition = prepare_condition(table_name, table_schema, where_str)
+    if condition is None:
         return
 
+    return {
+        "command": "update",
+        "table": table_name,
+        "schema": dict(table_schema),
+        "set": set_clause,
+        "condition": condition,
+    }
+
+
+def run_update(plan):
+    """
+    Выполняет план команды update
+    """
+
+    table_name = plan["table"]
+    table_data = table_cache.get_table_for_write(table_name)
 
     if not table_data:
         print(f"Таблица '{table_name}' пуста")
         return
     
-    updated_data, updated_count = update(table_data, set_clause, where_clause)
+    updated_ids = []
+    try:
+        table_data, updated_count = update(
+            table_data, plan["set"], plan["condition"], updated_ids
+        )
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
+        return
 
     if updated_count > 0:
-        if save_table_data(table_name, updated_data):
-            print(f"Обновлено записей: {updated_count}")
-        else:
-            print("Ошибка при сохранении данных")
+        table_cache.update_records(table_name, updated_ids, plan["set"])
+        print(f"Обновлено записей: {updated_count}")
     else:
         print("Записи для обновления не найдены")
 
@@ -555,17 +1240,18 @@ def handle_info(metadata, args):
     """
 
     if len(args) < 2:
-        print("Ошибка: Недостаточно аргументов для info")
+        print_error("Ошибка: Недостаточно аргументов для info")
         print("Использование: info <имя_таблицы>")
         return
 
     table_name = args[1].lower()
 
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return
 
-    table_data = load_table_data(table_name)
+    # Статистика поддерживается при записи, поэтому таблица не читается
+    stats = table_cache.get_stats(table_name)
 
     print(f"Таблица: {table_name}")
 
@@ -575,25 +1261,209 @@ def handle_info(metadata, args):
     ]
     print(f"Столбцы: {', '.join(columns_info)}")
 
-    print(f"Количество записей: {len(table_data)}")
+    if stats is None:
+        table_data = table_cache.get_table_for_read(table_name)
+        print(f"Количество записей: {len(table_data)}")
+        return
+
+    print(f"Количество записей: {stats['rows']}")
+    print(f"Размер на диске: {stats['bytes']} байт")
+
+    for col_name, column_stats in stats['columns'].items():
+        # Удаленные значения остаются в оценке, но их не больше, чем записей
+        distinct = min(distinct_estimate(column_stats), stats['rows'])
+        details = [f"различных значений ~{distinct}"]
+        if column_stats.get('min') is not None:
+            details.append(f"min {column_stats['min']}, max {column_stats['max']}")
+        print(f"  {col_name}: {'; '.join(details)}")
+
+def handle_lock_stats():
+    """
+    Обрабатывает команду lock_stats - выводит время ожидания блокировок
+    таблиц, занятых другими процессами
+    """
+
+    lock_waits = get_lock_waits()
+    if not lock_waits:
+        print("Блокировки еще не запрашивались")
+        return
+
+    for name, waits in lock_waits.items():
+        average = waits['wait'] / waits['contended'] if waits['contended'] else 0.0
+        print(
+            f"{name}: блокировок {waits['count']}, с ожиданием "
+            f"{waits['contended']}, ожидание {waits['wait']:.3f} с "
+            f"(среднее {average:.3f} с, максимум {waits['max']:.3f} с)"
+        )
+
+def handle_compact(metadata, args):
+    """
+    Обрабатывает команду compact - переносит журнал добавлений в снимок таблицы
+    """
+
+    if len(args) < 2:
+        print_error("Ошибка: Недостаточно аргументов для compact")
+        print("Использование: compact <имя_таблицы>")
+        return
+
+    table_name = args[1].lower()
+
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
+        return
+
+    compacted_count = table_cache.compact(table_name)
+
+    if compacted_count is None:
+        print_error("Ошибка при сохранении данных")
+    else:
+        print(f"Перенесено записей из журнала: {compacted_count}")
+
+def handle_create_index(metadata, args):
+    """
+    Обрабатывает команду create_index <table> <column> [hash|sorted].
+    Возвращает обновленные метаданные или None в случае ошибки.
+    """
+
+    if len(args) < 3:
+        print_error("Ошибка: Недостаточно аргументов для create_index")
+        print("Использование: create_index <имя_таблицы> <столбец> [hash|sorted]")
+        return None
+
+    kind = args[3].lower() if len(args) > 3 else "hash"
+    if kind not in INDEX_KINDS:
+        print_error(f"Ошибка: Неизвестный вид индекса '{args[3]}'")
+        print(f"Доступные виды: {', '.join(INDEX_KINDS)}")
+        return None
+
+    table_name = args[1].lower()
+
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
+        return None
+
+    table_schema = metadata[table_name]
+    column = resolve_column_names({args[2]: None}, table_schema).popitem()[0]
+
+    if column not in table_schema:
+        print_error(
+            f"Ошибка: Столбец '{args[2]}' не существует в таблице '{table_name}'"
+        )
+        print(f"Доступные столбцы: {', '.join(table_schema.keys())}")
+        return None
+
+    if table_schema[column] not in INDEXABLE_TYPES:
+        print_error(
+            f"Ошибка: Индекс для типа '{table_schema[column]}' не поддерживается"
+        )
+        return None
+
+    table_indexes = dict(get_table_indexes(metadata, table_name))
+
+    if table_indexes.get(column) == kind:
+        print_error(f"Ошибка: Индекс по столбцу '{column}' уже существует")
+        return None
+
+    # Индекс другого вида по тому же столбцу заменяется
+    table_indexes[column] = kind
+    new_metadata = copy.deepcopy(metadata)
+    set_table_option(new_metadata, table_name, 'indexes', table_indexes)
+
+    table_cache.create_index(table_name, column, kind)
+
+    print(f"Индекс ({kind}) по столбцу '{column}' таблицы '{table_name}' создан")
+    return new_metadata
+
+def handle_set_layout(metadata, args):
+    """
+    Обрабатывает команду set_layout <table> <rows|columnar>.
+    Возвращает обновленные метаданные или None в случае ошибки.
+    """
+
+    if len(args) < 3:
+        print_error("Ошибка: Недостаточно аргументов для set_layout")
+        print("Использование: set_layout <имя_таблицы> <rows|columnar>")
+        return None
+
+    table_name = args[1].lower()
+    layout = args[2].lower()
+
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
+        return None
+
+    if layout not in TABLE_LAYOUTS:
+        print_error(f"Ошибка: Неизвестное представление '{layout}'")
+        print(f"Доступные представления: {', '.join(TABLE_LAYOUTS)}")
+        return None
+
+    try:
+        table_cache.set_layout(table_name, metadata[table_name], layout)
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
+        return None
+
+    new_metadata = copy.deepcopy(metadata)
+    set_table_option(new_metadata, table_name, 'layout', layout)
+
+    print(f"Таблица '{table_name}' хранится в памяти в представлении '{layout}'")
+    return new_metadata
+
+def handle_convert_table(metadata, args):
+    """
+    Обрабатывает команду convert_table <table> <json|binary>.
+    Возвращает обновленные метаданные или None в случае ошибки.
+    """
+
+    if len(args) < 3:
+        print_error("Ошибка: Недостаточно аргументов для convert_table")
+        print("Использование: convert_table <имя_таблицы> <json|binary>")
+        return None
+
+    table_name = args[1].lower()
+    table_format = args[2].lower()
+
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
+        return None
+
+    if table_format not in TABLE_FORMATS:
+        print_error(f"Ошибка: Неизвестный формат '{table_format}'")
+        print(f"Доступные форматы: {', '.join(TABLE_FORMATS)}")
+        return None
+
+    # Формат меняется в метаданных только после записи снимка в новом формате
+    try:
+        converted = table_cache.convert_format(table_name, table_format)
+    except ValueError as e:
+        print_error(f"Ошибка: {e}")
+        print(f"Таблицу нельзя сохранить в формате '{table_format}'")
+        return None
+
+    if not converted:
+        return None
+
+    print(f"Таблица '{table_name}' сохранена в формате '{table_format}'")
+    return table_cache.get_metadata()
 
 def handle_drop_table(metadata, table_name):
     """
     Обрабатывает удаление таблицы - удаляет и метаданные и данные
     """
     
-    if table_name not in metadata:
-        print(f"Ошибка: Таблица '{table_name}' не существует")
+    if table_name not in get_table_names(metadata):
+        print_error(f"Ошибка: Таблица '{table_name}' не существует")
         return metadata
 
-    # Удаляем файл с данными
-    filepath = os.path.join(DATA_DIR, f"{table_name}.json")
+    # Удаляем файлы с данными и индексами
+    table_cache.forget(table_name)
+    index_columns = get_table_indexes(metadata, table_name)
     try:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-            print(f"Файл данных '{table_name}.json' удален")
+        with table_lock(table_name, exclusive=True):
+            for filename in remove_table_files(table_name, index_columns):
+                print(f"Файл данных '{filename}' удален")
     except Exception as e:
-        print(f"Ошибка при удалении файла данных: {e}")
+        print_error(f"Ошибка при удалении файла данных: {e}")
 
     # Удаляем из метаданных
     new_metadata = drop_table(metadata, table_name)
@@ -0,0 +1,200 @@
+from bisect import bisect_left, bisect_right, insort
+
+INDEXABLE_TYPES = ('int', 'str', 'bool')
+
+
+class HashIndex:
+    """
+    Хэш-индекс по столбцу: значение -> список позиций записей в таблице
+    """
+
+    kind = 'hash'
+
+    def __init__(self, column):
+        self.column = column
+        self.buckets = {}
+        # Количество записей таблицы, учтенных в индексе
+        self.rows = 0
+
+    @classmethod
+    def build(cls, column, table):
+        """
+        Строит индекс по данным таблицы
+        """
+
+        index = cls(column)
+        index.extend(table)
+        return index
+
+    def extend(self, table):
+        """
+        Добавляет в индекс записи таблицы, которые еще не учтены
+        """
+
+        for position in range(self.rows, table.position_count()):
+            if table.is_alive(position):
+                self.add(table.value(position, self.column), position)
+        self.rows = table.position_count()
+
+    def rebuild(self, table):
+        """
+        Перестраивает индекс после изменения позиций записей
+        """
+
+        self.buckets = {}
+        self.rows = 0
+        self.extend(table)
+
+    def add(self, value, position):
+        self.buckets.setdefault(value, []).append(position)
+        self.rows = max(self.rows, position + 1)
+
+    def remove(self, value, position):
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            return
+
+        bucket.remove(position)
+        if not bucket:
+            del self.buckets[value]
+
+    def lookup(self, value):
+        """
+        Возвращает позиции записей с указанным значением по возрастанию
+        """
+
+        return sorted(self.buckets.get(value, ()))
+
+    def to_dict(self):
+        return {
+            'column': self.column,
+            'kind': self.kind,
+            'rows': self.rows,
+            'entries': [
+                [value, positions] for value, positions in self.buckets.items()
+            ],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data['column'])
+        index.rows = data['rows']
+        index.buckets = {value: positions for value, positions in data['entries']}
+        return index
+
+
+class SortedIndex(HashIndex):
+    """
+    Упорядоченный индекс по столбцу: отсортированный список пар
+    (значение, позиция). Поддерживает поиск по равенству, по диапазону
+    значений и обход записей в порядке значений столбца.
+    """
+
+    kind = 'sorted'
+
+    def __init__(self, column):
+        self.column = column
+        self.entries = []
+        self.rows = 0
+
+    def rebuild(self, table):
+        self.entries = []
+        self.rows = 0
+        self.extend(table)
+
+    def extend(self, table):
+        # Новые записи сортируются вместе, а не вставляются по одной
+        new_entries = [
+            (table.value(position, self.column), position)
+            for position in range(self.rows, table.position_count())
+            if table.is_alive(position)
+        ]
+        if new_entries:
+            self.entries = sorted(self.entries + new_entries)
+        self.rows = table.position_count()
+
+    def add(self, value, position):
+        insort(self.entries, (value, position))
+        self.rows = max(self.rows, position + 1)
+
+    def remove(self, value, position):
+        offset = bisect_left(self.entries, (value, position))
+        if offset < len(self.entries) and self.entries[offset] == (value, position):
+            del self.entries[offset]
+
+    def lookup(self, value):
+        return list(self.range(value, True, value, True))
+
+    def range(self, low=None, low_inclusive=True, high=None, high_inclusive=True,
+              descending=False):
+        """
+        Возвращает позиции записей со значениями от low до high в порядке
+        значений. Граница None означает отсутствие ограничения.
+        """
+
+        entries = self.entries
+
+        if low is None:
+            start = 0
+        elif low_inclusive:
+            start = bisect_left(entries, (low,))
+        else:
+            start = bisect_right(entries, (low, float('inf')))
+
+        if high is None:
+            stop = len(entries)
+        elif high_inclusive:
+            stop = bisect_right(entries, (high, float('inf')))
+        else:
+            stop = bisect_left(entries, (high,))
+
+        if descending:
+            return (entries[i][1] for i in range(stop - 1, start - 1, -1))
+        return (entries[i][1] for i in range(start, stop))
+
+    def to_dict(self):
+        return {
+            'column': self.column,
+            'kind': self.kind,
+            'rows': self.rows,
+            'entries': self.entries,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        index = cls(data['column'])
+        index.rows = data['rows']
+        index.entries = [(value, position) for value, position in data['entries']]
+        return index
+
+
+# Виды индексов по названию, которое хранится в db_meta.json
+INDEX_KINDS = {
+    HashIndex.kind: HashIndex,
+    SortedIndex.kind: SortedIndex,
+}
+
+
+def index_from_dict(data):
+    """
+    Восстанавливает индекс нужного вида из сохраненного словаря
+    """
+
+    return INDEX_KINDS[data.get('kind', HashIndex.kind)].from_dict(data)
+
+
+def find_index(indexes, where_clause):
+    """
+    Находит индекс, подходящий для условия WHERE.
+    Возвращает (индекс, значение) или (None, None).
+    """
+
+    if not indexes or not where_clause:
+        return None, None
+
+    for key, value in where_clause.items():
+        index = indexes.get(key)
+        if index is not None:
+            return index, value
+
+    return None, None
@@ -0,0 +1,114 @@
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Без fcntl (например, в Windows) блокировки между процессами не работают
+    fcntl = None
+
+from .utils import DATA_DIR, ensure_data_dir
+
+# Время ожидания блокировок по файлам блокировок:
+# путь -> {'count': получено, 'contended': с ожиданием, 'wait': секунд, 'max': ...}
+LOCK_WAITS = {}
+
+# Блокировки, удерживаемые процессом: путь -> [файл, exclusive, глубина]
+_held = {}
+
+
+def get_lock_filepath(table_name):
+    """
+    Возвращает путь к файлу блокировки таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.lock")
+
+
+def table_lock(table_name, exclusive=False):
+    """
+    Блокировка таблицы между процессами: разделяемая (exclusive=False)
+    для чтения файлов таблицы, исключительная - для их записи.
+    Читатели не мешают друг другу, а писатели ждут только тех,
+    кто работает с той же таблицей.
+    """
+
+    ensure_data_dir()
+    return file_lock(get_lock_filepath(table_name), exclusive)
+
+
+@contextmanager
+def file_lock(filepath, exclusive=False):
+    """
+    Блокировка fcntl.flock на файле filepath. Повторное получение
+    блокировки тем же процессом не ждет: разделяемая блокировка при
+    этом повышается до исключительной, если нужно.
+    """
+
+    if fcntl is None:
+        yield
+        return
+
+    held = _held.get(filepath)
+    if held is not None:
+        file, held_exclusive, _ = held
+        upgraded = exclusive and not held_exclusive
+        if upgraded:
+            _acquire(filepath, file, exclusive=True)
+            held[1] = True
+        held[2] += 1
+        try:
+            yield
+        finally:
+            held[2] -= 1
+            if upgraded:
+                fcntl.flock(file, fcntl.LOCK_SH)
+                held[1] = False
+        return
+
+    file = open(filepath, 'a+', encoding='utf-8')
+    try:
+        _acquire(filepath, file, exclusive)
+        _held[filepath] = [file, exclusive, 1]
+        try:
+            yield
+        finally:
+            del _held[filepath]
+            fcntl.flock(file, fcntl.LOCK_UN)
+    finally:
+        file.close()
+
+
+def get_lock_waits():
+    """
+    Время ожидания блокировок по таблицам: {имя: статистика}
+    """
+
+    return {
+        os.path.basename(filepath).removesuffix('.lock'): dict(waits)
+        for filepath, waits in sorted(LOCK_WAITS.items())
+    }
+
+
+def _acquire(filepath, file, exclusive):
+    operation = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+    waits = LOCK_WAITS.setdefault(
+        filepath, {'count': 0, 'contended': 0, 'wait': 0.0, 'max': 0.0}
+    )
+    waits['count'] += 1
+
+    # Сначала без ожидания, чтобы считать только действительно ждавшие запросы
+    try:
+        fcntl.flock(file, operation | fcntl.LOCK_NB)
+        return
+    except BlockingIOError:
+        pass
+
+    start = time.perf_counter()
+    fcntl.flock(file, operation)
+    wait = time.perf_counter() - start
+
+    waits['contended'] += 1
+    waits['wait'] += wait
+    waits['max'] = max(waits['max'], wait)
@@ -1,10 +1,115 @@
 #!/usr/bin/env python3
 
-from .engine import run
+import argparse
+import sys
+
+from . import parallel, wal
+from .engine import run, run_script
+from .server import TRANSACTION_IDLE_TIMEOUT, run_server
+from .utils import print_error
 
 
 def main():
-    run()
+    parser = argparse.ArgumentParser(description="Примитивная база данных")
+    parser.add_argument(
+        "mode",
+        nargs="?",
+        choices=["serve"],
+        help="serve - запустить сервер запросов для нескольких клиентов",
+    )
+    parser.add_argument(
+        "--script",
+        metavar="FILE",
+        help="выполнить команды из файла ('-' - из стандартного ввода)",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=int,
+        default=0,
+        metavar="N",
+        help="переносить изменения в файлы таблиц каждые N команд "
+        "(по умолчанию - только в конце)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        metavar="N",
+        help="количество процессов для просмотра больших таблиц "
+        "(по умолчанию - по числу ядер, 1 - без параллельного просмотра)",
+    )
+    parser.add_argument(
+        "--parallel-min-rows",
+        type=int,
+        metavar="N",
+        help="просматривать в нескольких процессах таблицы от N записей "
+        f"(по умолчанию - {parallel.PARALLEL_MIN_POSITIONS})",
+    )
+    parser.add_argument(
+        "--wal-batch",
+        type=int,
+        metavar="N",
+        help="выполнять fsync журнала изменений раз в N изменений "
+        f"(по умолчанию - {wal.WAL_SYNC_BATCH})",
+    )
+    parser.add_argument(
+        "--socket",
+        metavar="PATH",
+        help="Unix-сокет сервера (serve)",
+    )
+    parser.add_argument(
+        "--host",
+        help="адрес TCP сервера (serve, по умолчанию - 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--port",
+        type=int,
+        help="порт TCP сервера (serve)",
+    )
+    parser.add_argument(
+        "--transaction-timeout",
+        type=float,
+        default=TRANSACTION_IDLE_TIMEOUT,
+        metavar="SECONDS",
+        help="отменять транзакцию клиента, не присылающего команд SECONDS "
+        f"секунд (serve, по умолчанию - {TRANSACTION_IDLE_TIMEOUT:g}; "
+        "0 - не отменять)",
+    )
+    args = parser.parse_args()
+
+    parallel.configure(args.workers, args.parallel_min_rows)
+    wal.configure(args.wal_batch)
+
+    if args.mode == "serve":
+        if args.socket is None and args.port is None:
+            parser.error("для serve нужен --socket или --port")
+        try:
+            saved = run_server(
+                args.socket, args.host, args.port, args.transaction_timeout
+            )
+        except OSError as e:
+            print_error(f"Ошибка: Не удалось запустить сервер: {e}")
+            sys.exit(1)
+        if not saved:
+            sys.exit(1)
+        return
+
+    # Без файла и с перенаправленным вводом команды читаются пакетом
+    if args.script is None and sys.stdin.isatty():
+        run()
+        return
+
+    if args.script in (None, "-"):
+        saved = run_script(sys.stdin, args.checkpoint)
+    else:
+        try:
+            with open(args.script, "r", encoding="utf-8") as file:
+                saved = run_script(file, args.checkpoint)
+        except OSError as e:
+            print_error(f"Ошибка: Не удалось открыть файл '{args.script}': {e}")
+            sys.exit(1)
+
+    if not saved:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
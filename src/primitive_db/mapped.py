@@ -0,0 +1,206 @@
+import mmap
+import sys
+from bisect import bisect_left
+from collections.abc import Mapping
+
+from .binary import decode_header
+from .utils import drop_known_records
+
+# Таблицы меньшего размера выгоднее загрузить в кэш целиком
+MAPPED_READ_MIN_BYTES = 1024 * 1024
+
+
+class MappedTable:
+    """
+    Таблица только для чтения поверх отображенного в память файла
+    в двоичном формате.
+
+    Значения декодируются по одному при обращении к ним, поэтому условие
+    WHERE читает только свои столбцы, а словари создаются только для
+    найденных записей. Записи из журнала добавлений хранятся в памяти
+    после записей снимка.
+    """
+
+    layout = 'mapped'
+
+    # Данные отображенного файла не меняются
+    version = 0
+
+    def __init__(self, filepath, tail=None):
+        with open(filepath, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header, data_start = decode_header(self._mmap)
+        buffer = memoryview(self._mmap)
+
+        self.rows = header['rows']
+        self.ids_sorted = header.get('ids_sorted', False)
+        self.schema = dict(header['columns'])
+        self.tail = []
+        self.indexes = {}
+        self.deleted = 0
+        self.stats = None
+        self._views = {}
+
+        for col_name, col_type in self.schema.items():
+            offset, length = header['sections'][col_name]
+            section = buffer[data_start + offset:data_start + offset + length]
+
+            match col_type:
+                case 'int':
+                    self._views[col_name] = section.cast('q')
+                case 'bool':
+                    self._views[col_name] = section
+                case 'str':
+                    offsets_size = (self.rows + 1) * 8
+                    self._views[col_name] = (
+                        section[:offsets_size].cast('Q'),
+                        section[offsets_size:],
+                    )
+
+        if tail:
+            self.tail = drop_known_records(tail, self._in_snapshot())
+
+    @staticmethod
+    def is_supported():
+        """
+        Файл хранит числа в порядке little-endian и читается без
+        преобразования только на таких платформах
+        """
+
+        return sys.byteorder == 'little'
+
+    def __len__(self):
+        return self.rows + len(self.tail)
+
+    def __iter__(self):
+        return (self.get(position) for position in self.positions())
+
+    def position_count(self):
+        return len(self)
+
+    def positions(self):
+        return range(len(self))
+
+    def is_alive(self, position):
+        return True
+
+    def get(self, position):
+        if position >= self.rows:
+            return self.tail[position - self.rows]
+        return {column: self.value(position, column) for column in self.schema}
+
+    def value(self, position, column):
+        if position >= self.rows:
+            return self.tail[position - self.rows].get(column)
+
+        view = self._views.get(column)
+        match self.schema.get(column):
+            case 'int':
+                return view[position]
+            case 'bool':
+                return bool(view[position >> 3] >> (position & 7) & 1)
+            case 'str':
+                offsets, blob = view
+                return str(blob[offsets[position]:offsets[position + 1]], 'utf-8')
+            case _:
+                return None
+
+    def column_getter(self, column):
+        if self.schema.get(column) == 'int' and not self.tail:
+            return self._views[column].__getitem__
+        return lambda position: self.value(position, column)
+
+    def row_getter(self, columns):
+        getters = [(column, self.column_getter(column)) for column in columns]
+        return lambda position: {column: get(position) for column, get in getters}
+
+    def equality_test(self, column, value):
+        if self.schema.get(column) != 'str':
+            get = self.column_getter(column)
+            return lambda position: get(position) == value
+
+        # Строки снимка сравниваются в байтах без декодирования
+        offsets, blob = self._views[column]
+        rows = self.rows
+        raw_value = str(value).encode('utf-8')
+
+        def test(position):
+            if position >= rows:
+                return self.tail[position - rows].get(column) == value
+            return blob[offsets[position]:offsets[position + 1]] == raw_value
+
+        return test
+
+    def snapshot_section(self, column):
+        """
+        Данные столбца в снимке без декодирования: значения int
+        или битовая маска bool
+        """
+
+        return self._views.get(column)
+
+    def _in_snapshot(self):
+        """
+        Возвращает проверку, есть ли ID в снимке: по отсортированным ID -
+        двоичным поиском, иначе - по множеству ID снимка
+        """
+
+        ids = self._views['ID']
+        if not self.ids_sorted:
+            return set(ids).__contains__
+
+        def contains(record_id):
+            position = bisect_left(ids, record_id)
+            return position < self.rows and ids[position] == record_id
+
+        return contains
+
+    def find_position(self, record_id):
+        ids = self._views['ID']
+
+        if self.ids_sorted:
+            position = bisect_left(ids, record_id)
+            if position < self.rows and ids[position] == record_id:
+                return position
+        else:
+            for position in range(self.rows):
+                if ids[position] == record_id:
+                    return position
+
+        for offset, record in enumerate(self.tail):
+            if record['ID'] == record_id:
+                return self.rows + offset
+        return None
+
+
+class LazyIndexes(Mapping):
+    """
+    Индексы таблицы по столбцам, которые загружаются при первом
+    обращении: load(column) возвращает индекс или None, если его нельзя
+    использовать (тогда get() тоже возвращает None). Запрос читает
+    файлы только нужных ему индексов.
+    """
+
+    def __init__(self, columns, load):
+        self._columns = list(columns)
+        self._load = load
+        self._indexes = {}
+
+    def __getitem__(self, column):
+        if column not in self._indexes:
+            if column not in self._columns:
+                raise KeyError(column)
+            self._indexes[column] = self._load(column)
+
+        index = self._indexes[column]
+        if index is None:
+            raise KeyError(column)
+        return index
+
+    def __iter__(self):
+        # Перечисляются столбцы без загрузки индексов
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
@@ -0,0 +1,161 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .aggregate import aggregate_states, merge_states
+from .predicate import compile_predicate
+
+# Количество процессов для просмотра таблицы (1 - без параллельного просмотра)
+PARALLEL_WORKERS = os.cpu_count() or 1
+
+# Таблицы с меньшим количеством позиций просматриваются в одном процессе
+PARALLEL_MIN_POSITIONS = 200_000
+
+# Таблица, которую просматривают процессы пула. Процессы создаются
+# через fork и получают таблицу вместе с памятью родителя, поэтому
+# данные таблицы не копируются между процессами.
+_scan_table = None
+
+# Пул процессов переиспользуется, пока просматривается та же таблица
+# той же версии (см. Table.version): после изменения таблицы процессы
+# пула видят устаревшие данные, и пул создается заново. Пул хранит
+# таблицу и ее версию, пока не будет создан пул для другой таблицы.
+_pool = None
+_pool_table = None
+
+
+def configure(workers=None, min_positions=None):
+    """
+    Задает количество процессов и порог размера таблицы
+    для параллельного просмотра
+    """
+
+    global PARALLEL_WORKERS, PARALLEL_MIN_POSITIONS
+
+    if workers is not None:
+        PARALLEL_WORKERS = max(1, workers)
+        shutdown()
+    if min_positions is not None:
+        PARALLEL_MIN_POSITIONS = max(1, min_positions)
+
+
+def shutdown():
+    """
+    Завершает процессы пула
+    """
+
+    global _pool, _pool_table
+
+    if _pool is not None:
+        _pool.shutdown(cancel_futures=True)
+    _pool = None
+    _pool_table = None
+
+
+def is_enabled(table):
+    """
+    Проверяет, нужно ли просматривать таблицу в нескольких процессах
+    """
+
+    return (
+        PARALLEL_WORKERS > 1
+        and table.position_count() >= PARALLEL_MIN_POSITIONS
+        and 'fork' in multiprocessing.get_all_start_methods()
+    )
+
+
+def parallel_positions(table, condition):
+    """
+    Проверяет условие WHERE в нескольких процессах, каждый по своему
+    диапазону позиций. Возвращает список подходящих позиций по
+    возрастанию или None, если просмотр выполнить не удалось.
+    """
+
+    parts = _run(table, _match_range, condition)
+    if parts is None:
+        return None
+    return [position for part in parts for position in part]
+
+
+def parallel_aggregate(table, condition, aggregates, group_by=()):
+    """
+    Вычисляет состояния агрегатов по диапазонам позиций в нескольких
+    процессах и объединяет их по порядку диапазонов. Возвращает
+    {ключ группы: [состояния]} или None, если просмотр выполнить
+    не удалось.
+    """
+
+    parts = _run(table, _aggregate_range, condition, aggregates, group_by)
+    if parts is None:
+        return None
+
+    groups, *rest = parts
+    for other_groups in rest:
+        merge_states(groups, other_groups, aggregates)
+    return groups
+
+
+def _run(table, function, *args):
+    size = table.position_count()
+    step = max(1, -(-size // PARALLEL_WORKERS))
+    ranges = [(start, min(start + step, size)) for start in range(0, size, step)]
+
+    try:
+        executor = _get_pool(table)
+        futures = [
+            executor.submit(function, *args, start, stop) for start, stop in ranges
+        ]
+        return [future.result() for future in futures]
+    except (OSError, BrokenProcessPool):
+        shutdown()
+        return None
+
+
+def _get_pool(table):
+    """
+    Возвращает пул, процессы которого созданы для текущей версии таблицы
+    """
+
+    global _pool, _pool_table
+
+    if _pool is not None and _pool_table[0] is table and (
+        _pool_table[1] == table.version
+    ):
+        return _pool
+
+    shutdown()
+    _pool = ProcessPoolExecutor(
+        max_workers=PARALLEL_WORKERS,
+        mp_context=multiprocessing.get_context('fork'),
+        initializer=_set_scan_table,
+        initargs=(table,),
+    )
+    _pool_table = (table, table.version)
+    return _pool
+
+
+def _set_scan_table(table):
+    global _scan_table
+    _scan_table = table
+
+
+def _live_positions(table, start, stop):
+    is_alive = table.is_alive
+    return (position for position in range(start, stop) if is_alive(position))
+
+
+def _match_range(condition, start, stop):
+    table = _scan_table
+    positions = _live_positions(table, start, stop)
+    if condition is None:
+        return list(positions)
+    return list(filter(compile_predicate(condition, table), positions))
+
+
+def _aggregate_range(condition, aggregates, group_by, start, stop):
+    table = _scan_table
+    positions = _live_positions(table, start, stop)
+    if condition is not None:
+        positions = filter(compile_predicate(condition, table), positions)
+    return aggregate_states(table, positions, aggregates, group_by)
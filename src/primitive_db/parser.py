@@ -1,3 +1,39 @@
+import re
+
+from .utils import print_error
+
+# Лексемы условия WHERE: строка в кавычках, оператор сравнения, скобка
+# или запятая, слово (имя столбца, значение без кавычек, ключевое слово)
+CONDITION_TOKEN = re.compile(
+    r"""\s*(?:"([^"]*)"|'([^']*)'|(<=|>=|!=|<>|=|<|>)|([(),])|([^\s()<>=!,"']+))"""
+)
+
+# Вызов агрегатной функции в списке столбцов select: функция(столбец или *)
+AGGREGATE_CALL = re.compile(r"^(\w+)\s*\(\s*(\*|[^()\s]+)\s*\)$")
+
+# Операторы сравнения; <> - синоним !=
+COMPARISON_OPERATORS = {
+    '=': '=', '!=': '!=', '<>': '!=', '<': '<', '<=': '<=', '>': '>', '>=': '>=',
+}
+
+# Знак ? подготовленной команды (prepare) заменяется в ее тексте
+# символом из области частного использования Unicode, чтобы пройти
+# разбор как обычное значение без кавычек
+PARAMETER_MARK = '\ue000'
+
+
+class Parameter:
+    """
+    Место для значения в плане подготовленной команды: значение
+    подставляется и преобразуется к типу столбца при execute
+    """
+
+    def __repr__(self):
+        return '?'
+
+
+PARAMETER = Parameter()
+
 
 def parse_conditions(condition_str):
     """
@@ -19,15 +55,15 @@ def parse_conditions(condition_str):
                     raw_value = parts[1].strip()
                     conditions[key] = raw_value
                 else:
-                    print(f"Ошибка: Некорректное условие '{condition}'")
+                    print_error(f"Ошибка: Некорректное условие '{condition}'")
                     return None
             else:
-                print(f"Ошибка: Отсутствует знак '=' в условии '{condition}'")
+                print_error(f"Ошибка: Отсутствует знак '=' в условии '{condition}'")
                 return None
        
         return conditions
     except Exception as e:
-        print(f"Ошибка при разборе условий: {e}")
+        print_error(f"Ошибка при разборе условий: {e}")
         return None
 
 def split_by_commas(text):
@@ -74,6 +110,9 @@ def convert_value(value, expected_type = None):
    
     if value is None:
         return None
+
+    if value == PARAMETER_MARK:
+        return PARAMETER
     
     if not isinstance(value, str):
         value = str(value)
@@ -136,40 +175,6 @@ def convert_where_clause(where_clause, table_schema):
             converted[col_name] = convert_value(raw_value)
     return converted
 
-def validate_where_conditions(args, start_index):
-    """
-    Проверяет условия WHERE на наличие пробелов в значениях без кавычек.
-    """
-    i = start_index
-    while i < len(args):
-        # Ищем паттерн: столбец = значение
-        if i + 2 < len(args) and args[i + 1] == '=':
-            column = args[i]
-            value_start = i + 2
-            
-            # Ищем конец значения (до следующего оператора = или конца)
-            j = value_start
-            while j < len(args):
-                # Если нашли следующий оператор =, значит текущее значение закончилось
-                if j + 1 < len(args) and args[j + 1] == '=':
-                    break
-                j += 1
-            
-            # Если значение состоит из нескольких слов (без кавычек) - ошибка
-            if j > value_start + 1:
-                original_value = ' '.join(args[value_start:j])
-                print("Ошибка: Обнаружены пробелы в значении условия WHERE")
-                print("Если значение содержит пробелы, заключите его в кавычки:")
-                print(f"Используйте: {column} = \"{original_value}\"")
-                return False
-            
-            # Переходим к следующему условию
-            i = j
-        else:
-            i += 1
-    
-    return True
-
 def validate_set_conditions(args, start_index):
     """
     Проверяет условия SET на наличие пробелов в значениях без кавычек.
@@ -191,7 +196,7 @@ def validate_set_conditions(args, start_index):
             
             if j > value_start + 1:
                 original_value = ' '.join(args[value_start:j])
-                print("Ошибка: Обнаружены пробелы в значении условия SET")
+                print_error("Ошибка: Обнаружены пробелы в значении условия SET")
                 print("Если значение содержит пробелы, заключите его в кавычки:")
                 print(f"Используйте: {column} = \"{original_value}\"")
                 return False
@@ -200,4 +205,331 @@ def validate_set_conditions(args, start_index):
         else:
             i += 1
     
-    return True
\ No newline at end of file
+    return True
+
+
+def tokenize_condition(text):
+    """
+    Делит условие WHERE на лексемы (вид, текст).
+    Виды: 'value' - строка в кавычках, 'op' - оператор сравнения,
+    'punct' - скобка или запятая, 'word' - остальные слова.
+    """
+
+    tokens = []
+    position = 0
+    text = text.rstrip()
+
+    while position < len(text):
+        match = CONDITION_TOKEN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Неожиданный символ '{text[position:].strip()[0]}'")
+
+        double_quoted, single_quoted, operator, punct, word = match.groups()
+        if double_quoted is not None or single_quoted is not None:
+            tokens.append(('value', double_quoted or single_quoted or ''))
+        elif operator is not None:
+            tokens.append(('op', operator))
+        elif punct is not None:
+            tokens.append(('punct', punct))
+        else:
+            tokens.append(('word', word))
+        position = match.end()
+
+    return tokens
+
+
+class ConditionParser:
+    """
+    Разбирает условие WHERE в дерево:
+      ('cmp', столбец, оператор, значение)
+      ('in', столбец, [значения])
+      ('between', столбец, от, до)
+      ('and', [условия]), ('or', [условия]), ('not', условие)
+    Запятая между условиями означает AND. Значения остаются строками.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize_condition(text)
+        self.position = 0
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Пустое условие")
+
+        condition = self._parse_or()
+        if self.position < len(self.tokens):
+            raise ValueError(
+                f"Неожиданное продолжение условия '{self._peek()[1]}'"
+            )
+        return condition
+
+    def _peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+    def _next(self):
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError("Условие оборвано")
+        self.position += 1
+        return token
+
+    def _accept_keyword(self, keyword):
+        kind, text = self._peek()
+        if kind == 'word' and text.lower() == keyword:
+            self.position += 1
+            return True
+        return False
+
+    def _expect_punct(self, punct):
+        kind, text = self._next()
+        if kind != 'punct' or text != punct:
+            raise ValueError(f"Ожидается '{punct}', получено '{text}'")
+
+    def _parse_or(self):
+        terms = [self._parse_and()]
+        while self._accept_keyword('or'):
+            terms.append(self._parse_and())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def _parse_and(self):
+        terms = [self._parse_not()]
+        while True:
+            if self._peek() == ('punct', ','):
+                self.position += 1
+            elif not self._accept_keyword('and'):
+                break
+            terms.append(self._parse_not())
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+    def _parse_not(self):
+        if self._accept_keyword('not'):
+            return ('not', self._parse_not())
+
+        if self._peek() == ('punct', '('):
+            self.position += 1
+            condition = self._parse_or()
+            self._expect_punct(')')
+            return condition
+
+        return self._parse_predicate()
+
+    def _parse_predicate(self):
+        kind, column = self._next()
+        if kind != 'word':
+            raise ValueError(f"Ожидается имя столбца, получено '{column}'")
+
+        negated = self._accept_keyword('not')
+
+        if self._accept_keyword('in'):
+            self._expect_punct('(')
+            values = [self._parse_value()]
+            while self._peek() == ('punct', ','):
+                self.position += 1
+                values.append(self._parse_value())
+            self._expect_punct(')')
+            predicate = ('in', column, values)
+        elif self._accept_keyword('between'):
+            low = self._parse_value()
+            if not self._accept_keyword('and'):
+                raise ValueError("Ожидается AND в условии BETWEEN")
+            predicate = ('between', column, low, self._parse_value())
+        elif negated:
+            raise ValueError("После NOT ожидается IN или BETWEEN")
+        else:
+            kind, operator = self._next()
+            if kind != 'op':
+                raise ValueError(
+                    f"Ожидается оператор сравнения после '{column}', "
+                    f"получено '{operator}'"
+                )
+            predicate = ('cmp', column, COMPARISON_OPERATORS[operator],
+                         self._parse_value())
+
+        return ('not', predicate) if negated else predicate
+
+    def _parse_value(self):
+        kind, text = self._next()
+        if kind not in ('value', 'word'):
+            raise ValueError(f"Ожидается значение, получено '{text}'")
+        return text
+
+
+def split_clauses(statement, keywords):
+    """
+    Делит команду по ключевым словам (вне кавычек, без учета регистра).
+    Возвращает начало команды до первого ключевого слова и словарь
+    {ключевое_слово: текст до следующего ключевого слова}.
+    """
+
+    bounds = []
+    position = 0
+    while position < len(statement):
+        match = CONDITION_TOKEN.match(statement, position)
+        if match is None or match.end() == position:
+            position += 1
+            continue
+
+        word = match.group(5)
+        if word is not None and word.lower() in keywords:
+            bounds.append((word.lower(), match.start(5), match.end()))
+        position = match.end()
+
+    if not bounds:
+        return statement.strip(), {}
+
+    clauses = {}
+    for number, (keyword, _, text_start) in enumerate(bounds):
+        text_end = bounds[number + 1][1] if number + 1 < len(bounds) else None
+        clauses.setdefault(keyword, statement[text_start:text_end].strip())
+
+    return statement[:bounds[0][1]].strip(), clauses
+
+
+def get_where_text(statement):
+    """
+    Возвращает текст команды после ключевого слова WHERE (вне кавычек)
+    или None, если его нет
+    """
+
+    return split_clauses(statement, ('where',))[1].get('where')
+
+
+def parse_order_by(order_str):
+    """
+    Парсит 'by <столбец> [asc|desc]' после ключевого слова ORDER.
+    Возвращает (столбец, по_убыванию) или None при ошибке.
+    """
+
+    words = order_str.split()
+
+    if len(words) not in (2, 3) or words[0].lower() != 'by':
+        print_error("Ошибка: Ожидается 'order by <столбец> [asc|desc]'")
+        return None
+
+    direction = words[2].lower() if len(words) == 3 else 'asc'
+    if direction not in ('asc', 'desc'):
+        print_error(f"Ошибка: Неизвестный порядок сортировки '{words[2]}'")
+        print("Используйте asc или desc")
+        return None
+
+    return words[1], direction == 'desc'
+
+
+def parse_aggregate(item):
+    """
+    Распознает вызов агрегатной функции вида count(*) или sum(age).
+    Возвращает (функция, столбец или None для *) или None, если элемент
+    не является вызовом функции.
+    """
+
+    match = AGGREGATE_CALL.match(item.strip())
+    if match is None:
+        return None
+
+    function, column = match.groups()
+    return function.lower(), None if column == '*' else column
+
+
+def parse_group_by(group_str):
+    """
+    Парсит 'by <столбец1>, <столбец2>, ...' после ключевого слова GROUP.
+    Возвращает список столбцов или None при ошибке.
+    """
+
+    words = group_str.split(None, 1)
+    if len(words) != 2 or words[0].lower() != 'by':
+        print_error("Ошибка: Ожидается 'group by <столбец1>, <столбец2>, ...'")
+        return None
+
+    columns = [column.strip() for column in split_by_commas(words[1])]
+    if not all(columns):
+        print_error("Ошибка: Пустое имя столбца в group by")
+        return None
+    return columns
+
+
+def parse_row_count(count_str, keyword):
+    """
+    Парсит количество записей после ключевого слова LIMIT или OFFSET.
+    Возвращает неотрицательное целое число или None при ошибке.
+    """
+
+    try:
+        count = int(count_str)
+    except ValueError:
+        count = -1
+
+    if count < 0:
+        print_error(
+            f"Ошибка: {keyword} должен быть неотрицательным целым числом: "
+            f"'{count_str}'"
+        )
+        return None
+    return count
+
+
+def parse_where(condition_str):
+    """
+    Парсит условие WHERE с операторами =, !=, <, <=, >, >=, IN, BETWEEN,
+    AND, OR, NOT и скобками. Возвращает дерево условия или None при ошибке.
+    """
+
+    try:
+        return ConditionParser(condition_str).parse()
+    except ValueError as e:
+        print_error(f"Ошибка в условии WHERE: {e}")
+        if "продолжение" in str(e):
+            print("Если значение содержит пробелы, заключите его в кавычки")
+        return None
+
+
+def condition_columns(condition):
+    """
+    Возвращает имена столбцов, упомянутых в условии
+    """
+
+    match condition[0]:
+        case 'and' | 'or':
+            return [
+                column for term in condition[1] for column in condition_columns(term)
+            ]
+        case 'not':
+            return condition_columns(condition[1])
+        case _:
+            return [condition[1]]
+
+
+def convert_condition(condition, table_schema):
+    """
+    Заменяет в условии имена столбцов на имена из схемы (без учета
+    регистра) и преобразует значения к типам столбцов
+    """
+
+    columns = {col_name.lower(): col_name for col_name in table_schema}
+
+    def convert(node):
+        match node[0]:
+            case 'and' | 'or':
+                return (node[0], [convert(term) for term in node[1]])
+            case 'not':
+                return ('not', convert(node[1]))
+
+        column = columns.get(node[1].lower(), node[1])
+        col_type = table_schema.get(column)
+
+        match node[0]:
+            case 'cmp':
+                return ('cmp', column, node[2], convert_value(node[3], col_type))
+            case 'in':
+                return ('in', column, [convert_value(v, col_type) for v in node[2]])
+            case 'between':
+                return (
+                    'between',
+                    column,
+                    convert_value(node[2], col_type),
+                    convert_value(node[3], col_type),
+                )
+
+    return convert(condition)
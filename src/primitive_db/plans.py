@@ -0,0 +1,155 @@
+import re
+from collections import OrderedDict
+
+from .core import convert_column_value
+from .parser import PARAMETER, PARAMETER_MARK, convert_value
+
+# Количество планов команд в кэше
+PLAN_CACHE_SIZE = 256
+
+# Строка в кавычках или пробелы вне кавычек
+_QUOTED_OR_SPACES = re.compile(r"""("[^"]*"|'[^']*')|\s+""")
+
+# Строка в кавычках или знак ? вне кавычек
+_QUOTED_OR_PARAMETER = re.compile(r"""("[^"]*"|'[^']*')|\?""")
+
+
+def normalize_statement(statement):
+    """
+    Приводит текст команды к виду ключа кэша планов: пробелы вне
+    кавычек сжимаются до одного, значения в кавычках не меняются
+    """
+
+    return _QUOTED_OR_SPACES.sub(
+        lambda match: match.group(1) or ' ', statement.strip()
+    )
+
+
+def mark_parameters(statement):
+    """
+    Заменяет знаки ? вне кавычек на PARAMETER_MARK
+    """
+
+    return _QUOTED_OR_PARAMETER.sub(
+        lambda match: match.group(1) or PARAMETER_MARK, statement
+    )
+
+
+def count_parameters(plan):
+    """
+    Количество мест для значений (PARAMETER) в плане
+    """
+
+    count = 0
+
+    def count_value(value, col_name, col_type):
+        nonlocal count
+        count += 1
+        return value
+
+    _bind(plan, count_value)
+    return count
+
+
+def bind_parameters(plan, values):
+    """
+    Возвращает копию плана, в которой места для значений заменены
+    значениями values (строками) по порядку, преобразованными к типам
+    столбцов. При ошибке преобразования выбрасывает ValueError.
+    """
+
+    values = iter(values)
+
+    def convert(_, col_name, col_type):
+        return convert_value(next(values), col_type)
+
+    def convert_for_insert(_, col_name, col_type):
+        return convert_column_value(col_name, col_type, next(values))
+
+    return _bind(plan, convert, convert_for_insert)
+
+
+def _bind(plan, bind_value, bind_record_value=None):
+    """
+    Обходит значения плана в порядке их следования в тексте команды
+    (запись insert, SET, затем WHERE) и заменяет PARAMETER результатом
+    bind_value(значение, столбец, тип)
+    """
+
+    bind_record_value = bind_record_value or bind_value
+    schema = plan['schema']
+    bound = dict(plan)
+
+    def bind(value, col_name, bind_function=bind_value):
+        if value is PARAMETER:
+            return bind_function(value, col_name, schema.get(col_name))
+        return value
+
+    def bind_condition(node):
+        match node[0]:
+            case 'and' | 'or':
+                return (node[0], [bind_condition(term) for term in node[1]])
+            case 'not':
+                return ('not', bind_condition(node[1]))
+            case 'cmp':
+                return ('cmp', node[1], node[2], bind(node[3], node[1]))
+            case 'in':
+                return ('in', node[1], [bind(value, node[1]) for value in node[2]])
+            case 'between':
+                low = bind(node[2], node[1])
+                return ('between', node[1], low, bind(node[3], node[1]))
+
+    if plan.get('record') is not None:
+        bound['record'] = {
+            col_name: bind(value, col_name, bind_record_value)
+            for col_name, value in plan['record'].items()
+        }
+    if plan.get('set') is not None:
+        bound['set'] = {
+            col_name: bind(value, col_name) for col_name, value in plan['set'].items()
+        }
+    if plan.get('condition') is not None:
+        bound['condition'] = bind_condition(plan['condition'])
+
+    return bound
+
+
+class PlanCache:
+    """
+    Кэш планов команд (LRU) по нормализованному тексту команды.
+
+    План - результат разбора и проверки команды: словарь с видом
+    команды ('command'), таблицей ('table'), схемой таблицы на момент
+    разбора ('schema') и разобранными частями команды. Повторная
+    команда выполняется по плану без разбора текста. План используется,
+    только пока схема таблицы не изменилась.
+    """
+
+    def __init__(self, max_size=PLAN_CACHE_SIZE):
+        self.max_size = max_size
+        self._plans = OrderedDict()
+
+    def get(self, statement, metadata):
+        """
+        Возвращает план команды или None, если его нет или он устарел
+        """
+
+        key = normalize_statement(statement)
+        plan = self._plans.get(key)
+        if plan is None:
+            return None
+
+        if metadata.get(plan['table']) != plan['schema']:
+            del self._plans[key]
+            return None
+
+        self._plans.move_to_end(key)
+        return plan
+
+    def put(self, statement, plan):
+        key = normalize_statement(statement)
+        self._plans[key] = plan
+        self._plans.move_to_end(key)
+
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
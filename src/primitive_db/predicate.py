@@ -0,0 +1,162 @@
+import operator
+
+# Операторы сравнения условия WHERE
+COMPARISONS = {
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+
+def compile_predicate(condition, table):
+    """
+    Компилирует условие WHERE в функцию position -> bool для таблицы.
+
+    Столбцы и значения условия разрешаются один раз при компиляции,
+    поэтому при проверке записи не выполняется ни разбор условия,
+    ни поиск столбцов по имени. Функция действительна, пока позиции
+    записей таблицы не меняются.
+    """
+
+    match condition[0]:
+        case 'and':
+            return _all_of([compile_predicate(term, table) for term in condition[1]])
+
+        case 'or':
+            return _any_of([compile_predicate(term, table) for term in condition[1]])
+
+        case 'not':
+            test = compile_predicate(condition[1], table)
+            return lambda position: not test(position)
+
+        case 'cmp':
+            _, column, op, value = condition
+            if op == '=':
+                return table.equality_test(column, value)
+
+            get = table.column_getter(column)
+            compare = COMPARISONS[op]
+            return lambda position: compare(get(position), value)
+
+        case 'in':
+            _, column, values = condition
+            get = table.column_getter(column)
+            values = frozenset(values)
+            return lambda position: get(position) in values
+
+        case 'between':
+            _, column, low, high = condition
+            get = table.column_getter(column)
+            return lambda position: low <= get(position) <= high
+
+
+def _all_of(tests):
+    first, *rest = tests
+    if not rest:
+        return first
+
+    others = _all_of(rest)
+    return lambda position: first(position) and others(position)
+
+
+def _any_of(tests):
+    first, *rest = tests
+    if not rest:
+        return first
+
+    others = _any_of(rest)
+    return lambda position: first(position) or others(position)
+
+
+def equality_terms(condition):
+    """
+    Возвращает условия вида столбец = значение, которые должны выполняться
+    для всех подходящих записей (соединенные через AND на верхнем уровне),
+    в формате {столбец: значение}
+    """
+
+    if condition is None:
+        return {}
+
+    match condition[0]:
+        case 'cmp' if condition[2] == '=':
+            return {condition[1]: condition[3]}
+        case 'and':
+            terms = {}
+            for term in condition[1]:
+                for column, value in equality_terms(term).items():
+                    terms.setdefault(column, value)
+            return terms
+        case _:
+            return {}
+
+
+def range_terms(condition):
+    """
+    Возвращает границы значений столбцов из условий <, <=, >, >=, =
+    и BETWEEN, соединенных через AND на верхнем уровне, в формате
+    {столбец: (от, включая_от, до, включая_до)}. Граница None означает
+    отсутствие ограничения.
+    """
+
+    if condition is None:
+        return {}
+
+    match condition[0]:
+        case 'and':
+            terms = [_term_bounds(term) for term in condition[1]]
+        case 'cmp' | 'between':
+            terms = [_term_bounds(condition)]
+        case _:
+            return {}
+
+    bounds = {}
+    for term in terms:
+        for column, (low, high) in term.items():
+            if column in bounds:
+                old_low, old_high = bounds[column]
+                # Из двух нижних границ строже большая, при равных значениях -
+                # невключительная; для верхних наоборот
+                low = max(
+                    filter(None, (low, old_low)),
+                    key=lambda bound: (bound[0], not bound[1]),
+                    default=None,
+                )
+                high = min(filter(None, (high, old_high)), default=None)
+            bounds[column] = (low, high)
+
+    return {
+        column: (*(low or (None, True)), *(high or (None, True)))
+        for column, (low, high) in bounds.items()
+    }
+
+
+def _term_bounds(condition):
+    """
+    Границы одного условия в формате {столбец: (нижняя, верхняя)},
+    где граница - пара (значение, включительно) или None
+    """
+
+    if condition[0] == 'between':
+        _, column, low, high = condition
+        return {column: ((low, True), (high, True))}
+
+    if condition[0] != 'cmp':
+        return {}
+
+    _, column, op, value = condition
+    match op:
+        case '=':
+            return {column: ((value, True), (value, True))}
+        case '<':
+            return {column: (None, (value, False))}
+        case '<=':
+            return {column: (None, (value, True))}
+        case '>':
+            return {column: ((value, False), None)}
+        case '>=':
+            return {column: ((value, True), None)}
+        case _:
+            return {}
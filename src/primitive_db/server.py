@@ -0,0 +1,274 @@
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import stat
+
+from . import engine
+from .utils import print_error
+from .wal import WAL_SYNC_INTERVAL
+
+# Максимальная длина строки запроса (одна команда в формате JSON)
+SERVER_MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+# Через сколько секунд без команд транзакция клиента отменяется, чтобы
+# не задерживать остальных клиентов (0 - не отменяется)
+TRANSACTION_IDLE_TIMEOUT = 60.0
+
+
+
+def execute(user_input, prepared=None):
+    """
+    Выполняет команду и фиксирует ее изменения. prepared - подготовленные
+    команды сеанса клиента (см. engine.execute_command). Возвращает
+    структурированный результат: {'ok': признак успеха, 'output': строки
+    сообщений, 'columns': столбцы, 'rows': записи select списками значений}.
+    """
+
+    result = {'columns': [], 'rows': []}
+    output = io.StringIO()
+
+    # Команды сообщают о результате через print - сообщения собираются
+    with contextlib.redirect_stdout(output):
+        try:
+            ok = engine.execute_command(
+                user_input, result=result, prepared=prepared
+            )
+        except Exception as e:
+            print_error(f"Произошла непредвиденная ошибка: {e}")
+            ok = False
+
+        if not engine.table_cache.commit():
+            print_error("Ошибка при сохранении данных")
+            ok = False
+
+    return {'ok': ok, 'output': output.getvalue().splitlines(), **result}
+
+
+class QueryServer:
+    """
+    Сервер запросов: метаданные, таблицы и индексы остаются в памяти
+    процесса (engine.table_cache) между запросами всех клиентов.
+
+    Протокол - строки JSON: клиент отправляет {"command": "<команда>"},
+    сервер отвечает результатом execute(). Команды выполняются по одной;
+    клиент, начавший транзакцию (begin), выполняет команды без других
+    клиентов до commit или rollback. При отключении клиента его
+    незавершенная транзакция отменяется; она отменяется и тогда, когда
+    клиент не присылает команд дольше transaction_timeout секунд.
+    Подготовленные команды (prepare) видны только подключению, которое
+    их подготовило, и удаляются при его отключении.
+    """
+
+    def __init__(self, transaction_timeout=TRANSACTION_IDLE_TIMEOUT):
+        self._lock = asyncio.Lock()
+        self._transaction_timeout = transaction_timeout
+        # Клиент, у которого открыта транзакция
+        self._transaction_owner = None
+        # Клиенты, чья транзакция отменена по времени: об этом сообщается
+        # в ответе на следующий запрос
+        self._timed_out = set()
+
+    async def handle_client(self, reader, writer):
+        client = object()
+        prepared = {}
+
+        try:
+            while True:
+                try:
+                    line = await self._read_request(client, reader)
+                except (ConnectionError, ValueError):
+                    break
+                if not line:
+                    break
+
+                response = await self._handle_request(client, prepared, line)
+                if response is None:
+                    break
+
+                writer.write(json.dumps(response, ensure_ascii=False).encode())
+                writer.write(b'\n')
+                await writer.drain()
+
+        except ConnectionError:
+            pass
+
+        finally:
+            if self._transaction_owner is client:
+                engine.table_cache.rollback_transaction()
+                self._release()
+            self._timed_out.discard(client)
+            prepared.clear()
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    async def commit_periodically(self):
+        """
+        Фиксирует журнал изменений, пока клиенты не присылают команд,
+        чтобы fsync группы изменений не откладывался
+        """
+
+        while True:
+            await asyncio.sleep(WAL_SYNC_INTERVAL)
+            if not self._lock.locked():
+                engine.table_cache.commit()
+
+    async def _read_request(self, client, reader):
+        """
+        Читает строку запроса. Если клиент с открытой транзакцией не
+        присылает ее дольше transaction_timeout секунд, транзакция
+        отменяется и блокировка передается другим клиентам.
+        """
+
+        if self._transaction_owner is not client or not self._transaction_timeout:
+            return await reader.readline()
+
+        try:
+            return await asyncio.wait_for(
+                reader.readline(), self._transaction_timeout
+            )
+        except asyncio.TimeoutError:
+            engine.table_cache.rollback_transaction()
+            self._release()
+            self._timed_out.add(client)
+
+        return await reader.readline()
+
+    async def _handle_request(self, client, prepared, line):
+        try:
+            request = json.loads(line)
+            user_input = str(request['command']).strip()
+        except (ValueError, TypeError, KeyError):
+            return {
+                'ok': False,
+                'output': ['Ошибка: Ожидается запрос {"command": "<команда>"}'],
+                'columns': [],
+                'rows': [],
+            }
+
+        if user_input.lower() in engine.EXIT_COMMANDS:
+            return None
+        if not user_input:
+            return {'ok': True, 'output': [], 'columns': [], 'rows': []}
+
+        # Команда относилась к отмененной транзакции и не выполняется
+        if client in self._timed_out:
+            self._timed_out.discard(client)
+            return {
+                'ok': False,
+                'output': [
+                    "Ошибка: Транзакция отменена: команд не было дольше "
+                    f"{self._transaction_timeout:g} с",
+                ],
+                'columns': [],
+                'rows': [],
+            }
+
+        if self._transaction_owner is not client:
+            await self._lock.acquire()
+
+        try:
+            return execute(user_input, prepared)
+        finally:
+            # Блокировка остается у клиента до конца его транзакции
+            if engine.table_cache.in_transaction():
+                self._transaction_owner = client
+            else:
+                self._release()
+
+    def _release(self):
+        self._transaction_owner = None
+        self._lock.release()
+
+
+async def serve(
+    socket_path=None, host=None, port=None,
+    transaction_timeout=TRANSACTION_IDLE_TIMEOUT,
+):
+    """
+    Запускает сервер на Unix-сокете socket_path или на TCP-адресе
+    host:port и обслуживает клиентов до сигнала SIGINT или SIGTERM
+    """
+
+    engine.recover_changes()
+    query_server = QueryServer(transaction_timeout)
+
+    if socket_path is not None:
+        remove_stale_socket(socket_path)
+        server = await asyncio.start_unix_server(
+            query_server.handle_client,
+            path=socket_path,
+            limit=SERVER_MAX_REQUEST_BYTES,
+        )
+        address = socket_path
+    else:
+        server = await asyncio.start_server(
+            query_server.handle_client,
+            host=host or '127.0.0.1',
+            port=port,
+            limit=SERVER_MAX_REQUEST_BYTES,
+        )
+        host, port = server.sockets[0].getsockname()[:2]
+        address = f"{host}:{port}"
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(signal_number, stopped.set)
+
+    print(f"Сервер базы данных запущен: {address}")
+    commit_task = asyncio.create_task(query_server.commit_periodically())
+
+    try:
+        async with server:
+            await stopped.wait()
+    finally:
+        commit_task.cancel()
+        server.close()
+        await server.wait_closed()
+        saved = engine.table_cache.close()
+        if socket_path is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(socket_path)
+
+    print("Сервер остановлен")
+    return saved
+
+
+def remove_stale_socket(socket_path):
+    """
+    Удаляет файл сокета, оставшийся после предыдущего запуска сервера.
+    Сокет работающего сервера не удаляется.
+    """
+
+    try:
+        if not stat.S_ISSOCK(os.stat(socket_path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.remove(socket_path)
+            return
+
+    raise OSError(f"Сокет '{socket_path}' уже использует другой сервер")
+
+
+def run_server(
+    socket_path=None, host=None, port=None,
+    transaction_timeout=TRANSACTION_IDLE_TIMEOUT,
+):
+    """
+    Запускает сервер (см. serve). Возвращает True, если все изменения
+    сохранены.
+    """
+
+    return asyncio.run(serve(socket_path, host, port, transaction_timeout))
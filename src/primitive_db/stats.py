@@ -0,0 +1,197 @@
+import math
+import zlib
+
+# Количество регистров оценки числа различных значений (HyperLogLog).
+# Погрешность оценки около 1.04 / sqrt(SKETCH_REGISTERS), то есть ~9%.
+SKETCH_REGISTERS = 128
+SKETCH_INDEX_BITS = 7
+
+# Доля записей, начиная с которой полный просмотр таблицы выгоднее
+# просмотра диапазона по упорядоченному индексу
+RANGE_SCAN_MAX_FRACTION = 0.25
+
+_MASK64 = (1 << 64) - 1
+
+
+def _hash(value):
+    """
+    64-битный хэш значения, одинаковый во всех сессиях (встроенный
+    hash() для строк от сессии к сессии меняется)
+    """
+
+    value_hash = zlib.crc32(repr(value).encode('utf-8'))
+    value_hash = (value_hash * 0x9E3779B97F4A7C15) & _MASK64
+    return (value_hash >> 32) | ((value_hash & 0xFFFFFFFF) << 32)
+
+
+def new_stats(table_schema):
+    """
+    Возвращает статистику пустой таблицы
+    """
+
+    columns = {}
+    for col_name, col_type in table_schema.items():
+        columns[col_name] = {'sketch': bytes(SKETCH_REGISTERS).hex()}
+        if col_type == 'int':
+            columns[col_name].update({'min': None, 'max': None})
+
+    return {'rows': 0, 'bytes': 0, 'columns': columns}
+
+
+def add_records(stats, records):
+    """
+    Учитывает в статистике добавленные записи
+    """
+
+    stats['rows'] += len(records)
+
+    for col_name, column_stats in stats['columns'].items():
+        _add_values(column_stats, {record.get(col_name) for record in records})
+
+
+def update_values(stats, values):
+    """
+    Учитывает в статистике значения {столбец: значение}, записанные
+    командой update
+    """
+
+    for col_name, value in values.items():
+        column_stats = stats['columns'].get(col_name)
+        if column_stats is not None and col_name != 'ID':
+            _add_values(column_stats, {value})
+
+
+def discard_value(stats, col_name, value):
+    """
+    Учитывает удаление или замену значения столбца. Если это был
+    минимум или максимум, они отмечаются устаревшими и уточняются
+    при следующем запросе статистики (см. refresh_bounds). Регистры
+    оценки числа различных значений не меняются.
+    """
+
+    column_stats = stats['columns'].get(col_name)
+    if (
+        column_stats is not None
+        and column_stats.get('min') is not None
+        and value in (column_stats['min'], column_stats['max'])
+    ):
+        column_stats['stale'] = True
+
+
+def clear_values(stats):
+    """
+    Сбрасывает статистику значений столбцов после удаления всех записей
+    """
+
+    for column_stats in stats['columns'].values():
+        column_stats.pop('stale', None)
+        column_stats['sketch'] = bytes(SKETCH_REGISTERS).hex()
+        if 'min' in column_stats:
+            column_stats.update({'min': None, 'max': None})
+
+
+def has_stale_bounds(stats):
+    return any(column_stats.get('stale') for column_stats in stats['columns'].values())
+
+
+def refresh_bounds(stats, table):
+    """
+    Пересчитывает минимум и максимум столбцов, отмеченных устаревшими.
+    Остальная статистика не пересчитывается.
+    """
+
+    for col_name, column_stats in stats['columns'].items():
+        if not column_stats.pop('stale', False):
+            continue
+
+        get = table.column_getter(col_name)
+        values = [get(position) for position in table.positions()]
+        values = [value for value in values if value is not None]
+        column_stats['min'] = min(values, default=None)
+        column_stats['max'] = max(values, default=None)
+
+
+def compute_stats(table_schema, table):
+    """
+    Считает статистику по всем записям таблицы
+    """
+
+    stats = new_stats(table_schema)
+    stats['rows'] = len(table)
+
+    for col_name, column_stats in stats['columns'].items():
+        get = table.column_getter(col_name)
+        _add_values(column_stats, {get(position) for position in table.positions()})
+
+    return stats
+
+
+def _add_values(column_stats, values):
+    """
+    Учитывает различные значения столбца в минимуме, максимуме
+    и регистрах оценки числа различных значений
+    """
+
+    values.discard(None)
+    if not values:
+        return
+
+    if 'min' in column_stats:
+        low, high = min(values), max(values)
+        if column_stats['min'] is None or low < column_stats['min']:
+            column_stats['min'] = low
+        if column_stats['max'] is None or high > column_stats['max']:
+            column_stats['max'] = high
+
+    registers = bytearray.fromhex(column_stats['sketch'])
+    for value in values:
+        value_hash = _hash(value)
+        register = value_hash & (SKETCH_REGISTERS - 1)
+        # Позиция старшего единичного бита в оставшихся битах хэша (с 1)
+        rest = value_hash >> SKETCH_INDEX_BITS
+        rank = 64 - SKETCH_INDEX_BITS - rest.bit_length() + 1
+        if rank > registers[register]:
+            registers[register] = rank
+    column_stats['sketch'] = registers.hex()
+
+
+def distinct_estimate(column_stats):
+    """
+    Оценивает количество различных значений столбца по регистрам
+    """
+
+    registers = bytes.fromhex(column_stats['sketch'])
+    alpha = 0.7213 / (1 + 1.079 / SKETCH_REGISTERS)
+    estimate = alpha * SKETCH_REGISTERS ** 2 / sum(2.0 ** -rank for rank in registers)
+
+    # Для малого числа значений точнее оценка по пустым регистрам
+    empty = registers.count(0)
+    if estimate <= 2.5 * SKETCH_REGISTERS and empty:
+        estimate = SKETCH_REGISTERS * math.log(SKETCH_REGISTERS / empty)
+
+    return round(estimate)
+
+
+def range_fraction(stats, column, bounds):
+    """
+    Оценивает долю записей со значениями столбца int в диапазоне
+    bounds = (от, включая_от, до, включая_до), считая значения
+    равномерно распределенными между минимумом и максимумом.
+    Возвращает None, если оценить долю нельзя.
+    """
+
+    if not stats:
+        return None
+
+    column_stats = stats['columns'].get(column, {})
+    low_value, high_value = column_stats.get('min'), column_stats.get('max')
+    if low_value is None or high_value is None:
+        return None
+
+    low, _, high, _ = bounds
+    low = low_value if low is None else max(low, low_value)
+    high = high_value if high is None else min(high, high_value)
+
+    if high < low:
+        return 0.0
+    return (high - low + 1) / (high_value - low_value + 1)
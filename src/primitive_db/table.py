@@ -0,0 +1,598 @@
+from array import array
+from bisect import bisect_left
+
+from .index import INDEX_KINDS
+from .stats import clear_values, discard_value
+from .vectorized import compact_columns
+
+# Представления таблицы в памяти
+TABLE_LAYOUTS = ('rows', 'columnar')
+
+# Диапазон целых, которые помещаются в столбец int представления columnar
+# и в файл таблицы в формате binary
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def check_int64(column, value):
+    """
+    Проверяет, что целое значение столбца помещается в 64 бита;
+    иначе выбрасывает ValueError
+    """
+
+    if type(value) is int and not INT64_MIN <= value <= INT64_MAX:
+        raise ValueError(
+            f"Значение {value} столбца '{column}' не помещается "
+            "в 64-битное целое"
+        )
+
+
+class Table:
+    """
+    Записи таблицы в памяти.
+
+    Хранит карту ID -> позиция записи и индексы по столбцам. Удаленная
+    запись заменяется пометкой None и убирается при сжатии, поэтому
+    позиции остальных записей до сжатия не меняются.
+    """
+
+    layout = 'rows'
+
+    # Целые значения должны помещаться в 64 бита (таблица сохраняется
+    # в формате binary)
+    int64_only = False
+
+    # Журнал отмены изменений внутри транзакции (см. undo()) или None
+    undo_log = None
+
+    # Номер версии данных: растет при каждом изменении таблицы
+    # (по нему parallel.py проверяет, что процессы пула видят текущие данные)
+    version = 0
+
+    def __init__(self, records=None):
+        self.rows = list(records) if records else []
+        self.indexes = {}
+        self.deleted = 0
+        # Статистика таблицы из метаданных (см. stats.py), если известна
+        self.stats = None
+        self.id_map = {record['ID']: pos for pos, record in enumerate(self.rows)}
+
+    def __len__(self):
+        return self.position_count() - self.deleted
+
+    def __iter__(self):
+        return (record for record in self.rows if record is not None)
+
+    def position_count(self):
+        """
+        Количество позиций, включая удаленные записи
+        """
+
+        return len(self.rows)
+
+    def positions(self):
+        """
+        Возвращает позиции неудаленных записей
+        """
+
+        return (
+            position
+            for position, record in enumerate(self.rows)
+            if record is not None
+        )
+
+    def is_alive(self, position):
+        return self.rows[position] is not None
+
+    def get(self, position):
+        return self.rows[position]
+
+    def value(self, position, column):
+        return self.rows[position].get(column)
+
+    def column_getter(self, column):
+        """
+        Возвращает функцию position -> значение столбца
+        """
+
+        rows = self.rows
+        return lambda position: rows[position].get(column)
+
+    def row_getter(self, columns):
+        """
+        Возвращает функцию position -> словарь с указанными столбцами
+        записи. Остальные столбцы не читаются.
+        """
+
+        getters = [(column, self.column_getter(column)) for column in columns]
+        return lambda position: {column: get(position) for column, get in getters}
+
+    def equality_test(self, column, value):
+        """
+        Возвращает функцию position -> bool, проверяющую равенство
+        значения столбца указанному значению
+        """
+
+        get = self.column_getter(column)
+        return lambda position: get(position) == value
+
+    def find_position(self, record_id):
+        """
+        Возвращает позицию записи с указанным ID или None
+        """
+
+        return self.id_map.get(record_id)
+
+    def max_id(self):
+        return max(self.id_map, default=0)
+
+    def add_index(self, column, kind='hash'):
+        index = INDEX_KINDS[kind].build(column, self)
+        self.indexes[column] = index
+        return index
+
+    def append(self, record):
+        position = len(self.rows)
+        self.rows.append(record)
+        self.id_map[record['ID']] = position
+        self.log_undo('append')
+
+        for column, index in self.indexes.items():
+            index.add(record.get(column), position)
+
+    def extend(self, records):
+        """
+        Добавляет записи. Если запись нельзя сохранить, не добавляется
+        ни одна.
+        """
+
+        for record in records:
+            for column, value in record.items():
+                self.check_value(column, value)
+
+        for record in records:
+            self.append(record)
+
+    def check_value(self, column, value):
+        """
+        Проверяет, что значение можно записать в столбец; иначе
+        выбрасывает ValueError
+        """
+
+        if self.int64_only:
+            check_int64(column, value)
+
+    def set_value(self, position, column, value):
+        """
+        Изменяет значение столбца записи и обновляет индекс по столбцу
+        """
+
+        record = self.rows[position]
+        index = self.indexes.get(column)
+
+        if index is not None:
+            index.remove(record[column], position)
+            index.add(value, position)
+        if self.stats is not None:
+            discard_value(self.stats, column, record.get(column))
+        self.log_undo('set', position, column, record.get(column))
+
+        record[column] = value
+
+    def remove(self, position):
+        """
+        Помечает запись удаленной без сдвига остальных записей
+        """
+
+        record = self.rows[position]
+        self.rows[position] = None
+        self.deleted += 1
+        del self.id_map[record['ID']]
+        self.log_undo('remove', position, record)
+
+        for column, index in self.indexes.items():
+            index.remove(record.get(column), position)
+        if self.stats is not None:
+            for column, value in record.items():
+                discard_value(self.stats, column, value)
+
+    def clear(self):
+        self.log_undo('clear', self._state())
+        self.rows = []
+        self.deleted = 0
+        self.id_map = {}
+        self._rebuild_indexes()
+        if self.stats is not None:
+            clear_values(self.stats)
+
+    def compact(self):
+        """
+        Убирает удаленные записи и перестраивает карту ID и индексы.
+        Возвращает True, если позиции записей изменились.
+        """
+
+        if not self.deleted:
+            return False
+
+        self.rows = list(self)
+        self.deleted = 0
+        self.version += 1
+        self.id_map = {record['ID']: pos for pos, record in enumerate(self.rows)}
+        self._rebuild_indexes()
+        return True
+
+    def to_records(self):
+        """
+        Возвращает неудаленные записи в виде списка словарей
+        """
+
+        return list(self)
+
+    def log_undo(self, *undo_entry):
+        """
+        Отмечает изменение таблицы и запоминает, как его отменить, если
+        ведется журнал отмены
+        """
+
+        self.version += 1
+        if self.undo_log is not None:
+            self.undo_log.append(undo_entry)
+
+    def undo(self):
+        """
+        Отменяет изменения из журнала отмены в обратном порядке
+        и прекращает его вести
+        """
+
+        undo_log, self.undo_log = self.undo_log or [], None
+        self.version += 1
+
+        for undo_entry in reversed(undo_log):
+            match undo_entry:
+                case ('append',):
+                    self._undo_append()
+                case ('set', position, column, value):
+                    self.set_value(position, column, value)
+                case ('assign', column, positions, values):
+                    self._undo_assign(column, positions, values)
+                case ('remove', position, record):
+                    self._undo_remove(position, record)
+                case ('clear', state):
+                    vars(self).update(state)
+                    self._rebuild_indexes()
+
+    def _state(self):
+        """
+        Контейнеры с данными таблицы, которые заменяются при clear()
+        """
+
+        return {'rows': self.rows, 'deleted': self.deleted, 'id_map': self.id_map}
+
+    def _undo_append(self):
+        position = len(self.rows) - 1
+        record = self.rows.pop()
+        del self.id_map[record['ID']]
+        self._unindex(record, position)
+
+    def _undo_remove(self, position, record):
+        self.rows[position] = record
+        self.deleted -= 1
+        self.id_map[record['ID']] = position
+
+        for column, index in self.indexes.items():
+            index.add(record.get(column), position)
+
+    def _unindex(self, record, position):
+        """
+        Убирает из индексов последнюю запись таблицы
+        """
+
+        for column, index in self.indexes.items():
+            index.remove(record.get(column), position)
+            index.rows = min(index.rows, position)
+
+    def _rebuild_indexes(self):
+        for index in self.indexes.values():
+            index.rebuild(self)
+
+
+class ColumnarTable(Table):
+    """
+    Таблица, хранящая данные по столбцам.
+
+    Столбцы int хранятся в array('q'), столбцы bool - в bytearray,
+    столбцы str - словарным кодированием (массив кодов и список
+    различных значений). Словарь записи создается только при выдаче
+    записи наружу. Целые значения должны помещаться в 64 бита.
+
+    ID выдаются по возрастанию, поэтому позиция записи по ID ищется
+    двоичным поиском в столбце ID. Отдельная карта ID -> позиция
+    строится, только если ID в данных не упорядочены.
+    """
+
+    layout = 'columnar'
+
+    def __init__(self, table_schema, records=None):
+        self.schema = dict(table_schema)
+        self.indexes = {}
+        self.deleted = 0
+        self.stats = None
+        self._reset_columns()
+
+        for record in records or ():
+            self._append_values(self._encode_record(record))
+        self.id_map = self._build_id_map()
+
+    def __iter__(self):
+        return (self.get(position) for position in self.positions())
+
+    def position_count(self):
+        return len(self.alive)
+
+    def positions(self):
+        alive = self.alive
+        return (position for position in range(len(alive)) if alive[position])
+
+    def is_alive(self, position):
+        return bool(self.alive[position])
+
+    def get(self, position):
+        if not self.alive[position]:
+            return None
+        return {column: self.value(position, column) for column in self.schema}
+
+    def value(self, position, column):
+        match self.schema.get(column):
+            case 'int':
+                return self.columns[column][position]
+            case 'bool':
+                return bool(self.columns[column][position])
+            case 'str':
+                return self.str_values[column][self.columns[column][position]]
+            case _:
+                return None
+
+    def column_getter(self, column):
+        values = self.columns.get(column)
+
+        match self.schema.get(column):
+            case 'int':
+                return values.__getitem__
+            case 'bool':
+                return lambda position: bool(values[position])
+            case 'str':
+                str_values = self.str_values[column]
+                return lambda position: str_values[values[position]]
+            case _:
+                return lambda position: None
+
+    def equality_test(self, column, value):
+        if self.schema.get(column) != 'str':
+            return super().equality_test(column, value)
+
+        # Строки сравниваются по коду словаря без обращения к значениям
+        code = self.str_codes[column].get(value)
+        if code is None:
+            return lambda position: False
+
+        codes = self.columns[column]
+        return lambda position: codes[position] == code
+
+    def find_position(self, record_id):
+        if self.id_map is not None:
+            return self.id_map.get(record_id)
+
+        ids = self.columns['ID']
+        position = bisect_left(ids, record_id)
+        if position < len(ids) and ids[position] == record_id and self.alive[position]:
+            return position
+        return None
+
+    def max_id(self):
+        return max(self.columns['ID'], default=0)
+
+    def append(self, record):
+        self._append_record(record, self._encode_record(record))
+
+    def extend(self, records):
+        # Все значения проверяются до изменения столбцов
+        encoded = [self._encode_record(record) for record in records]
+        for record, values in zip(records, encoded):
+            self._append_record(record, values)
+
+    def check_value(self, column, value):
+        self.encode(column, value)
+
+    def set_value(self, position, column, value):
+        encoded = self.encode(column, value)
+        index = self.indexes.get(column)
+
+        if index is not None:
+            index.remove(self.value(position, column), position)
+            index.add(value, position)
+        if self.stats is not None:
+            discard_value(self.stats, column, self.value(position, column))
+        self.log_undo('set', position, column, self.value(position, column))
+
+        self.columns[column][position] = encoded
+
+    def remove(self, position):
+        record_id = self.columns['ID'][position]
+
+        for column, index in self.indexes.items():
+            index.remove(self.value(position, column), position)
+        if self.stats is not None:
+            for column in self.schema:
+                discard_value(self.stats, column, self.value(position, column))
+
+        self.alive[position] = 0
+        self.deleted += 1
+        if self.id_map is not None:
+            del self.id_map[record_id]
+        self.log_undo('remove', position, None)
+
+    def clear(self):
+        self.log_undo('clear', self._state())
+        self.deleted = 0
+        self.id_map = None
+        self._reset_columns()
+        self._rebuild_indexes()
+        if self.stats is not None:
+            clear_values(self.stats)
+
+    def compact(self):
+        if not self.deleted:
+            return False
+
+        if not compact_columns(self):
+            self._compact_columns()
+
+        self.deleted = 0
+        self.version += 1
+        self.id_map = self._build_id_map()
+        self._rebuild_indexes()
+        return True
+
+    def _state(self):
+        return {
+            'alive': self.alive,
+            'columns': self.columns,
+            'str_values': self.str_values,
+            'str_codes': self.str_codes,
+            'deleted': self.deleted,
+            'id_map': self.id_map,
+        }
+
+    def _undo_append(self):
+        position = len(self.alive) - 1
+        record = self.get(position)
+
+        for column in self.schema:
+            self.columns[column].pop()
+        self.alive.pop()
+        if self.id_map is not None:
+            del self.id_map[record['ID']]
+        self._unindex(record, position)
+
+    def _undo_assign(self, column, positions, values):
+        # Значения уже закодированы для столбца
+        values_column = self.columns[column]
+        for position, value in zip(positions, values):
+            values_column[position] = value
+
+    def _undo_remove(self, position, record):
+        self.alive[position] = 1
+        self.deleted -= 1
+        if self.id_map is not None:
+            self.id_map[self.columns['ID'][position]] = position
+
+        for column, index in self.indexes.items():
+            index.add(self.value(position, column), position)
+
+    def _compact_columns(self):
+        live_positions = list(self.positions())
+
+        for column, col_type in self.schema.items():
+            values = self.columns[column]
+            live_values = (values[i] for i in live_positions)
+            match col_type:
+                case 'int':
+                    self.columns[column] = array('q', live_values)
+                case 'bool':
+                    self.columns[column] = bytearray(live_values)
+                case 'str':
+                    # Значения, которые больше не используются, удаляются
+                    old_values = self.str_values[column]
+                    self.str_values[column] = []
+                    self.str_codes[column] = {}
+                    self.columns[column] = array('i', (
+                        self.encode(column, old_values[code]) for code in live_values
+                    ))
+
+        self.alive = bytearray(b'\x01') * len(live_positions)
+
+    def _build_id_map(self):
+        """
+        Строит карту ID -> позиция, если ID не упорядочены по возрастанию.
+        Для упорядоченных ID возвращает None.
+        """
+
+        ids = self.columns['ID']
+        if all(ids[i] < ids[i + 1] for i in range(len(ids) - 1)):
+            return None
+        return {record_id: pos for pos, record_id in enumerate(ids)}
+
+    def _reset_columns(self):
+        self.alive = bytearray()
+        self.columns = {}
+        self.str_values = {}
+        self.str_codes = {}
+
+        for column, col_type in self.schema.items():
+            match col_type:
+                case 'int':
+                    self.columns[column] = array('q')
+                case 'bool':
+                    self.columns[column] = bytearray()
+                case 'str':
+                    self.columns[column] = array('i')
+                    self.str_values[column] = []
+                    self.str_codes[column] = {}
+
+    def _append_record(self, record, values):
+        position = len(self.alive)
+        ids = self.columns['ID']
+
+        if self.id_map is None and ids and record['ID'] <= ids[-1]:
+            self.id_map = {
+                ids[pos]: pos for pos in range(len(ids)) if self.alive[pos]
+            }
+
+        self._append_values(values)
+        if self.id_map is not None:
+            self.id_map[record['ID']] = position
+        self.log_undo('append')
+
+        for column, index in self.indexes.items():
+            index.add(record.get(column), position)
+
+    def _encode_record(self, record):
+        return [self.encode(column, record.get(column)) for column in self.schema]
+
+    def _append_values(self, values):
+        # Значения уже проверены encode(), поэтому столбцы не могут
+        # оказаться разной длины
+        for column, value in zip(self.schema, values):
+            self.columns[column].append(value)
+        self.alive.append(1)
+
+    def encode(self, column, value):
+        """
+        Преобразует значение к виду, в котором оно хранится в столбце.
+        Если значение не помещается в столбец, выбрасывает ValueError.
+        """
+
+        match self.schema[column]:
+            case 'int':
+                check_int64(column, value)
+                return value or 0
+            case 'bool':
+                return 1 if value else 0
+            case 'str':
+                value = '' if value is None else value
+                codes = self.str_codes[column]
+                code = codes.get(value)
+                if code is None:
+                    code = len(self.str_values[column])
+                    codes[value] = code
+                    self.str_values[column].append(value)
+                return code
+
+
+def make_table(table_schema, records=None, layout='rows'):
+    """
+    Создает таблицу в памяти в указанном представлении
+    """
+
+    if layout == 'columnar':
+        return ColumnarTable(table_schema, records)
+    return Table(records)
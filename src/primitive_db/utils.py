@@ -1,9 +1,95 @@
+import csv
 import json
 import os
+import stat
+import tempfile
+
+from .binary import decode_table, encode_table
 
 # Константы
 METADATA_FILE = 'db_meta.json'
 DATA_DIR = 'data'
+LOG_FSYNC_BATCH = 64
+# Ключ метаданных с дополнительными настройками таблиц (индексы и т.п.)
+TABLE_OPTIONS_KEY = '__options__'
+# Форматы файла-снимка таблицы
+TABLE_FORMATS = ('json', 'binary')
+
+# Количество записей, дописанных в журнал таблицы после последнего fsync
+_unsynced_appends = {}
+
+# Количество ошибок, о которых сообщил print_error()
+_error_count = 0
+
+def print_error(message):
+    """
+    Выводит сообщение об ошибке и учитывает ее: по количеству ошибок
+    engine.execute_command() определяет, успешно ли выполнена команда
+    """
+
+    global _error_count
+
+    _error_count += 1
+    print(message)
+
+def get_error_count():
+    """
+    Возвращает количество ошибок, о которых сообщил print_error()
+    """
+
+    return _error_count
+
+def write_file_atomic(filepath, write, mode='w'):
+    """
+    Атомарно записывает файл: write(file) записывает содержимое во
+    временный файл в том же каталоге, файл сбрасывается на диск (fsync)
+    и заменяет прежний одной операцией os.replace. Читатели в других
+    процессах видят либо прежний файл, либо новый целиком, а при сбое
+    во время записи прежний файл остается неповрежденным.
+    """
+
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(filepath)}.", suffix='.tmp'
+    )
+
+    try:
+        encoding = None if 'b' in mode else 'utf-8'
+        with os.fdopen(fd, mode, encoding=encoding) as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+
+        # mkstemp создает файл с правами только для владельца
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(filepath).st_mode))
+        except FileNotFoundError:
+            os.chmod(tmp_path, 0o644)
+
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    _sync_directory(directory)
+
+def _sync_directory(directory):
+    """
+    Сбрасывает на диск запись каталога, чтобы переименование файла
+    пережило сбой питания. Не на всех платформах каталог можно открыть.
+    """
+
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 def ensure_data_dir():
     """Создает директорию data если она не существует"""
@@ -26,87 +112,487 @@ def load_metadata(filepath):
         return {}
 
     except Exception as e:
-        print(f"Ошибка при загрузке метаданных из {filepath}: {e}")
+        print_error(f"Ошибка при загрузке метаданных из {filepath}: {e}")
         return {}
 
 
 def save_metadata(filepath, data):
     """
-    Сохраняет переданные данные в JSON-файл
-
+    Атомарно сохраняет переданные данные в JSON-файл
     """
     
+    def write(file):
+        json.dump(data, file, ensure_ascii=False, indent=2)
+
     try:
-        with open(filepath, "w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, indent=2)
+        write_file_atomic(filepath, write)
     except FileNotFoundError:
-        print(f"Ошибка: Директория для файла '{filepath}' не существует")
+        print_error(f"Ошибка: Директория для файла '{filepath}' не существует")
         print("Создайте директорию вручную или укажите корректный путь")
     except PermissionError:
-        print(f"Ошибка: Нет прав на запись в файл '{filepath}'")
+        print_error(f"Ошибка: Нет прав на запись в файл '{filepath}'")
     except Exception as e:
-        print(f"Ошибка при сохранении метаданных: {e}")
+        print_error(f"Ошибка при сохранении метаданных: {e}")
+
+def get_table_filepath(table_name):
+    """
+    Возвращает путь к файлу-снимку таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.json")
+
+def get_binary_filepath(table_name):
+    """
+    Возвращает путь к файлу-снимку таблицы в двоичном формате
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.bin")
+
+def get_snapshot_filepath(table_name, table_format='json'):
+    """
+    Возвращает путь к файлу-снимку таблицы в указанном формате
+    """
+
+    if table_format == 'binary':
+        return get_binary_filepath(table_name)
+    return get_table_filepath(table_name)
+
+def get_log_filepath(table_name):
+    """
+    Возвращает путь к журналу добавленных записей таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.log")
+
+def get_index_filepath(table_name, column):
+    """
+    Возвращает путь к файлу индекса по столбцу таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.{column}.idx")
 
-def load_table_data(table_name):
+def load_table_data(table_name, table_format='json'):
     """
-    Загружает данные таблицы из файла
+    Загружает данные таблицы из файла-снимка и дописывает
+    записи из журнала добавлений.
+    Если снимка в указанном формате нет, читается снимок в другом формате
+    (например, если преобразование таблицы не было завершено).
     """
     
     ensure_data_dir()
     
-    filepath = os.path.join(DATA_DIR, f"{table_name}.json")
+    filepath = get_snapshot_filepath(table_name, table_format)
+    if not os.path.exists(filepath):
+        for other_format in TABLE_FORMATS:
+            other_filepath = get_snapshot_filepath(table_name, other_format)
+            if os.path.exists(other_filepath):
+                filepath = other_filepath
+                break
 
     try:
-        with open(filepath, 'r', encoding='utf-8') as file:
-            content = file.read().strip()
-            if not content:
-                return []
-            data = json.loads(content)
-            return data
+        if filepath == get_binary_filepath(table_name):
+            with open(filepath, 'rb') as file:
+                data = decode_table(file.read())
+        else:
+            with open(filepath, 'r', encoding='utf-8') as file:
+                content = file.read().strip()
+                data = json.loads(content) if content else []
     
     except FileNotFoundError:
-        return []
+        data = []
     
     except json.JSONDecodeError:  
-        print(f"Ошибка: Файл {filepath} содержит некорректный JSON")
+        print_error(f"Ошибка: Файл {filepath} содержит некорректный JSON")
         return []
     
     except Exception as e:    
-        print(f"Ошибка при загрузке данных таблицы {table_name}: {e}")
+        print_error(f"Ошибка при загрузке данных таблицы {table_name}: {e}")
         return []
 
-def save_table_data(table_name, data):
+    log_records = load_table_log(table_name)
+    if log_records:
+        snapshot_ids = {record['ID'] for record in data}
+        data.extend(drop_known_records(log_records, snapshot_ids.__contains__))
+    return data
+
+def drop_known_records(log_records, in_snapshot):
+    """
+    Возвращает записи журнала добавлений без записей, ID которых есть
+    в снимке (in_snapshot(ID)) или уже встречался в журнале. Такие записи
+    остаются в журнале, если сбой произошел после записи нового снимка,
+    но до удаления журнала.
+    """
+
+    seen_ids = set()
+    records = []
+
+    for record in log_records:
+        record_id = record['ID']
+        if record_id in seen_ids or in_snapshot(record_id):
+            continue
+        seen_ids.add(record_id)
+        records.append(record)
+
+    return records
+
+def load_table_log(table_name):
+    """
+    Читает журнал добавленных записей таблицы (одна JSON-запись на строку)
+    """
+
+    log_path = get_log_filepath(table_name)
+    records = []
+
+    try:
+        with open(log_path, 'r', encoding='utf-8') as file:
+            for line_number, line in enumerate(file, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Недописанная строка после сбоя - остальные записи целы
+                    print(
+                        f"Предупреждение: Пропущена поврежденная строка "
+                        f"{line_number} в журнале {log_path}"
+                    )
+
+    except FileNotFoundError:
+        pass
+
+    return records
+
+def save_table_data(table_name, data, table_format='json', table_schema=None):
     """
-    Сохраняет данные таблицы в файл
+    Сохраняет данные таблицы в файл-снимок и очищает журнал добавлений.
+    Для двоичного формата нужна схема таблицы.
     """
     
     ensure_data_dir()
     
-    filepath = os.path.join(DATA_DIR, f"{table_name}.json")
+    filepath = get_snapshot_filepath(table_name, table_format)
     
     try:
-        with open(filepath, 'w', encoding='utf-8') as file:
-            json.dump(data, file, ensure_ascii=False, indent=2)
+        # Файл заменяется целиком, а не перезаписывается, поэтому его
+        # отображения в память (MappedTable) и читатели не повреждаются
+        if table_format == 'binary':
+            content = encode_table(table_schema, data)
+            write_file_atomic(filepath, lambda file: file.write(content), 'wb')
+        else:
+            # Без отступов json.dumps кодирует весь список встроенным
+            # кодировщиком на C, в несколько раз быстрее, чем с indent
+            content = json.dumps(data, ensure_ascii=False)
+            write_file_atomic(filepath, lambda file: file.write(content))
+
+        # Снимок уже содержит все записи журнала и заменяет снимки
+        # в других форматах
+        obsolete_files = [get_log_filepath(table_name)]
+        obsolete_files.extend(
+            get_snapshot_filepath(table_name, other_format)
+            for other_format in TABLE_FORMATS
+            if other_format != table_format
+        )
+        for obsolete_file in obsolete_files:
+            if os.path.exists(obsolete_file):
+                os.remove(obsolete_file)
+        _unsynced_appends.pop(table_name, None)
         return True
     
     except Exception as e:
-        print(f"Ошибка при сохранении данных таблицы {table_name}: {e}")
+        print_error(f"Ошибка при сохранении данных таблицы {table_name}: {e}")
         return False
 
-def get_next_id(table_name):
+def append_table_records(table_name, records):
     """
-    Генерирует следующий ID для таблицы
+    Дописывает записи в конец журнала таблицы без перезаписи снимка.
+    fsync выполняется раз в LOG_FSYNC_BATCH записей.
     """
-    
-    table_data = load_table_data(table_name)
-    if table_data:
-        existing_ids = {record['ID'] for record in table_data}
-        next_id = max(existing_ids) + 1
-        
-        return next_id
-    else:
-        return 1
-    
+
+    ensure_data_dir()
+
+    log_path = get_log_filepath(table_name)
+
+    try:
+        with open(log_path, 'a', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False))
+                file.write('\n')
+            file.flush()
+
+            unsynced = _unsynced_appends.get(table_name, 0) + len(records)
+            if unsynced >= LOG_FSYNC_BATCH:
+                os.fsync(file.fileno())
+                unsynced = 0
+            _unsynced_appends[table_name] = unsynced
+        return True
+
+    except Exception as e:
+        print_error(f"Ошибка при добавлении записей в таблицу {table_name}: {e}")
+        return False
+
+def sync_table_logs():
+    """
+    Принудительно выполняет fsync для журналов с несинхронизированными записями
+    """
+
+    for table_name, unsynced in list(_unsynced_appends.items()):
+        if not unsynced:
+            continue
+        try:
+            with open(get_log_filepath(table_name), 'a', encoding='utf-8') as file:
+                os.fsync(file.fileno())
+        except OSError as e:
+            print_error(f"Ошибка при синхронизации журнала таблицы {table_name}: {e}")
+        _unsynced_appends[table_name] = 0
+
+def load_index_data(table_name, column):
+    """
+    Загружает сохраненный индекс. Возвращает None, если индекс
+    отсутствует или поврежден.
+    """
+
+    filepath = get_index_filepath(table_name, column)
+
+    try:
+        with open(filepath, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_index_data(table_name, column, index_data):
+    """
+    Сохраняет индекс по столбцу таблицы
+    """
+
+    ensure_data_dir()
+
+    filepath = get_index_filepath(table_name, column)
+
+    try:
+        write_file_atomic(
+            filepath, lambda file: json.dump(index_data, file, ensure_ascii=False)
+        )
+        return True
+    except Exception as e:
+        print_error(f"Ошибка при сохранении индекса {table_name}.{column}: {e}")
+        return False
+
+def get_stats_filepath(table_name):
+    """
+    Возвращает путь к файлу статистики таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.stats")
+
+def load_table_stats(table_name):
+    """
+    Загружает сохраненную статистику таблицы. Возвращает None, если
+    статистика отсутствует или повреждена.
+    """
+
+    try:
+        with open(get_stats_filepath(table_name), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def save_table_stats(table_name, stats):
+    """
+    Сохраняет статистику таблицы
+    """
+
+    ensure_data_dir()
+
+    try:
+        write_file_atomic(
+            get_stats_filepath(table_name),
+            lambda file: json.dump(stats, file, ensure_ascii=False),
+        )
+        return True
+    except Exception as e:
+        print_error(f"Ошибка при сохранении статистики таблицы {table_name}: {e}")
+        return False
+
+def remove_table_files(table_name, index_columns=()):
+    """
+    Удаляет все файлы таблицы. Возвращает список удаленных файлов.
+    """
+
+    removed = []
+    table_files = [
+        get_table_filepath(table_name),
+        get_binary_filepath(table_name),
+        get_log_filepath(table_name),
+        get_sequence_filepath(table_name),
+        get_stats_filepath(table_name),
+    ]
+    table_files.extend(
+        get_index_filepath(table_name, column) for column in index_columns
+    )
+    for filepath in table_files:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+            removed.append(os.path.basename(filepath))
+    _unsynced_appends.pop(table_name, None)
+    return removed
+
+def get_sequence_filepath(table_name):
+    """
+    Возвращает путь к файлу со счетчиком ID таблицы
+    """
+
+    return os.path.join(DATA_DIR, f"{table_name}.seq")
+
+def load_last_id(table_name):
+    """
+    Читает последний выданный ID из файла счетчика.
+    Возвращает None, если файла нет или он поврежден.
+    """
+
+    try:
+        with open(get_sequence_filepath(table_name), 'r', encoding='utf-8') as file:
+            return int(file.read().strip())
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_last_id(table_name, last_id):
+    """
+    Атомарно записывает последний выданный ID в файл счетчика
+    """
+
+    ensure_data_dir()
+
+    write_file_atomic(
+        get_sequence_filepath(table_name), lambda file: file.write(str(last_id))
+    )
+
+def iter_import_rows(filepath):
+    """
+    Построчно читает файл для загрузки в таблицу: CSV с заголовком
+    или JSON Lines (один объект на строку).
+    Возвращает пары (номер_строки, {столбец: значение}).
+    """
+
+    extension = os.path.splitext(filepath)[1].lower()
+
+    if extension not in ('.csv', '.jsonl'):
+        raise ValueError(
+            f"Неподдерживаемый формат файла '{extension}'. "
+            f"Поддерживаемые форматы: .csv, .jsonl"
+        )
+
+    with open(filepath, 'r', encoding='utf-8', newline='') as file:
+        if extension == '.csv':
+            reader = csv.DictReader(file)
+            try:
+                for row in reader:
+                    yield reader.line_num, row
+            except csv.Error as e:
+                raise ValueError(f"Строка {reader.line_num}: {e}")
+            return
+
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"Строка {line_number} содержит некорректный JSON")
+
+            if not isinstance(row, dict):
+                raise ValueError(f"Строка {line_number} не является JSON-объектом")
+            yield line_number, row
+
+def get_table_names(metadata):
+    """
+    Возвращает имена таблиц из метаданных
+    """
+
+    return [name for name in metadata if name != TABLE_OPTIONS_KEY]
+
+def get_table_options(metadata, table_name):
+    """
+    Возвращает дополнительные настройки таблицы (индексы и т.п.)
+    """
+
+    return metadata.get(TABLE_OPTIONS_KEY, {}).get(table_name, {})
+
+def set_table_option(metadata, table_name, option, value):
+    """
+    Устанавливает дополнительную настройку таблицы
+    """
+
+    table_options = metadata.setdefault(TABLE_OPTIONS_KEY, {})
+    table_options.setdefault(table_name, {})[option] = value
+
+def remove_table_options(metadata, table_name):
+    """
+    Удаляет дополнительные настройки таблицы
+    """
+
+    table_options = metadata.get(TABLE_OPTIONS_KEY, {})
+    table_options.pop(table_name, None)
+    if not table_options:
+        metadata.pop(TABLE_OPTIONS_KEY, None)
+
+def get_changed_tables(old_metadata, metadata):
+    """
+    Возвращает имена таблиц, схема или настройки которых различаются
+    в двух версиях метаданных
+    """
+
+    old_options = old_metadata.get(TABLE_OPTIONS_KEY, {})
+    options = metadata.get(TABLE_OPTIONS_KEY, {})
+    table_names = set(get_table_names(old_metadata)) | set(get_table_names(metadata))
+    table_names |= set(old_options) | set(options)
+
+    return {
+        table_name for table_name in table_names
+        if old_metadata.get(table_name) != metadata.get(table_name)
+        or old_options.get(table_name) != options.get(table_name)
+    }
+
+def merge_table_metadata(target, source, table_names):
+    """
+    Переносит схемы и настройки указанных таблиц из source в target.
+    Таблицы, которых нет в source, удаляются из target.
+    """
+
+    for table_name in table_names:
+        if table_name in source:
+            target[table_name] = source[table_name]
+        else:
+            target.pop(table_name, None)
+
+        table_options = get_table_options(source, table_name)
+        if table_options:
+            target.setdefault(TABLE_OPTIONS_KEY, {})[table_name] = table_options
+        else:
+            remove_table_options(target, table_name)
+
+def get_table_indexes(metadata, table_name):
+    """
+    Возвращает индексы таблицы в формате {столбец: вид_индекса}
+    """
+
+    return get_table_options(metadata, table_name).get('indexes', {})
+
+
+def resolve_column_names(clause, table_schema):
+    """
+    Заменяет имена столбцов в условиях на имена из схемы таблицы
+    (без учета регистра)
+    """
+
+    if clause is None:
+        return None
+
+    columns = {col_name.lower(): col_name for col_name in table_schema}
+    return {columns.get(key.lower(), key): value for key, value in clause.items()}
+
 def normalize_table_schema(table_schema):
     """
     Приводит все имена столбцов в схеме таблицы к нижнему регистру
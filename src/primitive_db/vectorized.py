@@ -0,0 +1,308 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy необязателен: без него условия проверяются по одной записи
+    np = None
+
+# Таблицы с меньшим количеством позиций быстрее проверить по одной записи
+VECTORIZED_MIN_POSITIONS = 1000
+
+# Столбцы представления columnar: тип NumPy для массива значений
+_COLUMN_DTYPES = {'int': 'int64', 'bool': 'bool', 'str': 'int32'}
+
+_INT64_MIN, _INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def condition_mask(table, condition):
+    """
+    Вычисляет условие WHERE сразу для всех позиций таблицы в виде
+    булевой маски (удаленные записи в маску не попадают).
+
+    Поддерживаются таблицы в представлении columnar и отображенные
+    в память (MappedTable); для строк - только =, != и IN. Возвращает
+    None, если NumPy недоступен, таблица мала или условие содержит
+    неподдерживаемую часть - тогда записи проверяются по одной.
+    """
+
+    if np is None or table.layout not in ('columnar', 'mapped'):
+        return None
+    if table.position_count() < VECTORIZED_MIN_POSITIONS:
+        return None
+
+    alive = _alive_mask(table)
+    if condition is None:
+        return alive
+
+    mask = _mask(table, condition)
+    if mask is None:
+        return None
+    return mask & alive
+
+
+def mask_positions(mask):
+    """
+    Позиции, отмеченные в маске, в виде списка целых чисел Python
+    """
+
+    return np.flatnonzero(mask).tolist()
+
+
+def mask_ids(table, mask):
+    """
+    ID записей в отмеченных позициях
+    """
+
+    if table.layout == 'columnar':
+        return _column_view(table, 'ID')[mask].tolist()
+    return [table.value(position, 'ID') for position in mask_positions(mask)]
+
+
+def masked_update(table, mask, values):
+    """
+    Записывает значения {столбец: значение} во все отмеченные в маске
+    позиции таблицы columnar присваиванием по маске. Столбцы с индексом
+    обновляются по одной записи, чтобы индекс оставался согласованным.
+    Возвращает количество обновленных записей или None, если таблица
+    не поддерживается.
+    """
+
+    if np is None or table.layout != 'columnar':
+        return None
+
+    for column, value in values.items():
+        if table.schema[column] == 'int' and not _fits_int64(value or 0):
+            return None
+
+    positions = None
+    for column, value in values.items():
+        if column in table.indexes:
+            if positions is None:
+                positions = mask_positions(mask)
+            for position in positions:
+                table.set_value(position, column, value)
+            continue
+
+        _discard_bounds(table, mask, [column])
+        view = _column_view(table, column)
+        table.version += 1
+        if table.undo_log is not None:
+            table.log_undo('assign', column, mask_positions(mask), view[mask].tolist())
+        view[mask] = table.encode(column, value)
+        del view
+
+    return int(np.count_nonzero(mask))
+
+
+def masked_delete(table, mask):
+    """
+    Помечает удаленными все отмеченные в маске позиции таблицы columnar.
+    Записи убираются при сжатии таблицы (compact_columns).
+    Возвращает количество удаленных записей или None, если таблица
+    не поддерживается.
+    """
+
+    if np is None or table.layout != 'columnar':
+        return None
+
+    # Индексы и карта ID обновляются по каждой удаленной записи
+    if table.indexes or table.id_map is not None:
+        positions = mask_positions(mask)
+        for position in positions:
+            table.remove(position)
+        return len(positions)
+
+    _discard_bounds(table, mask, table.schema)
+    table.version += 1
+    if table.undo_log is not None:
+        for position in mask_positions(mask):
+            table.log_undo('remove', position, None)
+    alive = np.frombuffer(table.alive, dtype=np.bool_)
+    alive[mask] = False
+    del alive
+
+    count = int(np.count_nonzero(mask))
+    table.deleted += count
+    return count
+
+
+def compact_columns(table):
+    """
+    Убирает удаленные записи из столбцов таблицы columnar выборкой
+    по маске неудаленных позиций. Значения строк, которые больше
+    не используются, удаляются из словаря. Возвращает False, если
+    NumPy недоступен.
+    """
+
+    if np is None:
+        return False
+
+    live = np.frombuffer(table.alive, dtype=np.bool_).copy()
+
+    for column, col_type in table.schema.items():
+        view = _column_view(table, column)
+        values = view[live]
+        del view
+
+        match col_type:
+            case 'int':
+                table.columns[column] = array('q', values.tobytes())
+            case 'bool':
+                table.columns[column] = bytearray(values.tobytes())
+            case 'str':
+                used, codes = np.unique(values, return_inverse=True)
+                old_values = table.str_values[column]
+                table.str_values[column] = [old_values[code] for code in used.tolist()]
+                table.str_codes[column] = {
+                    value: code for code, value in enumerate(table.str_values[column])
+                }
+                table.columns[column] = array('i', codes.astype(np.int32).tobytes())
+
+    table.alive = bytearray(b'\x01') * int(np.count_nonzero(live))
+    return True
+
+
+def _mask(table, condition):
+    match condition[0]:
+        case 'and' | 'or':
+            masks = [_mask(table, term) for term in condition[1]]
+            if any(mask is None for mask in masks):
+                return None
+            combine = np.logical_and if condition[0] == 'and' else np.logical_or
+            return combine.reduce(masks)
+
+        case 'not':
+            mask = _mask(table, condition[1])
+            return None if mask is None else ~mask
+
+        case 'cmp':
+            _, column, op, value = condition
+            if table.schema.get(column) == 'str':
+                return _str_mask(table, column, op, [value])
+
+            values = _values(table, column, [value])
+            if values is None:
+                return None
+
+            match op:
+                case '=':
+                    return values == value
+                case '!=':
+                    return values != value
+                case '<':
+                    return values < value
+                case '<=':
+                    return values <= value
+                case '>':
+                    return values > value
+                case '>=':
+                    return values >= value
+
+        case 'in':
+            _, column, values = condition
+            if table.schema.get(column) == 'str':
+                return _str_mask(table, column, 'in', values)
+
+            column_values = _values(table, column, values)
+            if column_values is None:
+                return None
+            return np.isin(column_values, list(values))
+
+        case 'between':
+            _, column, low, high = condition
+            values = _values(table, column, [low, high])
+            if values is None:
+                return None
+            return (values >= low) & (values <= high)
+
+    return None
+
+
+def _str_mask(table, column, op, values):
+    """
+    Маска для условий =, != и IN по строковому столбцу columnar:
+    значения сравниваются по кодам словаря
+    """
+
+    if table.layout != 'columnar' or op not in ('=', '!=', 'in'):
+        return None
+
+    str_codes = table.str_codes[column]
+    codes = [str_codes[value] for value in values if value in str_codes]
+    column_codes = _column_view(table, column).copy()
+
+    mask = np.isin(column_codes, codes)
+    return ~mask if op == '!=' else mask
+
+
+def _values(table, column, compared):
+    """
+    Значения столбца int или bool в виде массива NumPy или None,
+    если столбец не поддерживается
+    """
+
+    col_type = table.schema.get(column)
+    if col_type not in ('int', 'bool'):
+        return None
+    if col_type == 'int' and not all(_fits_int64(value) for value in compared):
+        return None
+
+    if table.layout == 'columnar':
+        return _column_view(table, column).copy()
+
+    section = table.snapshot_section(column)
+    if col_type == 'int':
+        values = np.frombuffer(section, dtype='<i8')
+    else:
+        bits = np.frombuffer(section, dtype=np.uint8)
+        values = np.unpackbits(bits, count=table.rows, bitorder='little').view(np.bool_)
+
+    if not table.tail:
+        return values
+
+    tail = [record.get(column) for record in table.tail]
+    return np.concatenate([values, np.array(tail, dtype=values.dtype)])
+
+
+def _column_view(table, column):
+    """
+    Массив NumPy поверх столбца таблицы columnar без копирования.
+    Пока массив существует, размер столбца нельзя изменить, поэтому
+    вызывающий код удаляет его сразу после использования.
+    """
+
+    dtype = _COLUMN_DTYPES[table.schema[column]]
+    return np.frombuffer(table.columns[column], dtype=dtype)
+
+
+def _discard_bounds(table, mask, columns):
+    """
+    Отмечает в статистике таблицы устаревшими минимум и максимум
+    столбцов int, если отмеченные в маске позиции их содержат
+    (см. stats.discard_value)
+    """
+
+    if table.stats is None or not mask.any():
+        return
+
+    for column in columns:
+        column_stats = table.stats['columns'].get(column, {})
+        if column_stats.get('min') is None or table.schema[column] != 'int':
+            continue
+
+        view = _column_view(table, column)
+        values = view[mask]
+        del view
+        if values.min() <= column_stats['min'] or values.max() >= column_stats['max']:
+            column_stats['stale'] = True
+
+
+def _alive_mask(table):
+    if table.layout == 'columnar':
+        return np.frombuffer(table.alive, dtype=np.bool_).copy()
+    return np.ones(len(table), dtype=np.bool_)
+
+
+def _fits_int64(value):
+    return _INT64_MIN <= value <= _INT64_MAX
@@ -0,0 +1,295 @@
+import json
+import os
+import time
+
+from .locks import file_lock
+from .utils import write_file_atomic
+
+# Журнал изменений базы данных рядом с db_meta.json, общий для всех
+# процессов. Первая строка файла - заголовок с номером поколения журнала,
+# дальше - изменения в порядке их фиксации (одна JSON-запись на строку).
+WAL_FILE = 'db_wal.log'
+
+# Групповая фиксация: fsync выполняется раз в WAL_SYNC_BATCH изменений
+# или если с прошлого fsync прошло больше WAL_SYNC_INTERVAL секунд
+WAL_SYNC_BATCH = 16
+WAL_SYNC_INTERVAL = 1.0
+
+# Размер журнала и время с начала его поколения, после которых изменения
+# переносятся в файлы таблиц (контрольная точка)
+WAL_CHECKPOINT_BYTES = 16 * 1024 * 1024
+WAL_CHECKPOINT_INTERVAL = 60.0
+
+
+def configure(sync_batch=None):
+    """
+    Задает количество изменений в одной групповой фиксации
+    """
+
+    global WAL_SYNC_BATCH
+
+    if sync_batch is not None:
+        WAL_SYNC_BATCH = max(1, sync_batch)
+
+
+def get_entry_tables(entry):
+    """
+    Возвращает имена таблиц, которые изменяет запись журнала
+    """
+
+    if entry['op'] == 'transaction':
+        return {
+            table_name
+            for transaction_entry in entry['entries']
+            for table_name in get_entry_tables(transaction_entry)
+        }
+    return {entry['table']}
+
+
+def parse_entries(data, start):
+    """
+    Разбирает записи журнала из байтов data, начинающихся с позиции start.
+    Возвращает список (начало, конец, запись) и позицию после последней
+    целой записи: разбор останавливается на недописанной при сбое строке.
+    """
+
+    entries = []
+    position = start
+
+    for line in data.splitlines(keepends=True):
+        if not line.endswith(b'\n'):
+            break
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        entries.append((position, position + len(line), entry))
+        position += len(line)
+
+    return entries, position
+
+
+class WriteAheadLog:
+    """
+    Общий журнал предзаписи. Процесс дописывает в него зафиксированные
+    изменения под исключительной блокировкой (lock), поэтому порядок
+    записей в файле - порядок фиксации во всех процессах. Изменения
+    других процессов читаются с позиции, до которой журнал уже прочитан
+    (read), так что их видно без перезаписи файлов таблиц.
+
+    Записи передаются операционной системе при фиксации, fsync
+    выполняется для группы записей. Контрольная точка заменяет файл
+    новым поколением журнала (reset); процессы, читавшие прежний файл,
+    дочитывают его и переходят к новому (switch).
+    """
+
+    def __init__(self, filepath=WAL_FILE):
+        self.filepath = filepath
+        # Поколение читаемого файла (0 - журнала еще нет), позиция после
+        # последней прочитанной или записанной записи и количество записей
+        self.generation = 0
+        self.offset = 0
+        self.entry_count = 0
+        self._reader = None
+        self._writer = None
+        self._opened = time.monotonic()
+        # Изменения процесса, еще не записанные в журнал
+        self.pending = []
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def lock(self, exclusive=False):
+        """
+        Блокировка журнала: исключительная - для записи в журнал
+        и контрольной точки, разделяемая - для чтения журнала вместе
+        с файлами таблиц
+        """
+
+        return file_lock(f"{self.filepath}.lock", exclusive)
+
+    def position(self):
+        return self.generation, self.offset
+
+    def append(self, entry):
+        """
+        Добавляет изменение, в журнал оно будет записано при write()
+        """
+
+        self.pending.append(entry)
+
+    def changed(self):
+        """
+        Проверяет без блокировки, появились ли в журнале новые записи
+        или новое поколение
+        """
+
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            return False
+        if self._reader is None:
+            return True
+        return stat.st_ino != self._inode() or stat.st_size != self.offset
+
+    def read(self):
+        """
+        Читает записи, добавленные в файл текущего поколения после
+        прочитанных. Возвращает список (начало, конец, запись).
+        """
+
+        if self._reader is None:
+            return []
+
+        self._reader.seek(self.offset)
+        entries, self.offset = parse_entries(self._reader.read(), self.offset)
+        self.entry_count += len(entries)
+        return entries
+
+    def switch(self):
+        """
+        Если журнал появился или заменен контрольной точкой, переходит
+        к новому файлу. Возвращает его заголовок или None, если читаемый
+        файл остается текущим.
+        """
+
+        try:
+            reader = open(self.filepath, 'rb')
+        except FileNotFoundError:
+            return None
+
+        # Пока прежний файл открыт, номер его inode не может достаться
+        # новому файлу, поэтому замену журнала видно по inode
+        inode = os.fstat(reader.fileno()).st_ino
+        if self._reader is not None and inode == self._inode():
+            reader.close()
+            return None
+
+        header_line = reader.readline()
+        self.close()
+        self._reader = reader
+        self._opened = time.monotonic()
+        header = json.loads(header_line)
+        self.generation = header['generation']
+        self.offset = len(header_line)
+        self.entry_count = 0
+        return header
+
+    def scan(self, table_name):
+        """
+        Читает текущий файл журнала целиком. Возвращает поколение,
+        позицию после последней целой записи и записи, изменяющие
+        таблицу table_name.
+        """
+
+        try:
+            with open(self.filepath, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            return 0, 0, []
+
+        header_line, _, data = data.partition(b'\n')
+        header = json.loads(header_line)
+        entries, end = parse_entries(data, len(header_line) + 1)
+
+        return header['generation'], end, [
+            entry for _, _, entry in entries if table_name in get_entry_tables(entry)
+        ]
+
+    def create(self):
+        """
+        Создает журнал первого поколения, если его еще нет.
+        Вызывается под исключительной блокировкой.
+        """
+
+        if not os.path.exists(self.filepath):
+            self._write_header({'op': 'start', 'generation': 1})
+
+    def write(self):
+        """
+        Дописывает в журнал изменения процесса и передает их операционной
+        системе. Вызывается под исключительной блокировкой после read():
+        недописанная при сбое другого процесса строка в конце файла
+        отбрасывается. Возвращает записанные изменения.
+        """
+
+        entries = self.pending
+        if not entries:
+            return []
+
+        writer = self._writer
+        if writer is None or os.fstat(writer.fileno()).st_ino != self._inode():
+            if writer is not None:
+                self._writer.close()
+            self._writer = open(self.filepath, 'r+b')
+
+        self._writer.truncate(self.offset)
+        self._writer.seek(self.offset)
+        for entry in entries:
+            self._writer.write(json.dumps(entry, ensure_ascii=False).encode('utf-8'))
+            self._writer.write(b'\n')
+        self._writer.flush()
+
+        self.offset = self._writer.tell()
+        self.entry_count += len(entries)
+        self.pending = []
+        self._unsynced += len(entries)
+        return entries
+
+    def commit(self):
+        """
+        Выполняет fsync, если набралась группа изменений или истек интервал
+        """
+
+        if self._unsynced and (
+            self._unsynced >= WAL_SYNC_BATCH
+            or time.monotonic() - self._last_sync >= WAL_SYNC_INTERVAL
+        ):
+            self.sync()
+
+    def sync(self):
+        """
+        Принудительно записывает журнал на диск
+        """
+
+        if self._writer is not None and self._unsynced:
+            os.fsync(self._writer.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def size(self):
+        return self.offset
+
+    def age(self):
+        """
+        Сколько секунд процесс работает с текущим поколением журнала
+        """
+
+        return time.monotonic() - self._opened
+
+    def reset(self):
+        """
+        Начинает новое поколение журнала после контрольной точки.
+        Вызывается под исключительной блокировкой.
+        """
+
+        # Изменения уже в файлах таблиц, поэтому fsync журнала не нужен
+        self._unsynced = 0
+        self._write_header({'op': 'start', 'generation': self.generation + 1})
+
+    def close(self):
+        if self._unsynced:
+            self.sync()
+        for file in (self._reader, self._writer):
+            if file is not None:
+                file.close()
+        self._reader = None
+        self._writer = None
+
+    def _inode(self):
+        return os.fstat(self._reader.fileno()).st_ino
+
+    def _write_header(self, header):
+        write_file_atomic(
+            self.filepath,
+            lambda file: file.write(json.dumps(header, ensure_ascii=False) + '\n'),
+        )
@@ -0,0 +1,100 @@
+import pytest
+
+from src.primitive_db import cache, engine
+from src.primitive_db.cache import TableCache
+from src.primitive_db.plans import PlanCache
+from src.primitive_db.server import execute
+from src.primitive_db.table import INT64_MAX, INT64_MIN, ColumnarTable, Table
+from src.primitive_db.utils import load_table_data
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """
+    Пустая база в tmp_path. Возвращает функцию, которая выполняет
+    команду и фиксирует ее (см. server.execute)
+    """
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(engine, 'table_cache', TableCache())
+    monkeypatch.setattr(engine, 'plan_cache', PlanCache())
+    monkeypatch.setattr(engine, 'prepared_statements', {})
+
+    yield execute
+
+    engine.table_cache.close()
+
+
+@pytest.fixture
+def query(db):
+    """
+    Выполняет команду, проверяет, что она завершилась без ошибок,
+    и возвращает записи результата
+    """
+
+    def run(command):
+        result = db(command)
+        assert result['ok'], result['output']
+        return result['rows']
+
+    return run
+
+
+@pytest.fixture
+def reopen(db, monkeypatch):
+    """
+    Завершает сессию и начинает новую: таблицы читаются из файлов
+    """
+
+    def run():
+        assert engine.table_cache.close()
+        monkeypatch.setattr(engine, 'table_cache', TableCache())
+        monkeypatch.setattr(engine, 'plan_cache', PlanCache())
+
+    return run
+
+
+@pytest.fixture
+def scores(query):
+    """
+    Таблица scores с крайними значениями int64, пустой строкой и
+    кириллицей. Возвращает ее записи в порядке ID.
+    """
+
+    query('create_table scores name:str score:int active:bool')
+    query(f'insert into scores values ("Анна", {INT64_MAX}, true)')
+    query(f'insert into scores values ("", {INT64_MIN}, false)')
+    query('insert into scores values ("line break", 0, true)')
+    return query('select from scores order by ID')
+
+
+@pytest.fixture
+def no_scan():
+    """
+    Запрещает полный просмотр таблицы до конца теста (контрольная
+    точка при закрытии базы просматривает таблицы)
+    """
+
+    def positions(self):
+        raise AssertionError('таблица не должна просматриваться целиком')
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(Table, 'positions', positions)
+        patch.setattr(ColumnarTable, 'positions', positions)
+        yield
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """
+    Возвращает список имен таблиц, прочитанных с диска
+    """
+
+    loaded = []
+
+    def load(table_name, *args):
+        loaded.append(table_name)
+        return load_table_data(table_name, *args)
+
+    monkeypatch.setattr(cache, 'load_table_data', load)
+    return loaded
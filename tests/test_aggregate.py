@@ -0,0 +1,66 @@
+import pytest
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def users(query, request):
+    query('create_table users name:str age:int active:bool')
+    query(f'set_layout users {request.param}')
+    for name, age, active in [
+        ('Ann', 30, 'true'), ('Bob', 17, 'false'), ('Eve', 45, 'true'),
+        ('Ann', 52, 'false'),
+    ]:
+        query(f'insert into users values ("{name}", {age}, {active})')
+
+
+def test_aggregates_without_grouping(users, db):
+    result = db(
+        'select count(*), sum(age), avg(age), min(age), max(name), sum(active) '
+        'from users'
+    )
+    assert result['columns'] == [
+        'count(*)', 'sum(age)', 'avg(age)', 'min(age)', 'max(name)', 'sum(active)'
+    ]
+    assert result['rows'] == [[4, 144, 36.0, 17, 'Eve', 2]]
+
+
+def test_aggregates_with_where(users, query):
+    assert query('select count(*), avg(age) from users where active = true') == [
+        [2, 37.5]
+    ]
+    assert query('select count(name), min(age) from users where age > 100') == [
+        [0, None]
+    ]
+
+
+def test_group_by(users, query):
+    assert query('select name, count(*), max(age) from users group by name') == [
+        ['Ann', 2, 52], ['Bob', 1, 17], ['Eve', 1, 45]
+    ]
+    # Группы выводятся в порядке появления
+    assert query(
+        'select active, name, count(name) from users '
+        'group by active, name limit 2 offset 1'
+    ) == [[False, 'Bob', 1], [True, 'Eve', 1]]
+
+
+@pytest.mark.parametrize('command', [
+    'select name, age, count(*) from users group by name',
+    'select sum(name) from users',
+    'select count(email) from users',
+    'select median(age) from users',
+])
+def test_bad_aggregate_is_rejected(users, db, command):
+    result = db(command)
+    assert not result['ok']
+    assert result['rows'] == []
+
+
+def test_answered_without_reading_records(users, query, no_scan):
+    query('create_index users age sorted')
+    query('create_index users active')
+
+    assert query('select count(*) from users') == [[4]]
+    assert query('select min(age), max(age) from users') == [[17, 52]]
+    assert query('select active, count(*) from users group by active') == [
+        [True, 2], [False, 2]
+    ]
@@ -0,0 +1,90 @@
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.api import Database
+
+
+@pytest.fixture
+def database(query):
+    query('create_table users name:str age:int active:bool')
+    return Database(engine.table_cache)
+
+
+@pytest.fixture
+def users(database):
+    return database.insert_many('users', [
+        {'name': 'Ann', 'age': 30, 'active': True},
+        {'name': 'Bob', 'age': 17, 'active': False},
+        {'name': 'Eve', 'age': 45, 'active': True},
+    ])
+
+
+def test_insert_returns_ids(database, users):
+    assert users == [1, 2, 3]
+    assert database.insert('users', {'age': 52, 'active': False, 'NAME': 'Max'}) == 4
+    assert database.insert_many('users', []) == []
+    assert database.select('users', where={'ID': 4}) == [
+        {'ID': 4, 'name': 'Max', 'age': 52, 'active': False}
+    ]
+
+
+def test_select(database, users):
+    assert database.select(
+        'users', where='age >= 18', columns=['name'], order_by='age', descending=True
+    ) == [{'name': 'Eve'}, {'name': 'Ann'}]
+    assert database.select(
+        'users', where={'name': ['Ann', 'Bob'], 'active': True}, columns=['ID']
+    ) == [{'ID': 1}]
+    assert database.select('users', columns=['ID'], limit=1, offset=1) == [{'ID': 2}]
+
+    # Изменение результата не затрагивает таблицу
+    database.select('users')[0]['name'] = 'Changed'
+    assert database.select('users', where={'ID': 1}, columns=['name']) == [
+        {'name': 'Ann'}
+    ]
+
+
+def test_update_delete_and_count(database, users):
+    assert database.update('users', {'active': False}, where='age > 40') == 1
+    assert database.update('users', {'age': 0}, where={'name': 'Nobody'}) == 0
+    assert database.count('users', where={'active': False}) == 2
+
+    assert database.delete('users', where={'active': False}) == 2
+    assert database.count('users') == 1
+    assert database.select('users', columns=['name']) == [{'name': 'Ann'}]
+
+
+def test_changes_are_shared_with_commands(database, users, query, reopen):
+    query('insert into users values ("Max", 52, false)')
+    assert database.count('users') == 4
+
+    database.update('users', {'age': 31}, where={'name': 'Ann'})
+    assert database.close()
+    reopen()
+    assert query('select age from users where name = "Ann"') == [[31]]
+
+
+def test_nothing_is_printed(database, users, capsys):
+    database.select('users', where='age > 20')
+    database.update('users', {'age': 18}, where={'ID': 2})
+    database.delete('users', where={'ID': 3})
+
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('call', [
+    lambda db: db.insert('missing', {'name': 'Ann'}),
+    lambda db: db.insert('users', {'name': 'Ann', 'age': 30}),
+    lambda db: db.insert('users', {'name': 'Ann', 'age': True, 'active': True}),
+    lambda db: db.insert('users', {'name': 'Ann', 'age': 30, 'active': 1}),
+    lambda db: db.insert('users', {'ID': 9, 'name': 'Ann', 'age': 30, 'active': True}),
+    lambda db: db.select('users', where='age >'),
+    lambda db: db.select('users', where={'email': 'ann@mail.com'}),
+    lambda db: db.select('users', columns=['email']),
+    lambda db: db.update('users', {'ID': 5}),
+    lambda db: db.update('users', {'age': '31'}),
+])
+def test_bad_arguments_raise_value_error(database, users, call):
+    with pytest.raises(ValueError):
+        call(database)
+    assert database.count('users') == 3
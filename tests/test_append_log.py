@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+from src.primitive_db import cache, engine
+from src.primitive_db.mapped import MappedTable
+
+LOG_FILE = os.path.join('data', 'users.log')
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    query('insert into users values ("Bob", 17)')
+    assert engine.table_cache.checkpoint()
+
+
+def read_log():
+    with open(LOG_FILE, encoding='utf-8') as file:
+        return file.read()
+
+
+def test_insert_appends_to_log(users, query, reopen):
+    table = engine.table_cache.get_table('users')
+    assert len(read_log().splitlines()) == 2
+
+    query('insert into users values ("Eve", 45)')
+    assert engine.table_cache.checkpoint()
+
+    assert len(read_log().splitlines()) == 3
+    # Снимок не перезаписан, и таблица не перечитывается
+    assert engine.table_cache.get_table('users') is table
+    reopen()
+    assert query('select name from users') == [['Ann'], ['Bob'], ['Eve']]
+
+
+def test_compact_moves_log_to_snapshot(users, query, reopen):
+    query('compact users')
+
+    assert not os.path.exists(LOG_FILE)
+    reopen()
+    assert query('select name from users') == [['Ann'], ['Bob']]
+
+
+@pytest.mark.parametrize('table_format', ['json', 'binary'])
+def test_log_left_after_compaction_crash(users, query, reopen, monkeypatch,
+                                         table_format):
+    query(f'convert_table users {table_format}')
+    query('insert into users values ("Eve", 45)')
+    assert engine.table_cache.checkpoint()
+    log = read_log()
+
+    # Сбой между записью нового снимка и удалением журнала
+    query('compact users')
+    with open(LOG_FILE, 'w', encoding='utf-8') as file:
+        file.write(log + log)
+
+    monkeypatch.setattr(cache, 'MAPPED_READ_MIN_BYTES', 0)
+    reopen()
+    assert query('select ID, name from users') == [[1, 'Ann'], [2, 'Bob'], [3, 'Eve']]
+    if table_format == 'binary':
+        assert isinstance(engine.table_cache.get_table_for_read('users'), MappedTable)
+
+    query('insert into users values ("Max", 52)')
+    reopen()
+    assert query('select name from users') == [['Ann'], ['Bob'], ['Eve'], ['Max']]
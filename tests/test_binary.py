@@ -0,0 +1,61 @@
+import pytest
+
+from src.primitive_db.binary import decode_table, encode_table
+from src.primitive_db.table import INT64_MAX, INT64_MIN
+
+SCHEMA = {'ID': 'int', 'name': 'str', 'score': 'int', 'active': 'bool'}
+
+RECORDS = [
+    {'ID': 1, 'name': 'Анна', 'score': INT64_MAX, 'active': True},
+    {'ID': 2, 'name': '', 'score': INT64_MIN, 'active': False},
+    {'ID': 5, 'name': 'line\nbreak "quoted"', 'score': 0, 'active': True},
+    {'ID': 3, 'name': 'Анна', 'score': -1, 'active': False},
+]
+
+ALL_ROWS = 'select from scores order by ID'
+
+
+def test_binary_encoding_round_trip():
+    assert decode_table(encode_table(SCHEMA, RECORDS)) == RECORDS
+
+
+def test_binary_encoding_rejects_out_of_range_int():
+    record = dict(RECORDS[0], score=INT64_MAX + 1)
+
+    with pytest.raises(OverflowError):
+        encode_table(SCHEMA, [record])
+
+
+@pytest.mark.parametrize('layout', ['rows', 'columnar'])
+@pytest.mark.parametrize('table_format', ['json', 'binary'])
+def test_round_trip(scores, query, reopen, layout, table_format):
+    query(f'set_layout scores {layout}')
+    query(f'convert_table scores {table_format}')
+    assert query(ALL_ROWS) == scores
+
+    reopen()
+    assert query(ALL_ROWS) == scores
+    assert query('select name from scores where active = true order by ID') == [
+        ['Анна'], ['line break']
+    ]
+
+
+def test_convert_to_binary_refuses_out_of_range_int(db, query, reopen):
+    query('create_table big value:int')
+    query(f'insert into big values ({INT64_MAX + 1})')
+
+    result = db('convert_table big binary')
+    assert not result['ok']
+
+    # Таблица остается в прежнем формате вместе с данными
+    reopen()
+    assert query('select value from big') == [[INT64_MAX + 1]]
+    query(f'insert into big values ({INT64_MIN - 1})')
+
+
+def test_binary_table_rejects_out_of_range_int(scores, db, query):
+    query('convert_table scores binary')
+
+    assert not db(f'insert into scores values ("x", {INT64_MAX + 1}, true)')['ok']
+    assert not db(f'update scores set score = {INT64_MIN - 1} where ID = 1')['ok']
+    assert query(ALL_ROWS) == scores
@@ -0,0 +1,51 @@
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.utils import load_table_data, save_table_data
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    query('insert into users values ("Bob", 17)')
+    assert engine.table_cache.checkpoint()
+
+
+def test_hot_table_is_not_reread(users, query, reopen, loads):
+    reopen()
+    for _ in range(3):
+        assert query('select name from users where age > 20') == [['Ann']]
+        query('update users set age = 31 where name = "Ann"')
+
+    assert loads == ['users']
+
+
+def test_changed_file_is_reread(users, query, loads):
+    assert query('select name from users') == [['Ann'], ['Bob']]
+
+    # Файл таблицы изменен в обход кэша
+    save_table_data('users', [{'ID': 1, 'name': 'Eve', 'age': 45}])
+    assert query('select name from users') == [['Eve']]
+    assert loads == ['users']
+
+
+def test_least_recently_used_table_is_evicted(users, query, reopen, loads,
+                                              monkeypatch):
+    query('create_table notes text:str')
+    reopen()
+    monkeypatch.setattr(engine.table_cache, 'max_bytes', 0)
+
+    query('select from users')
+    query('select from notes')
+    query('select from users')
+    assert loads == ['users', 'notes', 'users']
+
+
+def test_changes_are_written_back_on_close(users, query):
+    query('update users set age = 18 where name = "Bob"')
+    query('insert into users values ("Eve", 45)')
+    assert [record['age'] for record in load_table_data('users')] == [30, 17]
+
+    assert engine.table_cache.close()
+    assert [record['age'] for record in load_table_data('users')] == [30, 18, 45]
@@ -0,0 +1,88 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.primitive_db.client import ConnectionPool, QueryError
+from src.primitive_db.server import QueryServer
+
+SOCKET_PATH = 's.sock'
+
+
+@pytest.fixture
+def connections(query):
+    """
+    Сервер запросов на SOCKET_PATH в отдельном потоке.
+    Возвращает список принятых им подключений.
+    """
+
+    query('create_table users name:str age:int')
+    query_server = QueryServer()
+    connections = []
+
+    async def handle_client(reader, writer):
+        connections.append(writer)
+        await query_server.handle_client(reader, writer)
+
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(
+        asyncio.start_unix_server(handle_client, SOCKET_PATH)
+    )
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+
+    yield connections
+
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    server.close()
+    loop.run_until_complete(server.wait_closed())
+    loop.close()
+
+
+def test_query_returns_records(connections):
+    pool = ConnectionPool(SOCKET_PATH, size=2)
+    assert pool.execute('insert into users values ("Ann", 30)')['ok']
+    assert pool.query('select name, age from users') == [{'name': 'Ann', 'age': 30}]
+
+    with pytest.raises(QueryError):
+        pool.query('select from missing')
+    assert not pool.execute('select from missing')['ok']
+    pool.close()
+
+
+def test_connections_are_reused(connections):
+    pool = ConnectionPool(SOCKET_PATH, size=3)
+    for age in range(5):
+        pool.execute(f'insert into users values ("User", {age})')
+    assert len(connections) == 1
+    pool.close()
+
+
+def test_threads_share_limited_connections(connections):
+    pool = ConnectionPool(SOCKET_PATH, size=2)
+
+    def insert(age):
+        return pool.execute(f'insert into users values ("User", {age})')['ok']
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(executor.map(insert, range(40)))
+
+    assert len(connections) <= 2
+    assert pool.query('select count(*) from users') == [{'count(*)': 40}]
+    pool.close()
+
+
+def test_transaction_in_one_connection(connections):
+    pool = ConnectionPool(SOCKET_PATH, size=2)
+    pool.execute('insert into users values ("Ann", 30)')
+
+    with pool.connection() as connection:
+        assert connection.execute('begin')['ok']
+        connection.execute('delete from users where age > 18')
+        assert connection.query('select from users') == []
+        assert connection.execute('rollback')['ok']
+
+    assert pool.query('select name from users') == [{'name': 'Ann'}]
+    pool.close()
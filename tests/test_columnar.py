@@ -0,0 +1,36 @@
+from src.primitive_db.table import INT64_MAX
+
+ALL_ROWS = 'select from scores order by ID'
+
+
+def test_layout_switch_keeps_records(scores, query, reopen):
+    query('set_layout scores columnar')
+    assert query(ALL_ROWS) == scores
+
+    reopen()
+    assert query(ALL_ROWS) == scores
+    assert query('select name from scores where active = true order by ID') == [
+        ['Анна'], ['line break']
+    ]
+
+    query('set_layout scores rows')
+    assert query(ALL_ROWS) == scores
+
+
+def test_columnar_keeps_columns_aligned(scores, db, query):
+    query('set_layout scores columnar')
+
+    assert not db(f'insert into scores values ("x", {INT64_MAX + 1}, true)')['ok']
+    assert not db(f'update scores set score = {INT64_MAX + 1} where ID = 2')['ok']
+    assert query(ALL_ROWS) == scores
+
+    query('insert into scores values ("y", 1, false)')
+    assert query('select name, score from scores where name = "y"') == [['y', 1]]
+
+
+def test_columnar_refuses_out_of_range_int(db, query):
+    query('create_table big value:int')
+    query(f'insert into big values ({INT64_MAX + 1})')
+
+    assert not db('set_layout big columnar')['ok']
+    assert query('select value from big') == [[INT64_MAX + 1]]
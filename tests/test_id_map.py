@@ -0,0 +1,38 @@
+import pytest
+
+from src.primitive_db import engine
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def users(query, request):
+    query('create_table users name:str age:int')
+    query(f'set_layout users {request.param}')
+    for name, age in [('Ann', 30), ('Bob', 17), ('Eve', 45), ('Max', 52)]:
+        query(f'insert into users values ("{name}", {age})')
+
+
+def test_id_lookup_skips_scan(users, query, no_scan):
+    assert query('select name from users where ID = 3') == [['Eve']]
+    assert query('select name from users where ID = 9') == []
+
+    query('update users set age = 18 where ID = 2')
+    query('delete from users where ID = 3 and age = 45')
+    assert query('select age from users where ID = 2') == [[18]]
+    assert query('select name from users where ID = 3') == []
+
+
+def test_delete_leaves_other_positions(users, query):
+    table = engine.table_cache.get_table('users')
+    position = table.find_position(4)
+
+    query('delete from users where ID = 2')
+    assert table.find_position(2) is None
+    assert table.find_position(4) == position
+    assert table.position_count() == 4
+    assert len(table) == 3
+
+    # Удаленные записи убираются при записи снимка
+    assert engine.table_cache.checkpoint()
+    assert table.position_count() == 3
+    assert query('select name from users where ID = 4') == [['Max']]
+    assert query('select ID from users') == [[1], [3], [4]]
@@ -0,0 +1,47 @@
+import os
+
+from src.primitive_db import engine
+from src.primitive_db.table import Table
+from src.primitive_db.utils import load_last_id
+
+SEQ_FILE = os.path.join('data', 'users.seq')
+
+
+def insert_users(query, count):
+    for number in range(count):
+        query(f'insert into users values ("User", {number})')
+
+
+def test_deleted_ids_are_not_reused(query, reopen):
+    query('create_table users name:str age:int')
+    insert_users(query, 3)
+    query('delete from users where ID = 3')
+
+    reopen()
+    query('insert into users values ("Ann", 30)')
+    assert query('select ID from users where name = "Ann"') == [[4]]
+
+
+def test_ids_are_issued_without_scanning(query, reopen, monkeypatch):
+    query('create_table users name:str age:int')
+    insert_users(query, 3)
+    reopen()
+
+    def max_id(self):
+        raise AssertionError('ID не должен вычисляться по данным таблицы')
+
+    monkeypatch.setattr(Table, 'max_id', max_id)
+    query('insert into users values ("Ann", 30)')
+    assert query('select ID from users where name = "Ann"') == [[4]]
+
+
+def test_missing_counter_is_rebuilt(query, reopen):
+    query('create_table users name:str age:int')
+    insert_users(query, 3)
+    reopen()
+    os.remove(SEQ_FILE)
+
+    query('insert into users values ("Ann", 30)')
+    assert query('select ID from users where name = "Ann"') == [[4]]
+    assert engine.table_cache.close()
+    assert load_last_id('users') == 4
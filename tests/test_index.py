@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.index import HashIndex
+
+INDEX_FILE = os.path.join('data', 'users.name.idx')
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def users(query, request):
+    query('create_table users name:str age:int')
+    query(f'set_layout users {request.param}')
+    for name, age in [('Ann', 30), ('Bob', 17), ('Eve', 45), ('Ann', 52)]:
+        query(f'insert into users values ("{name}", {age})')
+    query('create_index users name')
+
+
+def test_index_is_saved_and_registered(users):
+    assert os.path.exists(INDEX_FILE)
+    metadata = engine.table_cache.get_metadata()
+    assert metadata['__options__']['users']['indexes'] == {'name': 'hash'}
+
+
+def test_equality_uses_index(users, query, no_scan):
+    assert query('select age from users where name = "Ann"') == [[30], [52]]
+    assert query('select age from users where name = "Max"') == []
+
+    query('update users set age = 31 where name = "Ann"')
+    query('delete from users where name = "Bob"')
+    assert query('select ID, age from users where name = "Ann"') == [[1, 31], [4, 31]]
+
+
+def test_index_follows_changes(users, query, no_scan):
+    query('insert into users values ("Max", 5)')
+    query('update users set name = "Max" where name = "Eve"')
+    query('delete from users where name = "Ann"')
+
+    assert query('select ID from users where name = "Max"') == [[3], [5]]
+    assert query('select ID from users where name = "Eve"') == []
+    assert query('select ID from users where name = "Ann"') == []
+
+
+def test_saved_index_is_not_rebuilt(users, query, reopen, monkeypatch):
+    query('insert into users values ("Max", 5)')
+    reopen()
+
+    def build(cls, column, table):
+        raise AssertionError('индекс должен читаться из файла')
+
+    monkeypatch.setattr(HashIndex, 'build', classmethod(build))
+    assert query('select ID from users where name = "Max"') == [[5]]
+
+
+def test_unknown_column_is_rejected(users, db):
+    assert not db('create_index users email')['ok']
@@ -0,0 +1,76 @@
+from itertools import count
+
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.core import DISPLAY_CHUNK_ROWS, display_table
+from src.primitive_db.table import Table
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int')
+    for number in range(120):
+        query(f'insert into users values ("User {number}", {number % 10})')
+
+
+@pytest.fixture
+def scanned(monkeypatch):
+    """
+    Возвращает список позиций, прочитанных при просмотре таблицы
+    """
+
+    read = []
+    positions = Table.positions
+
+    def counting_positions(self):
+        for position in positions(self):
+            read.append(position)
+            yield position
+
+    monkeypatch.setattr(Table, 'positions', counting_positions)
+    return read
+
+
+def test_limit_and_offset(users, query):
+    assert query('select ID from users limit 2') == [[1], [2]]
+    assert query('select ID from users where age = 3 limit 2 offset 1') == [[14], [24]]
+    assert query('select ID from users order by ID desc limit 2 offset 3') == [
+        [117], [116]
+    ]
+    assert query('select ID from users limit 5 offset 200') == []
+    assert query('select ID from users where age = 3 offset 11') == [[114]]
+
+
+def test_scan_stops_after_limit(users, query, scanned):
+    assert query('select ID from users where age = 1 limit 2 offset 1') == [[12], [22]]
+    assert len(scanned) == 22
+
+
+@pytest.mark.parametrize('clause', ['limit -1', 'limit many', 'offset -5', 'limit'])
+def test_bad_limit_is_rejected(users, db, clause):
+    assert not db(f'select from users {clause}')['ok']
+
+
+def test_output_stops_when_pager_declines(users, capsys):
+    pages = []
+
+    def pager(shown):
+        pages.append(shown)
+        return len(pages) < 2
+
+    assert engine.execute_command('select name from users', pager)
+    output = capsys.readouterr().out
+    assert pages == [DISPLAY_CHUNK_ROWS, 2 * DISPLAY_CHUNK_ROWS]
+    assert f'User {2 * DISPLAY_CHUNK_ROWS - 1} ' in output
+    assert f'User {2 * DISPLAY_CHUNK_ROWS} ' not in output
+
+
+def test_first_rows_are_shown_before_reading_everything(capsys):
+    # Бесконечный результат: выводится только первая часть
+    records = ({'n': number} for number in count())
+
+    assert display_table(records, ['n'], pager=lambda shown: False) == (
+        DISPLAY_CHUNK_ROWS
+    )
+    assert f' {DISPLAY_CHUNK_ROWS - 1} ' in capsys.readouterr().out
@@ -0,0 +1,77 @@
+import pytest
+
+from src.primitive_db import engine
+
+CSV_ROWS = """name,age,active
+Ann,30,yes
+"Doe, John",17,false
+"""
+
+JSONL_ROWS = """{"name": "Ann", "age": 30, "active": true}
+
+{"age": "17", "active": false, "name": "Doe, John"}
+"""
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int active:bool')
+    query('insert into users values ("Eve", 45, true)')
+
+
+@pytest.fixture
+def appends(monkeypatch):
+    """
+    Возвращает список количеств записей в каждом добавлении в таблицу
+    """
+
+    counts = []
+    append_records = engine.table_cache.append_records
+
+    def append(table_name, records):
+        counts.append(len(records))
+        return append_records(table_name, records)
+
+    monkeypatch.setattr(engine.table_cache, 'append_records', append)
+    return counts
+
+
+@pytest.mark.parametrize('filename, content', [
+    ('users.csv', CSV_ROWS),
+    ('users.jsonl', JSONL_ROWS),
+])
+def test_rows_are_converted_and_added_at_once(users, query, appends,
+                                              filename, content):
+    with open(filename, 'w', encoding='utf-8') as file:
+        file.write(content)
+
+    query(f'load users from {filename}')
+    assert appends == [2]
+    assert query('select from users order by ID') == [
+        [1, 'Eve', 45, True],
+        [2, 'Ann', 30, True],
+        [3, 'Doe, John', 17, False],
+    ]
+
+
+@pytest.mark.parametrize('content', [
+    'name,age,active\nAnn,30,yes\nBob,old,no\n',
+    'name,age,active\nAnn,30,yes\nBob,17\n',
+    'name,age,active,ID\nAnn,30,yes,7\n',
+    'name,age,email\nAnn,30,ann@mail.com\n',
+])
+def test_bad_row_adds_nothing(users, db, query, appends, content):
+    with open('users.csv', 'w', encoding='utf-8') as file:
+        file.write(content)
+
+    assert not db('load users from users.csv')['ok']
+    assert appends == []
+    assert query('select name from users') == [['Eve']]
+
+
+def test_unsupported_file_is_rejected(users, db):
+    with open('users.txt', 'w', encoding='utf-8') as file:
+        file.write(CSV_ROWS)
+
+    assert not db('load users from users.txt')['ok']
+    assert not db('load users from missing.csv')['ok']
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+import time
+
+from src.primitive_db import engine
+from src.primitive_db.cache import ID_BLOCK_SIZE, get_file_stamp
+from src.primitive_db.locks import table_lock
+from src.primitive_db.utils import load_last_id
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEQ_FILE = os.path.join('data', 'users.seq')
+
+# Процесс добавляет записи по одной, фиксируя каждую команду
+WRITER_SCRIPT = """
+import sys
+
+from src.primitive_db import engine, server
+
+name, count = sys.argv[1], int(sys.argv[2])
+for number in range(count):
+    result = server.execute(f'insert into users values ("{name}", {number})')
+    assert result['ok'], result
+assert engine.table_cache.close()
+"""
+
+# Процесс читает таблицу и выводит время завершения чтения
+READER_SCRIPT = """
+import time
+
+from src.primitive_db import server
+
+assert server.execute('select from users')['ok']
+print(time.time())
+"""
+
+
+def run_python(script, *args):
+    return subprocess.Popen(
+        [sys.executable, '-c', script, *args],
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+
+def test_id_block_is_reserved_once(query, reopen):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    stamp = get_file_stamp(SEQ_FILE)
+    assert load_last_id('users') == 1 + ID_BLOCK_SIZE
+
+    # Следующие ID выдаются из блока без записи счетчика
+    for number in range(5):
+        query(f'insert into users values ("User", {number})')
+    assert engine.table_cache.checkpoint()
+    assert get_file_stamp(SEQ_FILE) == stamp
+
+    # Неиспользованные ID возвращаются при закрытии
+    reopen()
+    assert load_last_id('users') == 6
+    query('insert into users values ("Bob", 40)')
+    assert query('select ID from users where name = "Bob"') == [[7]]
+
+
+def test_ids_are_released_on_eviction(query, monkeypatch):
+    query('create_table users name:str age:int')
+    query('create_table notes text:str')
+    query('insert into users values ("Ann", 30)')
+    assert engine.table_cache.checkpoint()
+
+    monkeypatch.setattr(engine.table_cache, 'max_bytes', 0)
+    query('select from notes')
+    assert load_last_id('users') == 1
+
+
+def test_concurrent_writers(query):
+    query('create_table users name:str age:int')
+    assert engine.table_cache.close()
+
+    writers = [run_python(WRITER_SCRIPT, name, '100') for name in ('a', 'b', 'c')]
+    for writer in writers:
+        assert writer.wait() == 0
+
+    rows = query('select ID, name, age from users')
+    assert len(rows) == 300
+    assert len({record_id for record_id, _, _ in rows}) == 300
+    for name in ('a', 'b', 'c'):
+        assert [age for _, row_name, age in rows if row_name == name] == list(
+            range(100)
+        )
+
+
+def test_reader_waits_for_writer(query):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    assert engine.table_cache.close()
+
+    with table_lock('users', exclusive=True):
+        reader = run_python(READER_SCRIPT)
+        time.sleep(1)
+        released = time.time()
+
+    output, _ = reader.communicate()
+    assert reader.returncode == 0
+    assert float(output) >= released
@@ -0,0 +1,20 @@
+from src.primitive_db import cache, engine
+from src.primitive_db.mapped import MappedTable
+from src.primitive_db.table import INT64_MAX
+
+
+def test_mapped_read_uses_saved_index(scores, query, reopen, monkeypatch):
+    query('convert_table scores binary')
+    query('create_index scores name')
+    query('insert into scores values ("Анна", 7, false)')
+
+    # Таблица любого размера читается через отображение в память
+    monkeypatch.setattr(cache, 'MAPPED_READ_MIN_BYTES', 0)
+    reopen()
+
+    assert query('select score from scores where name = "Анна" order by ID') == [
+        [INT64_MAX], [7]
+    ]
+    table = engine.table_cache.get_table_for_read('scores')
+    assert isinstance(table, MappedTable)
+    assert table.indexes.get('name').lookup('Анна') == [0, 3]
@@ -0,0 +1,60 @@
+import pytest
+
+from src.primitive_db import parallel
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """
+    Просмотр в двух процессах для таблиц от 10 записей.
+    Возвращает список созданных пулов.
+    """
+
+    created = []
+
+    class CountingPool(parallel.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(parallel, 'ProcessPoolExecutor', CountingPool)
+    monkeypatch.setattr(parallel, 'PARALLEL_WORKERS', 2)
+    monkeypatch.setattr(parallel, 'PARALLEL_MIN_POSITIONS', 10)
+    yield created
+    parallel.shutdown()
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def numbers(query, request):
+    query('create_table numbers value:int')
+    query(f'set_layout numbers {request.param}')
+    for value in range(30):
+        query(f'insert into numbers values ({value})')
+
+
+def test_pool_is_reused_until_table_changes(pools, numbers, query):
+    assert query('select value from numbers where value > 26') == [[27], [28], [29]]
+    assert query('select count(*) from numbers where value < 10') == [[10]]
+    assert len(pools) == 1
+
+    # Процессы пула не видят изменений, сделанных после их создания
+    query('insert into numbers values (100)')
+    assert query('select value from numbers where value > 26') == [
+        [27], [28], [29], [100]
+    ]
+    assert len(pools) == 2
+
+    # delete находит записи тем же пулом, а следующий просмотр - новым
+    query('delete from numbers where value > 28')
+    assert len(pools) == 2
+    assert query('select sum(value) from numbers where value > 26') == [[55]]
+    assert len(pools) == 3
+
+
+def test_small_table_is_scanned_serially(pools, query):
+    query('create_table numbers value:int')
+    for value in range(5):
+        query(f'insert into numbers values ({value})')
+
+    assert query('select value from numbers where value > 2') == [[3], [4]]
+    assert pools == []
@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+
+from src.primitive_db.server import QueryServer
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int active:bool')
+    query('prepare add_user as insert into users values (?, ?, ?)')
+    query('execute add_user ("Ann", 30, true)')
+    query('execute add_user ("Bob", 17, false)')
+    query('execute add_user ("Eve", 45, true)')
+
+
+def test_insert_binds_values(users, query):
+    assert query('select name, age, active from users order by ID') == [
+        ['Ann', 30, True],
+        ['Bob', 17, False],
+        ['Eve', 45, True],
+    ]
+
+
+def test_values_are_converted_to_column_types(users, query):
+    query('execute add_user ("Max", "52", "false")')
+    assert query('select age, active from users where name = "Max"') == [[52, False]]
+
+
+def test_select_binds_comparisons(users, query):
+    query('prepare older as select name from users where age > ? order by age')
+
+    assert query('execute older (20)') == [['Ann'], ['Eve']]
+    assert query('execute older (40)') == [['Eve']]
+
+
+def test_select_binds_in_and_between(users, query):
+    query(
+        'prepare pick as select name from users '
+        'where name in (?, ?) or age between ? and ? order by ID'
+    )
+
+    assert query('execute pick ("Bob", "Nobody", 40, 50)') == [['Bob'], ['Eve']]
+    assert query('execute pick ("Ann", "Eve", 0, 1)') == [['Ann'], ['Eve']]
+
+
+def test_update_and_delete_bind_values(users, query):
+    query('prepare deactivate as update users set active = ? where name in (?, ?)')
+    query('prepare remove as delete from users where age < ?')
+
+    query('execute deactivate (false, "Ann", "Eve")')
+    query('execute remove (18)')
+
+    assert query('select name, active from users order by ID') == [
+        ['Ann', False], ['Eve', False]
+    ]
+
+
+def test_question_mark_in_quotes_is_a_value(users, query):
+    query('prepare ask as select name from users where name != "?" and age = ?')
+
+    assert query('execute ask (17)') == [['Bob']]
+
+
+@pytest.mark.parametrize('values', ['(1, 2)', '', '("old")'])
+def test_wrong_values_are_rejected(users, db, query, values):
+    query('prepare older as select name from users where age > ?')
+
+    result = db(f'execute older {values}')
+    assert not result['ok']
+    assert result['rows'] == []
+
+
+def test_plan_is_rebuilt_after_schema_change(users, db, query):
+    query('prepare by_name as select from users where name = ?')
+    query('drop_table users')
+    query('create_table users name:str email:str')
+    query('insert into users values ("Ann", "ann@mail.com")')
+
+    assert query('execute by_name ("Ann")') == [[1, 'Ann', 'ann@mail.com']]
+
+
+def test_unknown_statement(db):
+    assert not db('execute missing (1)')['ok']
+
+
+async def send(stream, command):
+    reader, writer = stream
+    writer.write(json.dumps({'command': command}).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def test_statements_belong_to_connection(users, query):
+    async def scenario():
+        server = await asyncio.start_unix_server(QueryServer().handle_client, 's.sock')
+        first = await asyncio.open_unix_connection('s.sock')
+        second = await asyncio.open_unix_connection('s.sock')
+
+        prepare = 'prepare by_age as select name from users where age > ?'
+        assert (await send(first, prepare))['ok']
+        assert (await send(first, 'execute by_age (40)'))['rows'] == [['Eve']]
+        assert not (await send(second, 'execute by_age (40)'))['ok']
+
+        # Одно имя в разных подключениях - разные команды
+        prepare = 'prepare by_age as select name from users where age < ?'
+        assert (await send(second, prepare))['ok']
+        assert (await send(second, 'execute by_age (20)'))['rows'] == [['Bob']]
+        assert (await send(first, 'execute by_age (20)'))['rows'] == [['Ann'], ['Eve']]
+
+        # После отключения подготовленные команды удаляются
+        first[1].close()
+        first = await asyncio.open_unix_connection('s.sock')
+        assert not (await send(first, 'execute by_age (40)'))['ok']
+
+        for _, writer in (first, second):
+            writer.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
@@ -0,0 +1,68 @@
+import pytest
+
+from src.primitive_db import cache, engine
+from src.primitive_db.mapped import MappedTable
+from src.primitive_db.table import ColumnarTable, Table
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int bio:str')
+    for name, age in [('Ann', 30), ('Bob', 17), ('Eve', 45)]:
+        query(f'insert into users values ("{name}", {age}, "{name * 100}")')
+
+
+@pytest.fixture
+def read_columns(monkeypatch):
+    """
+    Возвращает множество столбцов, значения которых читались из
+    таблицы. Чтение записей целиком запрещено.
+    """
+
+    columns = set()
+
+    for table_class in (Table, ColumnarTable, MappedTable):
+        def get(self, position):
+            raise AssertionError('запись не должна читаться целиком')
+
+        def column_getter(self, column, getter=table_class.column_getter):
+            columns.add(column)
+            return getter(self, column)
+
+        monkeypatch.setattr(table_class, 'get', get)
+        monkeypatch.setattr(table_class, 'column_getter', column_getter)
+
+    return columns
+
+
+def test_selected_columns_in_given_order(users, db):
+    result = db('select age, name from users where age > 20 order by age desc')
+    assert result['columns'] == ['age', 'name']
+    assert result['rows'] == [[45, 'Eve'], [30, 'Ann']]
+
+    result = db('select * from users where ID = 2')
+    assert result['columns'] == ['ID', 'name', 'age', 'bio']
+
+
+def test_unknown_column_is_rejected(users, db):
+    result = db('select name, email from users')
+    assert not result['ok']
+    assert result['rows'] == []
+
+
+@pytest.mark.parametrize('storage', ['rows', 'columnar', 'mapped'])
+def test_other_columns_are_not_read(users, query, reopen, monkeypatch,
+                                    read_columns, storage):
+    if storage == 'mapped':
+        query('convert_table users binary')
+        monkeypatch.setattr(cache, 'MAPPED_READ_MIN_BYTES', 0)
+        reopen()
+        assert isinstance(engine.table_cache.get_table_for_read('users'), MappedTable)
+    else:
+        query(f'set_layout users {storage}')
+
+    assert query('select name from users where age > 20 order by age') == [
+        ['Ann'], ['Eve']
+    ]
+    assert 'name' in read_columns
+    assert 'bio' not in read_columns
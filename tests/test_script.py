@@ -0,0 +1,81 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+from src.primitive_db.engine import run_script
+from src.primitive_db.utils import load_table_data
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCRIPT = """-- начальные данные
+create_table users name:str age:int;
+
+# пустые строки и комментарии пропускаются
+insert into users values ("Ann", 30);
+insert into users values ("Bob", 17)
+exit
+insert into users values ("Eve", 45)
+"""
+
+
+def run_database(*args, **kwargs):
+    return subprocess.run(
+        [sys.executable, '-m', 'src.primitive_db.main', *args],
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        capture_output=True,
+        text=True,
+        **kwargs,
+    )
+
+
+def test_script_runs_until_exit(db, query, reopen):
+    assert run_script(SCRIPT.splitlines())
+
+    reopen()
+    assert query('select name, age from users') == [['Ann', 30], ['Bob', 17]]
+
+
+def test_tables_are_loaded_once(query, reopen, loads):
+    query('create_table users name:str age:int')
+    reopen()
+
+    commands = [f'insert into users values ("User", {age})' for age in range(20)]
+    commands += ['update users set age = 0 where age > 9', 'select from users']
+    assert run_script(commands)
+    assert loads == ['users']
+
+
+@pytest.mark.parametrize('checkpoint, saved', [
+    (0, [0, 0, 0, 0, 0, 0]),
+    (3, [0, 0, 2, 2, 2, 5]),
+])
+def test_checkpoint_every_n_commands(db, checkpoint, saved):
+    on_disk = []
+
+    def commands():
+        yield 'create_table users name:str age:int'
+        for age in range(6):
+            # Количество записей в файлах таблицы перед командой
+            on_disk.append(len(load_table_data('users')))
+            yield f'insert into users values ("User", {age})'
+
+    assert run_script(commands(), checkpoint)
+    assert on_disk == saved
+    assert len(load_table_data('users')) == 6
+
+
+def test_commands_from_file_and_stdin(tmp_path):
+    with open(tmp_path / 'seed.sql', 'w', encoding='utf-8') as file:
+        file.write(SCRIPT)
+
+    result = run_database('--script', 'seed.sql', cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+
+    result = run_database(
+        cwd=tmp_path, input='select name from users where age > 20\n'
+    )
+    assert result.returncode == 0, result.stderr
+    assert 'Ann' in result.stdout
+    assert 'Bob' not in result.stdout
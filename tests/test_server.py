@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+
+from src.primitive_db import engine
+from src.primitive_db.server import QueryServer
+
+
+def test_successful_command_is_ok(db):
+    result = db('create_table users name:str age:int')
+
+    assert result['ok']
+    assert result['output']
+
+
+def test_reported_errors_fail_the_command(db, query):
+    query('create_table users name:str age:int')
+
+    assert not db('insert into missing values ("Ann", 30)')['ok']
+    assert not db('insert into users values ("Ann", "old")')['ok']
+    # Сообщение об ошибке не обязательно начинается со слова "Ошибка"
+    assert not db('frobnicate users')['ok']
+
+
+def test_status_does_not_depend_on_printed_text(db, query):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+
+    assert engine.execute_command('select from users') is True
+    assert engine.execute_command('select from missing') is False
+
+
+def test_failed_save_fails_the_command(db, query, monkeypatch):
+    query('create_table users name:str age:int')
+    monkeypatch.setattr(engine.table_cache, 'commit', lambda: False)
+
+    result = db('insert into users values ("Ann", 30)')
+    assert not result['ok']
+    assert result['output'][-1] == "Ошибка при сохранении данных"
+
+
+async def send(stream, command):
+    reader, writer = stream
+    writer.write(json.dumps({'command': command}).encode() + b'\n')
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+
+def test_idle_transaction_is_rolled_back(db, query):
+    query('create_table users name:str age:int')
+
+    async def scenario():
+        query_server = QueryServer(transaction_timeout=0.2)
+        server = await asyncio.start_unix_server(query_server.handle_client, 's.sock')
+        idle = await asyncio.open_unix_connection('s.sock')
+        other = await asyncio.open_unix_connection('s.sock')
+
+        assert (await send(idle, 'begin'))['ok']
+        assert (await send(idle, 'insert into users values ("Ann", 30)'))['ok']
+
+        # Другой клиент ждет, пока транзакция не будет отменена по времени
+        started = time.monotonic()
+        result = await send(other, 'select name from users')
+        assert result['ok'] and result['rows'] == []
+        assert time.monotonic() - started >= 0.2
+
+        # Следующая команда клиента не выполняется
+        result = await send(idle, 'insert into users values ("Bob", 40)')
+        assert not result['ok']
+        assert result['output'][0].startswith("Ошибка: Транзакция отменена")
+        assert not engine.table_cache.in_transaction()
+
+        for _, writer in (idle, other):
+            writer.close()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(scenario())
+    assert query('select name from users') == []
@@ -0,0 +1,61 @@
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.index import SortedIndex
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def users(query, request):
+    query('create_table users name:str age:int')
+    query(f'set_layout users {request.param}')
+    for number in range(40):
+        query(f'insert into users values ("User {number % 4}", {(number * 7) % 40})')
+    query('create_index users age sorted')
+
+
+def ages(rows):
+    return [age for _, age in rows]
+
+
+def test_index_is_registered_as_sorted(users):
+    metadata = engine.table_cache.get_metadata()
+    assert metadata['__options__']['users']['indexes'] == {'age': 'sorted'}
+
+
+def test_narrow_range_uses_index(users, query, no_scan):
+    rows = query('select ID, age from users where age between 10 and 12')
+    assert sorted(ages(rows)) == [10, 11, 12]
+    # Записи выводятся в порядке ID, как при полном просмотре
+    assert rows == sorted(rows)
+
+    assert ages(query('select ID, age from users where age > 37')) == [39, 38]
+    assert query('select age from users where age < 0') == []
+
+
+def test_wide_range_is_scanned(users, query, monkeypatch):
+    def index_range(self, *args, **kwargs):
+        raise AssertionError('широкий диапазон не должен обходиться по индексу')
+
+    monkeypatch.setattr(SortedIndex, 'range', index_range)
+    rows = query('select age from users where age >= 5 and name = "User 1"')
+    assert len(rows) == 9
+
+
+def test_order_by_limit_walks_index(users, query, no_scan):
+    assert query('select age from users order by age limit 3') == [[0], [1], [2]]
+    assert query('select age from users order by age desc limit 2 offset 1') == [
+        [38], [37]
+    ]
+    assert query(
+        'select age from users where age < 20 and name = "User 0" '
+        'order by age desc limit 2'
+    ) == [[16], [12]]
+
+
+def test_index_follows_changes(users, query, no_scan):
+    query('insert into users values ("Max", 100)')
+    query('update users set age = -1 where age = 5')
+    query('delete from users where age between 0 and 3')
+
+    assert query('select age from users order by age limit 3') == [[-1], [4], [6]]
+    assert query('select name from users order by age desc limit 1') == [['Max']]
@@ -0,0 +1,58 @@
+import pytest
+
+from src.primitive_db import cache, engine
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int')
+    for name, age in [('Ann', 30), ('Bob', 17), ('Eve', 45), ('Ann', 52)]:
+        query(f'insert into users values ("{name}", {age})')
+
+
+def info(db):
+    result = db('info users')
+    assert result['ok']
+    return result['output']
+
+
+def test_info_reports_rows_and_bounds(users, db):
+    output = info(db)
+
+    assert 'Количество записей: 4' in output
+    assert '  ID: различных значений ~4; min 1, max 4' in output
+    assert '  name: различных значений ~3' in output
+    assert '  age: различных значений ~4; min 17, max 52' in output
+
+
+def test_stats_follow_updates_and_deletes(users, db, query):
+    query('update users set age = 60 where name = "Eve"')
+    query('delete from users where age < 20')
+
+    output = info(db)
+    assert 'Количество записей: 3' in output
+    assert '  age: различных значений ~3; min 30, max 60' in output
+
+
+@pytest.mark.parametrize('layout', ['columnar', 'rows'])
+def test_info_after_layout_switch(users, db, query, layout):
+    # Статистика не пересчитывается при записи добавлений
+    assert engine.table_cache.checkpoint()
+    query('set_layout users columnar')
+    if layout == 'rows':
+        query('set_layout users rows')
+    query('insert into users values ("Max", 5)')
+
+    output = info(db)
+    assert 'Количество записей: 5' in output
+    assert '  age: различных значений ~5; min 5, max 52' in output
+
+
+def test_saved_stats_are_read_without_table(users, db, reopen, monkeypatch):
+    reopen()
+
+    def load_table_data(*args):
+        raise AssertionError('данные таблицы не должны читаться')
+
+    monkeypatch.setattr(cache, 'load_table_data', load_table_data)
+    assert 'Количество записей: 4' in info(db)
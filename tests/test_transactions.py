@@ -0,0 +1,110 @@
+import pytest
+
+from src.primitive_db import engine
+from src.primitive_db.api import Database
+from src.primitive_db.vectorized import VECTORIZED_MIN_POSITIONS
+
+ALL_USERS = 'select name, age, active from users order by ID'
+
+
+@pytest.fixture(params=['rows', 'columnar'])
+def users(request, db, query):
+    """
+    Таблица users в представлении rows или columnar. Записей больше
+    VECTORIZED_MIN_POSITIONS, чтобы update и delete без индекса
+    выполнялись по маске.
+    """
+
+    query('create_table users name:str age:int active:bool')
+    query(f'set_layout users {request.param}')
+
+    query('begin')
+    for number in range(VECTORIZED_MIN_POSITIONS + 10):
+        active = 'true' if number % 2 else 'false'
+        query(f'insert into users values ("user{number % 50}", {number}, {active})')
+    query('commit')
+
+
+def test_rollback_restores_records(users, query):
+    before = query(ALL_USERS)
+
+    query('begin')
+    query('insert into users values ("new", 5000, true)')
+    query('update users set name = "renamed", active = true where age < 100')
+    query('delete from users where active = false')
+    query('insert into users values ("other", 6000, false)')
+    assert query('select count(*) from users') != [[len(before)]]
+    query('rollback')
+
+    assert query(ALL_USERS) == before
+
+
+def test_rollback_restores_indexes(users, query):
+    query('create_index users name')
+    query('create_index users age sorted')
+    before_name = query('select age from users where name = "user7"')
+    before_range = query('select name from users where age between 10 and 20')
+
+    query('begin')
+    query('update users set name = "user7", age = 15 where active = true')
+    query('delete from users where name = "user8"')
+    query('insert into users values ("user7", 12, false)')
+    query('rollback')
+
+    assert query('select age from users where name = "user7"') == before_name
+    assert query('select name from users where age between 10 and 20') == before_range
+    assert query('select age from users where name = "user7" order by age') == sorted(
+        before_name
+    )
+
+
+def test_rollback_after_delete_all(users, query):
+    before = query(ALL_USERS)
+
+    query('begin')
+    # Без условия все записи удаляются одной операцией (Table.clear)
+    assert Database(engine.table_cache).delete('users') == len(before)
+    query('insert into users values ("only", 1, true)')
+    query('rollback')
+
+    assert query(ALL_USERS) == before
+
+    # После отката таблица продолжает работать
+    query('insert into users values ("after", 7000, true)')
+    assert query('select count(*) from users') == [[len(before) + 1]]
+
+
+def test_rolled_back_changes_are_not_saved(users, query, reopen):
+    before = query(ALL_USERS)
+
+    query('begin')
+    query('update users set age = 0 where age >= 0')
+    query('delete from users where active = true')
+    query('rollback')
+
+    reopen()
+    assert query(ALL_USERS) == before
+
+
+def test_commit_saves_changes(users, query, reopen):
+    query('begin')
+    query('update users set age = 0 where name = "user1"')
+    query('delete from users where name = "user2"')
+    query('commit')
+    expected = query(ALL_USERS)
+
+    reopen()
+    assert query(ALL_USERS) == expected
+    assert query('select count(*) from users where name = "user2"') == [[0]]
+
+
+def test_schema_commands_are_refused_in_transaction(db, query):
+    query('create_table users name:str')
+    query('begin')
+
+    result = db('create_index users name')
+    assert not result['ok']
+    assert engine.table_cache.in_transaction()
+
+    query('rollback')
+    query('create_index users name')
@@ -0,0 +1,82 @@
+import pytest
+
+from src.primitive_db import core, vectorized
+
+pytest.importorskip('numpy')
+
+CONDITIONS = [
+    'age > 20 and active = true',
+    'age between 10 and 30 or not active = true',
+    'name in ("User 1", "User 3") and age != 7',
+    'name != "User 0"',
+    'ID >= 40',
+]
+
+# Сравнение строк на больше-меньше проверяется по одной записи
+ROW_CONDITION = 'name > "User 2" and age < 30'
+
+
+@pytest.fixture
+def tables(query, monkeypatch):
+    """
+    Одинаковые таблицы fast (columnar, условия вычисляются масками)
+    и plain (rows, условия проверяются по одной записи)
+    """
+
+    monkeypatch.setattr(vectorized, 'VECTORIZED_MIN_POSITIONS', 10)
+    for table_name, layout in [('fast', 'columnar'), ('plain', 'rows')]:
+        query(f'create_table {table_name} name:str age:int active:bool')
+        query(f'set_layout {table_name} {layout}')
+        for number in range(60):
+            active = 'true' if number % 3 else 'false'
+            query(
+                f'insert into {table_name} values '
+                f'("User {number % 5}", {(number * 11) % 50}, {active})'
+            )
+
+
+@pytest.fixture
+def predicates(monkeypatch):
+    """
+    Возвращает список таблиц, условия для которых проверялись по
+    одной записи
+    """
+
+    tables = []
+    compile_predicate = core.compile_predicate
+
+    def compile_for(condition, table):
+        tables.append(table.layout)
+        return compile_predicate(condition, table)
+
+    monkeypatch.setattr(core, 'compile_predicate', compile_for)
+    return tables
+
+
+def contents(query, table_name):
+    return query(f'select from {table_name} order by ID')
+
+
+@pytest.mark.parametrize('condition', CONDITIONS + [ROW_CONDITION])
+def test_masks_match_row_checks(tables, query, predicates, condition):
+    fast = query(f'select from fast where {condition}')
+    assert fast == query(f'select from plain where {condition}')
+    assert fast
+    assert ('columnar' in predicates) == (condition == ROW_CONDITION)
+
+
+@pytest.mark.parametrize('condition', CONDITIONS + [ROW_CONDITION])
+def test_masked_update_and_delete(tables, query, predicates, condition):
+    for table_name in ('fast', 'plain'):
+        query(f'update {table_name} set age = 99, active = false where {condition}')
+        query(f'delete from {table_name} where age < 15 and active = true')
+
+    assert contents(query, 'fast') == contents(query, 'plain')
+    assert ('columnar' in predicates) == (condition == ROW_CONDITION)
+
+
+def test_unsupported_values_fall_back(tables, query):
+    # Значение больше int64 не помещается в столбец NumPy
+    assert query(f'select ID from fast where age < {1 << 70}') == query(
+        f'select ID from plain where age < {1 << 70}'
+    )
@@ -0,0 +1,163 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.primitive_db import engine
+from src.primitive_db.cache import TableCache, get_table_stamp
+from src.primitive_db.wal import WAL_FILE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Процесс выполняет команды, фиксирует их только в журнале предзаписи
+# и завершается при первой записи файлов таблиц (или после команд),
+# как при сбое
+CRASH_SCRIPT = """
+import os
+import sys
+
+from src.primitive_db import engine
+
+engine.execute_command('create_table users name:str age:int')
+engine.table_cache.commit()
+engine.table_cache.flush = lambda *args: os._exit(0)
+
+for command in sys.argv[1:]:
+    engine.execute_command(command)
+    engine.table_cache.commit()
+
+os._exit(0)
+"""
+
+
+def crash(*commands):
+    subprocess.run(
+        [sys.executable, '-c', CRASH_SCRIPT, *commands],
+        check=True,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+    )
+
+
+def wal_entries():
+    """
+    Записи текущего поколения журнала (без заголовка)
+    """
+
+    with open(WAL_FILE, encoding='utf-8') as file:
+        return [json.loads(line) for line in file.readlines()[1:]]
+
+
+def test_committed_changes_survive_crash(query):
+    crash(
+        'insert into users values ("Ann", 30)',
+        'insert into users values ("Bob", 17)',
+        'update users set age = 31 where name = "Ann"',
+        'delete from users where age < 18',
+    )
+
+    # Изменения есть только в журнале
+    assert len(wal_entries()) == 4
+    assert not os.path.exists(os.path.join('data', 'users.json'))
+
+    assert engine.table_cache.recover() == 4
+    assert query('select name, age from users') == [['Ann', 31]]
+    assert wal_entries() == []
+
+
+def test_recover_is_idempotent(query, reopen):
+    crash('insert into users values ("Ann", 30)')
+
+    assert engine.table_cache.recover() == 1
+    reopen()
+    assert engine.table_cache.recover() == 0
+    assert query('select name from users') == [['Ann']]
+
+
+def test_torn_last_entry_is_ignored(query):
+    crash('insert into users values ("Ann", 30)')
+
+    # Сбой во время записи оставляет недописанную последнюю строку
+    with open(WAL_FILE, 'a', encoding='utf-8') as file:
+        file.write('{"op": "insert", "table": "users", "rec')
+
+    assert engine.table_cache.recover() == 1
+    assert query('select name from users') == [['Ann']]
+
+
+def test_transaction_is_replayed_whole(query):
+    crash(
+        'begin',
+        'insert into users values ("Ann", 30)',
+        'insert into users values ("Bob", 40)',
+        'commit',
+    )
+
+    assert engine.table_cache.recover() == 1
+    assert query('select name from users') == [['Ann'], ['Bob']]
+
+
+def test_unfinished_transaction_is_lost(query):
+    crash(
+        'insert into users values ("Ann", 30)',
+        'begin',
+        'insert into users values ("Bob", 40)',
+    )
+
+    assert engine.table_cache.recover() == 1
+    assert query('select name from users') == [['Ann']]
+
+
+def test_torn_last_entry_is_overwritten(query, reopen):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    with open(WAL_FILE, 'a', encoding='utf-8') as file:
+        file.write('{"op": "insert", "table": "users", "rec')
+
+    # Следующая фиксация дописывает журнал с конца последней целой записи
+    query('insert into users values ("Bob", 40)')
+    assert [entry['op'] for entry in wal_entries()] == ['insert', 'insert']
+
+    reopen()
+    assert query('select name from users') == [['Ann'], ['Bob']]
+
+
+def test_commit_does_not_write_table_files(query):
+    query('create_table users name:str age:int')
+    stamp = get_table_stamp('users')
+
+    query('insert into users values ("Ann", 30)')
+    query('update users set age = 31 where name = "Ann"')
+    query('delete from users where age > 30')
+
+    assert get_table_stamp('users') == stamp
+    assert len(wal_entries()) == 3
+
+
+def test_other_process_sees_changes_from_log(query):
+    query('create_table users name:str age:int')
+    query('insert into users values ("Ann", 30)')
+    stamp = get_table_stamp('users')
+
+    # Вторая копия кэша работает с базой как другой процесс
+    other = TableCache()
+    assert [record['name'] for record in other.get_table('users')] == ['Ann']
+
+    query('update users set age = 31 where name = "Ann"')
+    other.refresh()
+    assert [record['age'] for record in other.get_table('users')] == [31]
+
+    record_id = other.reserve_ids('users')
+    other.append_record('users', {'ID': record_id, 'name': 'Bob', 'age': 40})
+    assert other.commit()
+    assert query('select name, age from users order by ID') == [
+        ['Ann', 31], ['Bob', 40]
+    ]
+
+    # Изменения обоих процессов переносятся в файлы таблиц только
+    # на контрольной точке
+    assert get_table_stamp('users') == stamp
+    assert other.close()
+    assert get_table_stamp('users') != stamp
+    assert query('select name, age from users order by ID') == [
+        ['Ann', 31], ['Bob', 40]
+    ]
@@ -0,0 +1,52 @@
+import pytest
+
+
+@pytest.fixture
+def users(query):
+    query('create_table users name:str age:int active:bool')
+    for name, age, active in [
+        ('Ann', 30, 'true'), ('Bob', 17, 'false'), ('Eve', 45, 'true'),
+        ('Max', 52, 'false'), ('Kim', 25, 'true'),
+    ]:
+        query(f'insert into users values ("{name}", {age}, {active})')
+
+
+def names(query, condition):
+    return [row[0] for row in query(f'select name from users where {condition}')]
+
+
+@pytest.mark.parametrize('condition, expected', [
+    ('age > 30', ['Eve', 'Max']),
+    ('age >= 30', ['Ann', 'Eve', 'Max']),
+    ('age < 25 or name = "Max"', ['Bob', 'Max']),
+    ('active = true and age <= 30', ['Ann', 'Kim']),
+    ('not (active = true or age > 50)', ['Bob']),
+    ('(age < 20 or age > 50) and active = false', ['Bob', 'Max']),
+    ('name in ("Eve", "Kim", "Nobody")', ['Eve', 'Kim']),
+    ('name not in ("Eve", "Kim")', ['Ann', 'Bob', 'Max']),
+    ('age between 25 and 45', ['Ann', 'Eve', 'Kim']),
+    ('age not between 25 and 45', ['Bob', 'Max']),
+    ('name != "Ann" and name != "Bob"', ['Eve', 'Max', 'Kim']),
+])
+def test_where_conditions(users, query, condition, expected):
+    assert names(query, condition) == expected
+
+
+@pytest.mark.parametrize('condition', [
+    'age >',
+    'age between 1',
+    'missing = 1',
+    'age = "old"',
+    '(age > 1',
+])
+def test_invalid_conditions_are_rejected(users, db, condition):
+    assert not db(f'select from users where {condition}')['ok']
+
+
+def test_keywords_in_quotes_are_values(users, query):
+    query('update users set name = "where" where name = "Ann"')
+    query('update users set name = "a where b", active = false where age = 45')
+
+    assert names(query, 'name = "where"') == ['where']
+    assert names(query, 'name = "a where b" and active = false') == ['a where b']
+    assert names(query, 'name = "and" or name = "where"') == ['where']